@@ -0,0 +1,181 @@
+"""Analyse des pages de listing Mubawab, séparée de leur récupération.
+
+Les threads de scrapping.py récupèrent le HTML brut ; AnalyseurPages le
+confie à un pool de processus (l'analyse est du Python pur, liée au CPU, et
+ne profite pas des threads) et renvoie un Future de (total_pages, annonces).
+Au plus `taille_file` pages attendent ou sont en cours d'analyse : au-delà,
+les threads de récupération se bloquent (contre-pression) au lieu
+d'accumuler du HTML en mémoire.
+
+Parseurs : `html.parser` (BeautifulSoup, Python pur), `lxml` (BeautifulSoup
+sur lxml) et `selectolax` (moteur lexbor, en C) si les modules sont installés ;
+`auto` prend le plus rapide disponible. Ce module n'importe ni Selenium ni
+pandas, mais les processus du pool (spawn) réimportent aussi le module
+principal du parent : lancé depuis scrapping.py ou app.py, chacun charge
+Selenium et pandas au démarrage du pool (~0,7 s et ~100 Mo par processus,
+une seule fois).
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # backend de BeautifulSoup
+except ImportError:  # module optionnel : html.parser seul
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # module optionnel
+    LexborHTMLParser = None
+
+BASE_URL = "https://www.mubawab.tn"
+SELECTEUR_ANNONCES = "div.listingBox.feat, div.listingBox"
+PARSEURS = ["auto", "selectolax", "lxml", "html.parser"]
+
+
+def parseurs_disponibles():
+    disponibles = ["html.parser"]
+    if lxml is not None:
+        disponibles.insert(0, "lxml")
+    if LexborHTMLParser is not None:
+        disponibles.insert(0, "selectolax")
+    return disponibles
+
+
+def choisir_parseur(parseur="auto"):
+    """Nom du parseur effectif ; ValueError si le module demandé n'est pas installé."""
+    if parseur == "auto":
+        return parseurs_disponibles()[0]
+    if parseur not in PARSEURS:
+        raise ValueError(f"Parseur inconnu : {parseur}")
+    if parseur not in parseurs_disponibles():
+        raise ValueError(f"Parseur indisponible : {parseur} (pip install {parseur})")
+    return parseur
+
+
+def nombre_pages(soup):
+    try:
+        return int(soup.select_one("#lastPageSpan").text.strip())
+    except (AttributeError, ValueError):
+        return 1
+
+
+def extraire_annonces(soup, nature_label, base_url=BASE_URL):
+    annonces_list = []
+    for annonce in soup.select(SELECTEUR_ANNONCES):
+        titre = annonce.select_one("h2.listingTit a")
+        prix = annonce.select_one("span.priceTag")
+        localisation = annonce.select_one("span.listingH3")
+        details = annonce.select("div.adDetailFeature span")
+        superficie = details[0] if len(details) > 0 else None
+        nb_pieces = details[1] if len(details) > 1 else None
+        nb_chambres = details[2] if len(details) > 2 else None
+        nb_sdb = details[3] if len(details) > 3 else None
+        lien = titre.get("href") if titre else None
+
+        if titre and prix:
+            annonce_data = {
+                "nature": nature_label,
+                "Titre": titre.text.strip(),
+                "Prix": prix.text.strip(),
+                "Localisation": localisation.text.strip() if localisation else "N/A",
+                "Superficie": superficie.text.strip() if superficie else "N/A",
+                "Pièces": nb_pieces.text.strip() if nb_pieces else "N/A",
+                "Chambres": nb_chambres.text.strip() if nb_chambres else "N/A",
+                "Salles de bain": nb_sdb.text.strip() if nb_sdb else "N/A",
+                "Lien": urljoin(base_url, lien) if lien else "N/A",
+            }
+            annonces_list.append(annonce_data)
+    return annonces_list
+
+
+def _texte(noeud):
+    return noeud.text().strip() if noeud is not None else "N/A"
+
+
+def _analyser_selectolax(html, nature_label, base_url):
+    arbre = LexborHTMLParser(html)
+    dernier = arbre.css_first("#lastPageSpan")
+    try:
+        total_pages = int(dernier.text().strip())
+    except (AttributeError, ValueError):
+        total_pages = 1
+
+    annonces_list = []
+    # Une carte .feat répond aux deux sélecteurs et lexbor la renvoie deux fois : dédoublonnage dans l'ordre
+    for annonce in dict.fromkeys(arbre.css(SELECTEUR_ANNONCES)):
+        titre = annonce.css_first("h2.listingTit a")
+        prix = annonce.css_first("span.priceTag")
+        if titre is None or prix is None:
+            continue
+        details = annonce.css("div.adDetailFeature span")[:4]
+        details += [None] * (4 - len(details))
+        lien = titre.attributes.get("href")
+        annonces_list.append({
+            "nature": nature_label,
+            "Titre": titre.text().strip(),
+            "Prix": prix.text().strip(),
+            "Localisation": _texte(annonce.css_first("span.listingH3")),
+            "Superficie": _texte(details[0]),
+            "Pièces": _texte(details[1]),
+            "Chambres": _texte(details[2]),
+            "Salles de bain": _texte(details[3]),
+            "Lien": urljoin(base_url, lien) if lien else "N/A",
+        })
+    return total_pages, annonces_list
+
+
+def analyser_page(html, nature_label, base_url=BASE_URL, parseur="html.parser"):
+    """(total_pages, annonces) d'une page de listing ; `parseur` déjà résolu par choisir_parseur."""
+    if parseur == "selectolax":
+        return _analyser_selectolax(html, nature_label, base_url)
+    soup = BeautifulSoup(html, parseur)
+    return nombre_pages(soup), extraire_annonces(soup, nature_label, base_url)
+
+
+class AnalyseurPages:
+    """Étape d'analyse du scraper : pool de `nb_processus` processus derrière une file bornée.
+
+    Avec `nb_processus=0`, l'analyse se fait dans le thread appelant (comportement
+    d'avant la séparation récupération / analyse).
+    """
+
+    def __init__(self, parseur="auto", nb_processus=0, taille_file=None):
+        self.parseur = choisir_parseur(parseur)
+        self.nb_processus = nb_processus
+        self._pool = None
+        if nb_processus > 0:
+            # spawn plutôt que fork : le processus a déjà des threads (récupération, API)
+            # dont les verrous pourraient être hérités pris ; coût : chaque processus
+            # réimporte le module principal (voir la docstring du module)
+            self._pool = ProcessPoolExecutor(nb_processus, mp_context=multiprocessing.get_context("spawn"))
+        self._places = threading.BoundedSemaphore(taille_file or 2 * max(nb_processus, 1))
+
+    def soumettre(self, html, nature_label, base_url=BASE_URL):
+        """Future de (total_pages, annonces) ; bloque tant que la file est pleine."""
+        if self._pool is None:
+            future = Future()
+            try:
+                future.set_result(analyser_page(html, nature_label, base_url, self.parseur))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._places.acquire()
+        try:
+            future = self._pool.submit(analyser_page, html, nature_label, base_url, self.parseur)
+        except BaseException:
+            self._places.release()
+            raise
+        future.add_done_callback(lambda _: self._places.release())
+        return future
+
+    def analyser(self, html, nature_label, base_url=BASE_URL):
+        return self.soumettre(html, nature_label, base_url).result()
+
+    def fermer(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
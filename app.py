@@ -1,81 +1,293 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, Response, stream_with_context
+import json
 import sqlite3
-import pandas as pd
-import threading
+import os
+
+from base_donnees import DB_NAME, TABLES_STATS, clause_filtres, init_db, lire_stats, version_stats
+from donnees import jeu_annonces
+from serialisation import (
+    FORMATS_BINAIRES,
+    TAILLE_MIN_COMPRESSION,
+    TYPES_COMPRESSIBLES,
+    TYPES_MIME,
+    CacheExports,
+    compresser,
+    corps_tableau,
+    encodage_accepte,
+    flux_tableau,
+    format_demande,
+    schema_lignes,
+    table_depuis_dataframe,
+    table_depuis_lignes,
+)
+from taches import GestionnaireTaches, NaturesOccupees
 
 app = Flask(__name__)
 
-db_name = "annonces.db"
-csv_file = "Mubawab_Annonces_Location_Vente.xlsx"  # mis à jour avec le bon fichier
+db_name = DB_NAME
 
-# Initialisation de la base de données
-def init_db():
-    with sqlite3.connect(db_name) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS annonces (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            nature TEXT,
-                            titre TEXT,
-                            prix TEXT,
-                            localisation TEXT,
-                            superficie TEXT,
-                            pieces TEXT,
-                            chambres TEXT,
-                            salles_de_bain TEXT,
-                            lien TEXT)
-                        ''')
-        conn.commit()
+# Crawls lancés par POST /scrape : pool borné, une tâche à la fois par nature
+gestionnaire_taches = GestionnaireTaches(
+    nb_taches=int(os.environ.get("SCRAPING_TACHES_MAX", 2)),
+    backend=os.environ.get("SCRAPING_BACKEND", "selenium"),
+    parseur=os.environ.get("SCRAPING_PARSEUR", "auto"),
+    nb_processus=int(os.environ.get("SCRAPING_PROCESSUS", 0)),
+)
 
 # Route d'accueil
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({"message": "Bienvenue sur l'API des annonces immobilières !"}), 200
 
+# Colonnes exposées par /annonces (projection possible via ?fields=)
+COLONNES_ANNONCES = ["id", "nature", "titre", "prix", "localisation", "superficie",
+                     "pieces", "chambres", "salles_de_bain", "lien",
+                     "prix_num", "superficie_num", "ville", "type_bien"]
+COLONNES_ENTIERES = {"id", "prix_num", "superficie_num"}
+LIMITE_PAR_DEFAUT = 100
+LIMITE_MAX = 1000
+TAILLE_LOT_CURSEUR = 500
+# Lignes par RecordBatch / groupe de lignes Parquet des exports binaires diffusés
+TAILLE_LOT_BINAIRE = 10000
+# Formats acceptés par point d'accès (message d'erreur de ?format=)
+FORMATS_ANNONCES = ["json", "colonnes", "arrow", "parquet", "ndjson"]
+FORMATS_ANNONCES_CSV = ["json", "colonnes", "arrow", "parquet"]
+
+class ParametreInvalide(ValueError):
+    pass
+
+def lire_entier(nom, defaut, minimum=0, maximum=None):
+    valeur = request.args.get(nom)
+    if valeur is None or valeur == "":
+        return defaut
+    try:
+        valeur = int(valeur)
+    except ValueError:
+        raise ParametreInvalide(f"'{nom}' doit être un entier")
+    if valeur < minimum:
+        raise ParametreInvalide(f"'{nom}' doit être supérieur ou égal à {minimum}")
+    if maximum is not None and valeur > maximum:
+        raise ParametreInvalide(f"'{nom}' doit être inférieur ou égal à {maximum}")
+    return valeur
+
+def lire_colonnes():
+    """Projection demandée (?fields=prix,localisation) ; l'id est toujours renvoyé."""
+    fields = request.args.get("fields")
+    if not fields:
+        return COLONNES_ANNONCES
+    demandees = [f.strip() for f in fields.split(",") if f.strip()]
+    inconnues = [f for f in demandees if f not in COLONNES_ANNONCES]
+    if inconnues:
+        raise ParametreInvalide(f"Colonnes inconnues : {', '.join(inconnues)}")
+    return ["id"] + [c for c in COLONNES_ANNONCES if c in demandees and c != "id"]
+
+def lire_filtres():
+    """Filtres du tableau de bord, poussés dans la requête SQL (colonnes indexées)."""
+    villes = [v for v in request.args.getlist("ville") if v]
+    return clause_filtres(
+        nature=request.args.get("nature") or None,
+        type_bien=request.args.get("type_bien") or None,
+        villes=villes or None,
+        prix_min=lire_entier("min_prix", None),
+        prix_max=lire_entier("max_prix", None),
+        superficie_min=lire_entier("min_superficie", None),
+        superficie_max=lire_entier("max_superficie", None),
+    )
+
+def veut_ndjson():
+    return (request.args.get("format") == "ndjson"
+            or request.accept_mimetypes.best == "application/x-ndjson")
+
+def lire_format(formats_acceptes):
+    """json, colonnes, arrow ou parquet (?format= ou en-tête Accept), voir serialisation.py."""
+    format_ = format_demande(request.args.get("format"), request.accept_mimetypes)
+    if format_ is None:
+        raise ParametreInvalide(f"'format' doit valoir {', '.join(formats_acceptes[:-1])} ou {formats_acceptes[-1]}")
+    return format_
+
+@app.errorhandler(ParametreInvalide)
+def parametre_invalide(e):
+    return jsonify({"error": str(e)}), 400
+
+# Réponses JSON compressées selon Accept-Encoding (brotli ou gzip)
+@app.after_request
+def compresser_reponse(reponse):
+    reponse.vary.add("Accept-Encoding")
+    encodage = encodage_accepte(request.accept_encodings)
+    if (encodage is None or reponse.status_code != 200 or reponse.direct_passthrough or reponse.is_streamed
+            or "Content-Encoding" in reponse.headers or reponse.mimetype not in TYPES_COMPRESSIBLES):
+        return reponse
+    corps = reponse.get_data()
+    if len(corps) < TAILLE_MIN_COMPRESSION:
+        return reponse
+    reponse.set_data(compresser(corps, encodage))
+    reponse.headers["Content-Encoding"] = encodage
+    # Autre représentation du même contenu : l'ETag devient faible
+    etag, faible = reponse.get_etag()
+    if etag and not faible:
+        reponse.set_etag(etag, weak=True)
+    return reponse
+
 # Récupérer les annonces depuis la base de données
+# Pagination par clé (?limit=&after_id=) ; ?format=ndjson diffuse une ligne JSON par annonce
+# ?format=colonnes : JSON en colonnes ; ?format=arrow|parquet : toute la sélection (ou ?limit=),
+# diffusée par lots de TAILLE_LOT_BINAIRE lignes
+# Filtres : nature, type_bien, ville (répétable), min_prix/max_prix, min_superficie/max_superficie
 @app.route("/annonces", methods=["GET"])
 def get_annonces():
+    colonnes = lire_colonnes()
+    format_ = "json" if veut_ndjson() else lire_format(FORMATS_ANNONCES)
+    after_id = lire_entier("after_id", 0)
+    conditions, parametres = lire_filtres()
+    requete = (f"SELECT {', '.join(colonnes)} FROM annonces "
+               f"WHERE {' AND '.join(['id > ?'] + conditions)} ORDER BY id")
+    parametres = [after_id] + parametres
+
+    if veut_ndjson():
+        # Sans limite explicite, tout le reste de la sélection est diffusé par lots
+        limit = lire_entier("limit", None, minimum=1)
+        if limit is not None:
+            requete += " LIMIT ?"
+            parametres.append(limit)
+
+        def generer():
+            with sqlite3.connect(db_name) as conn:
+                cursor = conn.execute(requete, parametres)
+                while True:
+                    lignes = cursor.fetchmany(TAILLE_LOT_CURSEUR)
+                    if not lignes:
+                        break
+                    yield "".join(json.dumps(dict(zip(colonnes, row)), ensure_ascii=False) + "\n" for row in lignes)
+
+        return Response(stream_with_context(generer()), mimetype="application/x-ndjson")
+
+    if format_ in FORMATS_BINAIRES:
+        # Comme ndjson : sans limite explicite, toute la sélection, lue au curseur par lots
+        limit = lire_entier("limit", None, minimum=1)
+        next_after_id = None
+        if limit is not None:
+            # Id de la dernière ligne d'une page pleine, connu avant l'envoi des en-têtes
+            with sqlite3.connect(db_name) as conn:
+                derniere = conn.execute(f"SELECT id FROM ({requete}) LIMIT 1 OFFSET ?",
+                                        parametres + [limit - 1]).fetchone()
+            next_after_id = derniere[0] if derniere else None
+            requete += " LIMIT ?"
+            parametres.append(limit)
+
+        def lots():
+            with sqlite3.connect(db_name) as conn:
+                cursor = conn.execute(requete, parametres)
+                while True:
+                    lignes = cursor.fetchmany(TAILLE_LOT_BINAIRE)
+                    if not lignes:
+                        break
+                    yield lignes
+
+        schema = schema_lignes(colonnes, COLONNES_ENTIERES)
+        reponse = Response(stream_with_context(flux_tableau(schema, lots(), format_)), mimetype=TYPES_MIME[format_])
+        if next_after_id is not None:
+            reponse.headers["X-Next-After-Id"] = str(next_after_id)
+        return reponse
+
+    limit = lire_entier("limit", LIMITE_PAR_DEFAUT, minimum=1, maximum=LIMITE_MAX)
     with sqlite3.connect(db_name) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM annonces")
-        annonces = [
-            {
-                "id": row[0],
-                "nature": row[1],
-                "titre": row[2],
-                "prix": row[3],
-                "localisation": row[4],
-                "superficie": row[5],
-                "pieces": row[6],
-                "chambres": row[7],
-                "salles_de_bain": row[8],
-                "lien": row[9],
-            }
-            for row in cursor.fetchall()
-        ]
-    return jsonify({"annonces": annonces})
-
-# Récupérer les annonces depuis le fichier Excel
+        cursor = conn.execute(requete + " LIMIT ?", parametres + [limit])
+        lignes = cursor.fetchall()
+    next_after_id = lignes[-1][0] if len(lignes) == limit else None
+    if format_ == "colonnes":
+        corps, type_mime = corps_tableau(table_depuis_lignes(colonnes, lignes), format_, {"next_after_id": next_after_id})
+        return Response(corps, mimetype=type_mime)
+    annonces = [dict(zip(colonnes, row)) for row in lignes]
+    return jsonify({"annonces": annonces, "next_after_id": next_after_id})
+
+# Agrégats matérialisés (tables stats_*, rafraîchies à l'insertion des annonces)
+# /stats : par nature × type_bien × ville ; /stats/ville, /stats/type_bien, /stats/nature
+# ETag = version des agrégats : un client qui renvoie If-None-Match reçoit un 304 sans calcul
+@app.route("/stats", methods=["GET"], defaults={"dimension": "groupes"})
+@app.route("/stats/<dimension>", methods=["GET"])
+def get_stats(dimension):
+    if dimension not in TABLES_STATS:
+        return jsonify({"error": f"Dimension inconnue : {dimension}"}), 404
+    with sqlite3.connect(db_name) as conn:
+        etag = f"stats-{version_stats(conn)}"
+        # Comparaison faible : l'ETag d'une réponse compressée est faible
+        if request.if_none_match.contains_weak(etag):
+            reponse = Response(status=304)
+        else:
+            filtres = {c: request.args.get(c) or None for c in TABLES_STATS[dimension]}
+            if filtres.get("nature"):
+                filtres["nature"] = filtres["nature"].lower()
+            reponse = jsonify({"stats": lire_stats(conn, dimension, filtres)})
+    reponse.set_etag(etag)
+    # Toujours revalider : la réponse change dès qu'un lot d'annonces est inséré
+    reponse.cache_control.no_cache = True
+    return reponse
+
+# Corps compressés ou binaires de /annonces_csv, gardés pour la version courante du jeu
+exports_annonces = CacheExports()
+
+# Récupérer les annonces depuis le fichier Parquet (ou Excel à défaut)
+# ?format= (ou Accept) : json, colonnes, arrow, parquet ; NaN -> null en JSON
 @app.route("/annonces_csv", methods=["GET"])
 def get_annonces_csv():
+    format_ = lire_format(FORMATS_ANNONCES_CSV)
+    encodage = None if format_ in FORMATS_BINAIRES else encodage_accepte(request.accept_encodings)
     try:
-        df = pd.read_excel(csv_file)
-        annonces = df.to_dict(orient="records")
-        return jsonify({"annonces": annonces})
+        # Jeu nettoyé partagé, rechargé seulement quand la source change (voir donnees.py)
+        version, df, _ = jeu_annonces.etat()
+
+        def encoder():
+            corps, type_mime = corps_tableau(table_depuis_dataframe(df), format_)
+            if encodage is not None and len(corps) >= TAILLE_MIN_COMPRESSION:
+                return compresser(corps, encodage), type_mime, encodage
+            return corps, type_mime, None
+
+        if encodage is None and format_ not in FORMATS_BINAIRES:
+            # JSON non compressé : trop volumineux pour être gardé
+            corps, type_mime, encodage_corps = encoder()
+        else:
+            corps, type_mime, encodage_corps = exports_annonces.obtenir(version, (format_, encodage), encoder)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    reponse = Response(corps, mimetype=type_mime)
+    if encodage_corps is not None:
+        reponse.headers["Content-Encoding"] = encodage_corps
+    return reponse
 
 # Lancer le scraping en arrière-plan
+# Corps JSON optionnel : {"natures": ["vente"], "incremental": true}
+# 202 + id de la tâche ; 200 si une tâche identique est déjà en cours (elle est rejointe)
 @app.route("/scrape", methods=["POST"])
 def launch_scraping():
+    corps = request.get_json(silent=True) or {}
     try:
-        from scrapping import scrape_annonces  # Assurez-vous que la fonction est bien définie
-        thread = threading.Thread(target=scrape_annonces)
-        thread.start()
-        return jsonify({"message": "Scraping lancé en arrière-plan !"})
-    except ImportError:
-        return jsonify({"error": "Le fichier scrapping.py est introuvable !"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        tache, nouvelle = gestionnaire_taches.soumettre(corps.get("natures"), bool(corps.get("incremental")))
+    except NaturesOccupees as e:
+        return jsonify({"error": str(e), "taches": sorted(e.taches)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    message = "Scraping lancé en arrière-plan !" if nouvelle else "Scraping déjà en cours pour ces natures"
+    return jsonify({"message": message, **tache.etat()}), 202 if nouvelle else 200
+
+@app.route("/scrape", methods=["GET"])
+def list_scraping():
+    return jsonify({"taches": [t.etat() for t in gestionnaire_taches.lister()]})
+
+# Progression d'une tâche : pages faites / total, annonces, débit
+@app.route("/scrape/<id_tache>", methods=["GET"])
+def get_scraping(id_tache):
+    tache = gestionnaire_taches.obtenir(id_tache)
+    if tache is None:
+        return jsonify({"error": "Tâche inconnue"}), 404
+    return jsonify(tache.etat())
+
+# Annulation (entre deux pages ; le checkpoint permet de reprendre plus tard)
+@app.route("/scrape/<id_tache>", methods=["DELETE"])
+def cancel_scraping(id_tache):
+    tache = gestionnaire_taches.annuler(id_tache)
+    if tache is None:
+        return jsonify({"error": "Tâche inconnue"}), 404
+    return jsonify(tache.etat()), 202
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,352 @@
+import sqlite3
+
+import pandas as pd
+
+from nettoyage import (
+    extraire_type_bien_serie,
+    extraire_ville_serie,
+    nettoyer_prix_serie,
+    nettoyer_superficie_serie,
+)
+
+DB_NAME = "annonces.db"
+
+# Colonnes du scraper -> colonnes de la table annonces
+COLONNES_ANNONCES = {
+    "nature": "nature",
+    "Titre": "titre",
+    "Prix": "prix",
+    "Localisation": "localisation",
+    "Superficie": "superficie",
+    "Pièces": "pieces",
+    "Chambres": "chambres",
+    "Salles de bain": "salles_de_bain",
+    "Lien": "lien",
+}
+
+# Colonnes dérivées (numériques / normalisées) sur lesquelles portent les filtres
+COLONNES_DERIVEES = {
+    "prix_num": "INTEGER",
+    "superficie_num": "INTEGER",
+    "ville": "TEXT",
+    "type_bien": "TEXT",
+}
+
+COLONNES_INSERTION = list(COLONNES_ANNONCES.values()) + list(COLONNES_DERIVEES)
+
+# Index secondaires (filtres de /annonces, médianes de /stats). La clé d'UPSERT
+# `lien` a son propre index unique, conservé pendant un chargement en masse.
+INDEX_ANNONCES = {
+    "idx_annonces_prix": "annonces(prix_num)",
+    "idx_annonces_ville_prix": "annonces(ville, prix_num)",
+    "idx_annonces_type_prix": "annonces(type_bien, prix_num)",
+    "idx_annonces_nature_prix": "annonces(nature, prix_num)",
+    "idx_annonces_nature_type_prix": "annonces(nature, type_bien, prix_num)",
+    "idx_annonces_ville_superficie": "annonces(ville, superficie_num)",
+    # Médiane par groupe de /stats : lecture ordonnée du prix dans le groupe
+    "idx_annonces_groupe_prix": "annonces(nature, type_bien, ville, prix_num)",
+}
+
+# Agrégats matérialisés servis par /stats : clés de regroupement de chaque table stats_<nom>
+TABLES_STATS = {
+    "groupes": ["nature", "type_bien", "ville"],
+    "ville": ["ville"],
+    "type_bien": ["type_bien"],
+    "nature": ["nature"],
+}
+# Sommes maintenues par différence à chaque lot ; la médiane est relue dans les index (clé, prix_num)
+COLONNES_STATS = {
+    "nombre": "INTEGER",
+    "somme_prix": "INTEGER",
+    "nombre_m2": "INTEGER",
+    "somme_prix_m2": "REAL",
+    "prix_median": "REAL",
+}
+
+
+def _entiers_ou_none(serie):
+    return serie.astype("Int64").astype(object).where(serie.notna(), None).tolist()
+
+
+def _texte_ou_none(serie):
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def colonnes_derivees(titres, prix, localisations, superficies):
+    """Colonnes dérivées d'un lot (prix_num, superficie_num, ville, type_bien), nettoyées comme dans le tableau de bord."""
+    return [
+        _entiers_ou_none(nettoyer_prix_serie(prix)),
+        _entiers_ou_none(nettoyer_superficie_serie(superficies)),
+        _texte_ou_none(extraire_ville_serie(localisations)),
+        _texte_ou_none(extraire_type_bien_serie(titres)),
+    ]
+
+
+def _migrer(cursor):
+    """Ajoute les colonnes dérivées aux bases créées avant leur introduction et les remplit."""
+    existantes = {ligne[1] for ligne in cursor.execute("PRAGMA table_info(annonces)")}
+    manquantes = [c for c in COLONNES_DERIVEES if c not in existantes]
+    for colonne in manquantes:
+        cursor.execute(f"ALTER TABLE annonces ADD COLUMN {colonne} {COLONNES_DERIVEES[colonne]}")
+    if manquantes:
+        df = pd.read_sql_query("SELECT id, titre, prix, localisation, superficie FROM annonces", cursor.connection)
+        derivees = colonnes_derivees(df["titre"], df["prix"], df["localisation"], df["superficie"])
+        cursor.executemany(
+            "UPDATE annonces SET prix_num = ?, superficie_num = ?, ville = ?, type_bien = ? WHERE id = ?",
+            zip(*derivees, df["id"].tolist()),
+        )
+
+
+def _dedoublonner_liens(cursor):
+    """Avant l'index unique sur lien : ne garde que la dernière version de chaque annonce."""
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_annonces_lien_unique'").fetchone():
+        return 0
+    cursor.execute("DROP INDEX IF EXISTS idx_annonces_lien")
+    cursor.execute("UPDATE annonces SET lien = NULL WHERE lien = 'N/A'")
+    cursor.execute("""DELETE FROM annonces WHERE lien IS NOT NULL AND id NOT IN
+                      (SELECT MAX(id) FROM annonces WHERE lien IS NOT NULL GROUP BY lien)""")
+    return cursor.rowcount
+
+
+# Initialisation de la base de données
+def init_db(db_name=DB_NAME):
+    with sqlite3.connect(db_name) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS annonces (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            nature TEXT,
+                            titre TEXT,
+                            prix TEXT,
+                            localisation TEXT,
+                            superficie TEXT,
+                            pieces TEXT,
+                            chambres TEXT,
+                            salles_de_bain TEXT,
+                            lien TEXT,
+                            prix_num INTEGER,
+                            superficie_num INTEGER,
+                            ville TEXT,
+                            type_bien TEXT)
+                        ''')
+        _migrer(cursor)
+        supprimees = _dedoublonner_liens(cursor)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_annonces_lien_unique ON annonces(lien)")
+        # Dernière page terminée par nature, pour reprendre un crawl interrompu
+        cursor.execute('''CREATE TABLE IF NOT EXISTS checkpoints (
+                            nature TEXT PRIMARY KEY,
+                            derniere_page INTEGER NOT NULL,
+                            total_pages INTEGER,
+                            maj_le TEXT)
+                        ''')
+        creer_index(cursor)
+        if not _init_stats(cursor) and supprimees:
+            reconstruire_stats(cursor)
+        conn.commit()
+
+
+def creer_index(cursor):
+    for nom, cible in INDEX_ANNONCES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {nom} ON {cible}")
+
+
+def supprimer_index(cursor):
+    """Avant un chargement en masse ; creer_index() les reconstruit ensuite en une passe."""
+    for nom in INDEX_ANNONCES:
+        cursor.execute(f"DROP INDEX IF EXISTS {nom}")
+
+
+def _init_stats(cursor):
+    for nom, cles in TABLES_STATS.items():
+        colonnes = [f"{c} TEXT" for c in cles] + [f"{c} {t}" for c, t in COLONNES_STATS.items()]
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS stats_{nom} ({', '.join(colonnes)})")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_stats_{nom} ON stats_{nom}({', '.join(cles)})")
+    # Incrémentée à chaque rafraîchissement : sert d'ETag aux réponses de /stats
+    cursor.execute("CREATE TABLE IF NOT EXISTS stats_version (version INTEGER NOT NULL)")
+    if cursor.execute("SELECT COUNT(*) FROM stats_version").fetchone()[0] == 0:
+        cursor.execute("INSERT INTO stats_version (version) VALUES (0)")
+        # Première création : calcul complet à partir des annonces déjà présentes
+        reconstruire_stats(cursor)
+        return True
+    return False
+
+
+def lignes_annonces(annonces):
+    """Tuples prêts pour INSERT (colonnes du scraper puis colonnes dérivées).
+
+    `annonces` : liste de dicts du scraper ou DataFrame aux mêmes colonnes.
+    Une seule ligne par lien (la dernière du lot) ; le lien "N/A" du scraper
+    devient NULL pour ne pas fusionner toutes les annonces sans lien.
+    """
+    if len(annonces) == 0:
+        return []
+    if isinstance(annonces, pd.DataFrame):
+        df = annonces.reindex(columns=list(COLONNES_ANNONCES))
+    else:
+        df = pd.DataFrame.from_records(annonces, columns=list(COLONNES_ANNONCES))
+    liens = df["Lien"].where(df["Lien"] != "N/A")
+    df = df.assign(Lien=liens)[~liens.duplicated(keep="last") | liens.isna()]
+    colonnes = [_texte_ou_none(df[champ]) for champ in COLONNES_ANNONCES]
+    colonnes += colonnes_derivees(df["Titre"], df["Prix"], df["Localisation"], df["Superficie"])
+    return list(zip(*colonnes))
+
+
+def clause_filtres(nature=None, type_bien=None, villes=None, prix_min=None, prix_max=None,
+                   superficie_min=None, superficie_max=None):
+    """Conditions SQL (et paramètres) pour les filtres du tableau de bord.
+
+    Chaque condition porte sur une colonne indexée : une ville et une tranche de
+    prix se résolvent par une recherche dans idx_annonces_ville_prix.
+    """
+    conditions, parametres = [], []
+    if nature:
+        # Le scraper stocke les natures en minuscules ("vente", "location")
+        conditions.append("nature = ?")
+        parametres.append(nature.lower())
+    if type_bien:
+        conditions.append("type_bien = ?")
+        parametres.append(type_bien)
+    if villes:
+        conditions.append(f"ville IN ({', '.join('?' * len(villes))})")
+        parametres.extend(villes)
+    for colonne, operateur, valeur in [
+        ("prix_num", ">=", prix_min), ("prix_num", "<=", prix_max),
+        ("superficie_num", ">=", superficie_min), ("superficie_num", "<=", superficie_max),
+    ]:
+        if valeur is not None:
+            conditions.append(f"{colonne} {operateur} ?")
+            parametres.append(valeur)
+    return conditions, parametres
+
+
+def _egalite(cles):
+    # IS plutôt que = : une ville inconnue (NULL) forme un groupe comme les autres
+    return " AND ".join(f"{c} IS ?" for c in cles)
+
+
+def _mettre_a_jour_medianes(cursor, nom, cles, touchees):
+    """Médiane du prix de chaque clé, lue au milieu de l'index (clé, prix_num)."""
+    for cle in touchees:
+        ligne = cursor.execute(f"SELECT nombre FROM stats_{nom} WHERE {_egalite(cles)}", cle).fetchone()
+        if ligne is None:
+            continue
+        nombre = ligne[0]
+        mediane = cursor.execute(
+            f"SELECT AVG(prix_num) FROM (SELECT prix_num FROM annonces "
+            f"WHERE {_egalite(cles)} AND prix_num IS NOT NULL ORDER BY prix_num LIMIT ? OFFSET ?)",
+            (*cle, 2 - nombre % 2, (nombre - 1) // 2),
+        ).fetchone()[0]
+        cursor.execute(f"UPDATE stats_{nom} SET prix_median = ? WHERE {_egalite(cles)}", (mediane, *cle))
+
+
+def reconstruire_stats(cursor):
+    """Recalcule entièrement les tables stats_* à partir de la table annonces.
+
+    Une seule passe sur annonces (parcours séquentiel) pour stats_groupes ; les
+    autres tables somment ses lignes, les compteurs et sommes étant additifs.
+    """
+    for nom, cles in TABLES_STATS.items():
+        cursor.execute(f"DELETE FROM stats_{nom}")
+        if nom == "groupes":
+            cursor.execute(
+                f"""INSERT INTO stats_groupes ({', '.join(cles)}, nombre, somme_prix, nombre_m2, somme_prix_m2)
+                    SELECT {', '.join(cles)}, COUNT(*), SUM(prix_num),
+                           COUNT(CASE WHEN superficie_num > 0 THEN 1 END),
+                           TOTAL(CASE WHEN superficie_num > 0 THEN prix_num * 1.0 / superficie_num END)
+                    FROM annonces NOT INDEXED WHERE prix_num IS NOT NULL GROUP BY {', '.join(cles)}"""
+            )
+        else:
+            cursor.execute(
+                f"""INSERT INTO stats_{nom} ({', '.join(cles)}, nombre, somme_prix, nombre_m2, somme_prix_m2)
+                    SELECT {', '.join(cles)}, SUM(nombre), SUM(somme_prix), SUM(nombre_m2), SUM(somme_prix_m2)
+                    FROM stats_groupes GROUP BY {', '.join(cles)}"""
+            )
+        touchees = cursor.execute(f"SELECT {', '.join(cles)} FROM stats_{nom}").fetchall()
+        _mettre_a_jour_medianes(cursor, nom, cles, touchees)
+    cursor.execute("UPDATE stats_version SET version = version + 1")
+
+
+def rafraichir_stats(cursor, ajoutees=(), retirees=()):
+    """Répercute un lot sur les tables stats_*, sans relire les groupes en entier.
+
+    `ajoutees` / `retirees` : tuples (nature, type_bien, ville, prix_num,
+    superficie_num) des annonces insérées et remplacées, dans la transaction
+    qui a modifié la table annonces. Les lignes ne sont parcourues qu'une fois,
+    par groupe de stats_groupes ; les autres tables somment ces deltas.
+    """
+    colonnes_groupe = TABLES_STATS["groupes"]
+    par_groupe = {}
+    for signe, lignes in ((1, ajoutees), (-1, retirees)):
+        for nature, type_bien, ville, prix, superficie in lignes:
+            if prix is None:
+                continue
+            delta = par_groupe.setdefault((nature, type_bien, ville), [0, 0, 0, 0.0])
+            delta[0] += signe
+            delta[1] += signe * prix
+            if superficie is not None and superficie > 0:
+                delta[2] += signe
+                delta[3] += signe * prix / superficie
+    for nom, cles in TABLES_STATS.items():
+        positions = [colonnes_groupe.index(c) for c in cles]
+        deltas = {}
+        for groupe, valeurs in par_groupe.items():
+            delta = deltas.setdefault(tuple(groupe[i] for i in positions), [0, 0, 0, 0.0])
+            for i, valeur in enumerate(valeurs):
+                delta[i] += valeur
+        for cle, (nombre, somme, nombre_m2, somme_m2) in deltas.items():
+            mise_a_jour = cursor.execute(
+                f"""UPDATE stats_{nom} SET nombre = nombre + ?, somme_prix = somme_prix + ?,
+                    nombre_m2 = nombre_m2 + ?, somme_prix_m2 = somme_prix_m2 + ? WHERE {_egalite(cles)}""",
+                (nombre, somme, nombre_m2, somme_m2, *cle),
+            )
+            if mise_a_jour.rowcount == 0:
+                cursor.execute(
+                    f"INSERT INTO stats_{nom} ({', '.join(cles)}, nombre, somme_prix, nombre_m2, somme_prix_m2) "
+                    f"VALUES ({', '.join('?' * (len(cles) + 4))})",
+                    (*cle, nombre, somme, nombre_m2, somme_m2),
+                )
+        cursor.execute(f"DELETE FROM stats_{nom} WHERE nombre <= 0")
+        _mettre_a_jour_medianes(cursor, nom, cles, deltas)
+    cursor.execute("UPDATE stats_version SET version = version + 1")
+
+
+def valeurs_stats(lignes):
+    """Tuples (nature, type_bien, ville, prix_num, superficie_num) de lignes produites par lignes_annonces."""
+    positions = [COLONNES_INSERTION.index(c) for c in TABLES_STATS["groupes"] + ["prix_num", "superficie_num"]]
+    return [tuple(ligne[i] for i in positions) for ligne in lignes]
+
+
+def valeurs_stats_liens(cursor, liens, taille_lot=500):
+    """{lien: mêmes tuples} pour les annonces déjà stockées sous ces liens (avant leur remplacement)."""
+    colonnes = ", ".join(["lien"] + TABLES_STATS["groupes"] + ["prix_num", "superficie_num"])
+    valeurs = {}
+    liens = list(liens)
+    for debut in range(0, len(liens), taille_lot):
+        lot = liens[debut:debut + taille_lot]
+        valeurs.update((ligne[0], ligne[1:]) for ligne in cursor.execute(
+            f"SELECT {colonnes} FROM annonces WHERE lien IN ({', '.join('?' * len(lot))})", lot,
+        ))
+    return valeurs
+
+
+def version_stats(cursor):
+    return cursor.execute("SELECT version FROM stats_version").fetchone()[0]
+
+
+def lire_stats(cursor, nom, filtres=None):
+    """Lignes de stats_<nom> (nombre, prix moyen / médian, prix moyen au m²), filtrées par clé."""
+    cles = TABLES_STATS[nom]
+    filtres = {c: v for c, v in (filtres or {}).items() if c in cles and v is not None}
+    requete = (f"SELECT {', '.join(cles)}, nombre, somme_prix * 1.0 / nombre, prix_median, "
+               f"somme_prix_m2 / NULLIF(nombre_m2, 0) FROM stats_{nom}")
+    if filtres:
+        requete += " WHERE " + " AND ".join(f"{c} = ?" for c in filtres)
+    requete += " ORDER BY nombre DESC"
+    colonnes = cles + ["nombre", "prix_moyen", "prix_median", "prix_m2_moyen"]
+    return [dict(zip(colonnes, ligne)) for ligne in cursor.execute(requete, list(filtres.values()))]
+
+
+def lire_annonces(conn):
+    """Table annonces avec les noms de colonnes du scraper (Titre, Prix, ...), par id croissant."""
+    colonnes = ", ".join(COLONNES_ANNONCES.values())
+    df = pd.read_sql_query(f"SELECT {colonnes} FROM annonces ORDER BY id", conn)
+    return df.rename(columns={v: k for k, v in COLONNES_ANNONCES.items()})
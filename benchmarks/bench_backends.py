@@ -0,0 +1,65 @@
+"""Comparaison des backends de récupération (selenium / http) : pages/s et mémoire.
+
+Chaque backend tourne dans un sous-processus séparé pour que le pic de mémoire
+(ru_maxrss du processus + navigateurs enfants) ne soit pas pollué par l'autre.
+
+Usage : python -m benchmarks.bench_backends [--pages 20] [--workers 4] [--backends http selenium]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from tests.serveur_fixtures import demarrer_serveur
+from scrapping import NATURES, scrape_annonces
+
+
+def mesurer_backend(backend, base_url, nb_workers):
+    debut = time.monotonic()
+    df = scrape_annonces(NATURES, nb_workers=nb_workers, requetes_par_seconde=0, base_url=base_url,
+                         fichier_sortie=None, backend=backend).lire()
+    duree = time.monotonic() - debut
+    # ru_maxrss est en Ko sous Linux ; RUSAGE_CHILDREN couvre chromedriver/Chrome une fois terminés
+    rss_ko = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_enfants_ko = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"backend": backend, "annonces": len(df), "duree": duree,
+            "rss_mo": rss_ko / 1024, "rss_enfants_mo": rss_enfants_ko / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20, help="pages par nature")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--backends", nargs="+", default=["http", "selenium"])
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.base_url:
+        # Mode sous-processus : un seul backend, résultat en JSON sur la dernière ligne
+        print(json.dumps(mesurer_backend(args.backends[0], args.base_url, args.workers)))
+        return
+
+    serveur, base_url = demarrer_serveur(args.pages)
+    resultats = []
+    try:
+        for backend in args.backends:
+            sortie = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_backends", "--backends", backend,
+                 "--workers", str(args.workers), "--base-url", base_url],
+                capture_output=True, text=True, check=True,
+            )
+            resultats.append(json.loads(sortie.stdout.strip().splitlines()[-1]))
+    finally:
+        serveur.shutdown()
+
+    pages = 2 * args.pages
+    print(f"{'backend':<10} {'annonces':>9} {'pages/s':>9} {'RSS (Mo)':>9} {'navigateurs (Mo)':>17}")
+    for r in resultats:
+        print(f"{r['backend']:<10} {r['annonces']:>9} {pages / r['duree']:>9.1f} "
+              f"{r['rss_mo']:>9.0f} {r['rss_enfants_mo']:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
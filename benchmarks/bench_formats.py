@@ -0,0 +1,95 @@
+"""Formats de /annonces_csv : octets transférés et temps de décodage côté client.
+
+Sert un jeu synthétique nettoyé (Parquet) par l'API (client de test Flask) et
+télécharge le jeu complet dans chaque format / encodage. Le décodage est celui
+d'un client pandas : décompression, puis json.loads + pd.DataFrame,
+pa.ipc.open_stream().read_pandas() ou pd.read_parquet(). La première ligne
+reprend l'ancienne réponse (jsonify de df.to_dict("records"), NaN compris).
+
+Usage : python -m benchmarks.bench_formats [--lignes 200000]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from tests.donnees_synthetiques import generer_annonces
+from nettoyage import nettoyer_annonces
+from stockage import ecrire_annonces
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CAS = [
+    ("json", ""),
+    ("json", "gzip"),
+    ("json", "br"),
+    ("colonnes", ""),
+    ("colonnes", "gzip"),
+    ("colonnes", "br"),
+    ("arrow", ""),
+    ("parquet", ""),
+]
+
+
+def decoder(corps, encodage, format_):
+    if encodage == "gzip":
+        corps = gzip.decompress(corps)
+    elif encodage == "br":
+        corps = brotli.decompress(corps)
+    if format_ == "arrow":
+        return pa.ipc.open_stream(corps).read_pandas()
+    if format_ == "parquet":
+        return pd.read_parquet(io.BytesIO(corps))
+    return pd.DataFrame(json.loads(corps)["annonces"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "annonces.parquet")
+        ecrire_annonces(nettoyer_annonces(generer_annonces(args.lignes)), chemin)
+        os.environ["ANNONCES_SOURCES"] = chemin
+        from app import app, jeu_annonces
+
+        client = app.test_client()
+        df = jeu_annonces.obtenir()
+        print(f"\n{len(df)} annonces")
+        print(f"{'format':<10} {'encodage':<9} {'octets (Mo)':>12} {'serveur (s)':>12} {'décodage (s)':>13}")
+
+        # Ancienne réponse
+        debut = time.perf_counter()
+        with app.app_context():
+            corps = app.json.dumps({"annonces": df.to_dict(orient="records")}).encode()
+        serveur = time.perf_counter() - debut
+        debut = time.perf_counter()
+        decoder(corps, "", "json")
+        print(f"{'ancien':<10} {'-':<9} {len(corps) / 1e6:>12.2f} {serveur:>12.2f} {time.perf_counter() - debut:>13.2f}")
+
+        for format_, encodage in CAS:
+            if encodage == "br" and brotli is None:
+                continue
+            debut = time.perf_counter()
+            reponse = client.get(f"/annonces_csv?format={format_}", headers={"Accept-Encoding": encodage})
+            serveur = time.perf_counter() - debut
+            corps = reponse.get_data()
+            debut = time.perf_counter()
+            decode = decoder(corps, reponse.headers.get("Content-Encoding", ""), format_)
+            duree = time.perf_counter() - debut
+            assert len(decode) == len(df)
+            print(f"{format_:<10} {encodage or '-':<9} {len(corps) / 1e6:>12.2f} {serveur:>12.2f} {duree:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
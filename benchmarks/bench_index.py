@@ -0,0 +1,79 @@
+"""Latence de filtrage : masques chaînés sur df.copy() contre IndexAnnonces.
+
+Mesure, pour quelques états de filtre typiques, le temps de la sélection des
+lignes et des agrégats par (nature, type_bien, Ville) lus par les graphiques.
+
+Usage : python -m benchmarks.bench_index [--lignes 1000000]
+"""
+import argparse
+import time
+
+from tests.donnees_synthetiques import generer_annonces
+from index_filtres import COLONNES_GROUPE, IndexAnnonces
+from nettoyage import nettoyer_annonces
+
+ETATS = [
+    ("Tous", "Tous", None, "Toutes"),
+    ("Vente", "Appartement", None, ["Tunis"]),
+    ("Tous", "Tous", [100_000, 500_000], "Toutes"),
+    ("Location", "Tous", [500, 5_000], ["Tunis", "La Marsa"]),
+]
+
+
+def agreger_groupes(dataframe):
+    """Ancien calcul des agrégats (nombre, somme_prix) par groupe via groupby."""
+    return (
+        dataframe.groupby(COLONNES_GROUPE, observed=True, sort=False)["Prix_nettoye"]
+        .agg(nombre="size", somme_prix="sum")
+        .reset_index()
+    )
+
+
+def filtrer_masques(df, nature, type_bien, prix_range, villes):
+    """Ancien chemin de update_charts."""
+    filtered_df = df.copy()
+    if nature != 'Tous':
+        filtered_df = filtered_df[filtered_df['nature'] == nature]
+    if type_bien != 'Tous':
+        filtered_df = filtered_df[filtered_df['type_bien'] == type_bien]
+    if prix_range is not None:
+        filtered_df = filtered_df[(filtered_df['Prix_nettoye'] >= prix_range[0]) &
+                                  (filtered_df['Prix_nettoye'] <= prix_range[1])]
+    if isinstance(villes, list):
+        filtered_df = filtered_df[filtered_df['Ville'].isin(villes)]
+    return agreger_groupes(filtered_df)
+
+
+def filtrer_index(index, nature, type_bien, prix_range, villes):
+    positions = index.selection(nature, type_bien, prix_range, villes)
+    return index.agregats(nature, type_bien, prix_range, villes, positions=positions)
+
+
+def mesurer(fonction, *args, repetitions=5):
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction(*args)
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = nettoyer_annonces(generer_annonces(args.lignes))
+    debut = time.perf_counter()
+    index = IndexAnnonces(df)
+    print(f"{len(df):,} annonces, index construit en {time.perf_counter() - debut:.2f} s")
+
+    print(f"{'filtre':<55} {'masques (ms)':>13} {'index (ms)':>11}")
+    for etat in ETATS:
+        t_masques = mesurer(filtrer_masques, df, *etat)
+        t_index = mesurer(filtrer_index, index, *etat)
+        print(f"{str(etat):<55} {t_masques:>13.1f} {t_index:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
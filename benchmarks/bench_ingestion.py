@@ -0,0 +1,94 @@
+"""Débit de l'ingestion SQLite (lignes/s) sur des annonces synthétiques.
+
+Scénarios, dans une base temporaire sur disque :
+- chargement initial avec index différés (reconstruits en fin d'import), puis
+  le même chargement réparti entre l'écriture des lots et la finalisation
+  (index, /stats, ANALYZE), coût fixe qui ne dépend pas de la taille des lots ;
+- chargement avec tous les index et la mise à jour incrémentale de /stats ;
+- ré-ingestion des mêmes annonces (UPSERT sur des annonces inchangées) ;
+- lots d'une page du scraper (30 annonces) dans la base remplie.
+Le débit total inclut le calcul des colonnes dérivées (prix_num, ville, ...)
+par le nettoyage pandas ; la colonne « SQLite » le retire pour isoler
+l'écriture elle-même.
+
+Usage : python -m benchmarks.bench_ingestion [--lignes 500000] [--taille-lot 50000] [--pages 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from tests.donnees_synthetiques import generer_annonces
+from base_donnees import lignes_annonces, supprimer_index
+from ingestion import connecter, finaliser_chargement, ingerer, ingerer_lot
+
+ANNONCES_PAR_PAGE = 30
+
+
+def lots_synthetiques(nb_lignes, taille_lot):
+    brutes = generer_annonces(nb_lignes).rename(columns={"type_de_bien": "nature"})
+    return [brutes.iloc[debut:debut + taille_lot] for debut in range(0, nb_lignes, taille_lot)]
+
+
+def chronometrer(fonction):
+    debut = time.perf_counter()
+    resultat = fonction()
+    return resultat, time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, default=500_000)
+    parser.add_argument("--taille-lot", type=int, default=50_000)
+    parser.add_argument("--pages", type=int, default=200, help="lots de 30 annonces du dernier scénario")
+    args = parser.parse_args()
+
+    lots = lots_synthetiques(args.lignes, args.taille_lot)
+    # Nouvelles annonces pour le scénario page par page (liens distincts des lots initiaux)
+    pages = generer_annonces(args.pages * ANNONCES_PAR_PAGE, graine=1).rename(columns={"type_de_bien": "nature"})
+    pages["Lien"] = pages["Lien"] + "-page"
+
+    # Coût du nettoyage seul, retiré du débit pour la colonne « SQLite »
+    _, derivation_lots = chronometrer(lambda: [lignes_annonces(lot) for lot in lots])
+    _, derivation_pages = chronometrer(lambda: [
+        lignes_annonces(pages.iloc[debut:debut + ANNONCES_PAR_PAGE])
+        for debut in range(0, len(pages), ANNONCES_PAR_PAGE)
+    ])
+
+    resultats = []
+    with tempfile.TemporaryDirectory() as dossier:
+        conn = connecter(os.path.join(dossier, "differe.db"))
+        total, duree = chronometrer(lambda: ingerer(conn, lots, differer_index=True))
+        resultats.append(("chargement, index différés", total, duree, derivation_lots))
+        # Même finalisation sur la même table, chronométrée seule
+        with conn:
+            supprimer_index(conn)
+        _, finalisation = chronometrer(lambda: finaliser_chargement(conn))
+        resultats.append(("  dont écriture des lots", total, duree - finalisation, derivation_lots))
+        conn.close()
+
+        conn = connecter(os.path.join(dossier, "annonces.db"))
+        total, duree = chronometrer(lambda: ingerer(conn, lots))
+        resultats.append(("chargement, index + /stats", total, duree, derivation_lots))
+
+        total, duree = chronometrer(lambda: ingerer(conn, lots))
+        resultats.append(("ré-ingestion (UPSERT)", total, duree, derivation_lots))
+
+        def par_page():
+            return sum(
+                ingerer_lot(conn, pages.iloc[debut:debut + ANNONCES_PAR_PAGE])
+                for debut in range(0, len(pages), ANNONCES_PAR_PAGE)
+            )
+        total, duree = chronometrer(par_page)
+        resultats.append((f"pages de {ANNONCES_PAR_PAGE} annonces", total, duree, derivation_pages))
+        conn.close()
+
+    print(f"\n{'scénario':<30} {'lignes':>9} {'durée (s)':>10} {'lignes/s':>10} {'SQLite (lignes/s)':>18}")
+    for nom, total, duree, derivation in resultats:
+        print(f"{nom:<30} {total:>9} {duree:>10.2f} {total / duree:>10.0f} {total / (duree - derivation):>18.0f}")
+    print(f"\n{duree / args.pages * 1000:.1f} ms par page de {ANNONCES_PAR_PAGE} annonces")
+    print(f"Finalisation du chargement à index différés : {finalisation:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
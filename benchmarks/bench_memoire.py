@@ -0,0 +1,47 @@
+"""Mémoire du jeu d'annonces tenu par un worker du tableau de bord.
+
+Compare, pour plusieurs volumes, le DataFrame complet (Excel nettoyé à la
+volée, ou Parquet relu) et le jeu compact de donnees.jeu_compact : colonnes
+des graphiques seulement, textes dans une table Arrow (source Excel) ou lus
+dans le fichier à la demande (source Parquet). La mémoire est celle des
+colonnes (memory_usage(deep=True)) plus celle des textes gardés en mémoire ;
+l'index des filtres, identique dans les deux cas, n'est pas compté.
+
+Usage : python -m benchmarks.bench_memoire [--lignes 10000 100000]
+"""
+import argparse
+import os
+import tempfile
+
+from tests.donnees_synthetiques import generer_annonces
+from donnees import charger_jeu, charger_jeu_compact
+from demarrage import PhasesDemarrage
+from stockage import ecrire_annonces
+
+
+def memoire(df, textes=None):
+    return df.memory_usage(deep=True).sum() + (textes.nbytes if textes is not None else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'annonces':>9} {'source':<8} {'complet (Mo)':>13} {'compact (Mo)':>13} {'dont textes':>12} {'réduction':>10}")
+    with tempfile.TemporaryDirectory() as dossier:
+        for nb_lignes in args.lignes:
+            brut = generer_annonces(nb_lignes)
+            chemins = {"xlsx": os.path.join(dossier, "annonces.xlsx"), "parquet": os.path.join(dossier, "annonces.parquet")}
+            brut.to_excel(chemins["xlsx"], index=False)
+            ecrire_annonces(charger_jeu(chemins["xlsx"], PhasesDemarrage()), chemins["parquet"])
+            for source, chemin in chemins.items():
+                complet = memoire(charger_jeu(chemin, PhasesDemarrage()))
+                df, textes = charger_jeu_compact(chemin, PhasesDemarrage())
+                compact = memoire(df, textes)
+                print(f"{nb_lignes:>9} {source:<8} {complet / 1e6:>13.1f} {compact / 1e6:>13.1f} "
+                      f"{textes.nbytes / 1e6:>12.1f} {complet / compact:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
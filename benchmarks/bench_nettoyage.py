@@ -0,0 +1,52 @@
+"""Parité et vitesse du nettoyage vectorisé face à l'ancienne version apply().
+
+Les cas limites sont couverts par tests/test_nettoyage.py.
+
+Usage : python -m benchmarks.bench_nettoyage [--tailles 10000 100000 1000000]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from tests.donnees_synthetiques import generer_annonces
+from nettoyage import nettoyer_annonces, nettoyer_annonces_ligne
+
+COLONNES = ["Prix_nettoye", "Ville", "type_bien", "nature", "Superficie_nettoye", "prix_m2", "categorie_prix"]
+
+
+def verifier_parite(brut):
+    """Lève une AssertionError si les deux implémentations divergent."""
+    attendu = nettoyer_annonces_ligne(brut)
+    obtenu = nettoyer_annonces(brut)
+    pd.testing.assert_index_equal(obtenu.index, attendu.index)
+    for colonne in COLONNES:
+        pd.testing.assert_series_equal(obtenu[colonne], attendu[colonne], check_dtype=True, check_names=False)
+
+
+def chronometrer(fonction, brut):
+    debut = time.perf_counter()
+    fonction(brut)
+    return time.perf_counter() - debut
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tailles", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    # Parité sur les vraies données et sur un échantillon synthétique
+    verifier_parite(pd.read_excel("Mubawab_Annonces.xlsx"))
+    verifier_parite(generer_annonces(20_000))
+    print("✅ Parité vérifiée (données réelles + synthétiques)")
+
+    print(f"{'lignes':>10} {'apply (s)':>12} {'vectorisé (s)':>14} {'gain':>8}")
+    for taille in args.tailles:
+        brut = generer_annonces(taille)
+        t_ligne = chronometrer(nettoyer_annonces_ligne, brut)
+        t_vect = chronometrer(nettoyer_annonces, brut)
+        print(f"{taille:>10,} {t_ligne:>12.3f} {t_vect:>14.3f} {t_ligne / t_vect:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Taille et temps de construction du nuage prix / superficie.
+
+Compare, pour plusieurs volumes d'annonces nettoyées, l'ancien px.scatter
+(tous les points, Titre / Prix / Ville en hover) et figure_nuage (Scattergl,
+échantillon stratifié au-delà du seuil, détail au clic). La taille mesurée
+est celle du JSON de la figure, c'est-à-dire ce que le callback envoie au
+navigateur.
+
+Usage : python -m benchmarks.bench_nuage [--lignes 10000 100000 500000]
+"""
+import argparse
+import time
+
+import plotly.express as px
+
+from tests.donnees_synthetiques import generer_annonces
+from nettoyage import nettoyer_annonces
+from nuage_points import figure_nuage
+
+COULEURS = {
+    'Appartement': '#1f77b4',
+    'Villa': '#ff7f0e',
+    'Terrain': '#2ca02c',
+    'Maison': '#d62728',
+    'Autre': '#9467bd',
+}
+
+
+def nuage_complet(df):
+    """Ancienne figure 5 du tableau de bord (nuage complet)."""
+    return px.scatter(
+        df.dropna(subset=['Superficie_nettoye']),
+        x='Superficie_nettoye',
+        y='Prix_nettoye',
+        color='type_bien',
+        color_discrete_map=COULEURS,
+        opacity=0.7,
+        hover_data=['Titre', 'Prix', 'Ville']
+    )
+
+
+def mesurer(fonction, df):
+    debut = time.perf_counter()
+    json_figure = fonction(df).to_json()
+    return time.perf_counter() - debut, len(json_figure.encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    print(f"{'annonces':>9} {'px.scatter (Mo)':>16} {'(s)':>6} {'figure_nuage (Mo)':>18} {'(s)':>6} {'réduction':>10}")
+    for nb_lignes in args.lignes:
+        df = nettoyer_annonces(generer_annonces(nb_lignes))
+        duree_avant, taille_avant = mesurer(nuage_complet, df)
+        duree_apres, taille_apres = mesurer(lambda d: figure_nuage(d, COULEURS), df)
+        print(f"{nb_lignes:>9} {taille_avant / 1e6:>16.2f} {duree_avant:>6.2f} {taille_apres / 1e6:>18.2f} "
+              f"{duree_apres:>6.2f} {taille_avant / taille_apres:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Débit de l'analyse HTML du scraper (annonces/s) selon le parseur et le nombre de processus.
+
+Les pages de listing du serveur de fixtures sont enregistrées sur disque puis
+relues, pour ne mesurer que l'analyse : chaque page passe par
+analyse_pages.AnalyseurPages comme dans scrape_annonces (0 processus : analyse
+dans le thread appelant). Le pool est démarré avant la mesure. Les annonces
+extraites doivent être identiques pour tous les parseurs.
+
+Usage : python -m benchmarks.bench_parsing [--pages 200] [--processus 0 1 2 4]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from analyse_pages import AnalyseurPages, parseurs_disponibles
+from tests.serveur_fixtures import generer_page
+
+URL_PART = "immobilier-a-vendre"
+
+
+def enregistrer_pages(dossier, nb_pages, annonces_par_page):
+    chemins = []
+    for page in range(1, nb_pages + 1):
+        chemin = os.path.join(dossier, f"{URL_PART}-p{page}.html")
+        with open(chemin, "w", encoding="utf-8") as f:
+            f.write(generer_page(URL_PART, page, nb_pages, annonces_par_page))
+        chemins.append(chemin)
+    return chemins
+
+
+def mesurer(pages, parseur, nb_processus):
+    """(annonces extraites, durée en s) de l'analyse de toutes les pages."""
+    analyseur = AnalyseurPages(parseur, nb_processus)
+    try:
+        # Démarrage des processus hors mesure
+        for future in [analyseur.soumettre(pages[0], "vente") for _ in range(nb_processus)]:
+            future.result()
+        debut = time.perf_counter()
+        futures = [analyseur.soumettre(html, "vente") for html in pages]
+        annonces = [annonce for future in futures for annonce in future.result()[1]]
+        return annonces, time.perf_counter() - debut
+    finally:
+        analyseur.fermer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--annonces", type=int, default=30, help="annonces par page")
+    parser.add_argument("--processus", type=int, nargs="+", default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        pages = []
+        for chemin in enregistrer_pages(dossier, args.pages, args.annonces):
+            with open(chemin, encoding="utf-8") as f:
+                pages.append(f.read())
+
+    print(f"\n{args.pages} pages, {args.annonces} annonces par page, {os.cpu_count()} CPU")
+    print(f"{'parseur':<12} {'processus':>9} {'annonces':>9} {'annonces/s':>11} {'pages/s':>8}")
+    reference = None
+    for parseur in reversed(parseurs_disponibles()):
+        for nb_processus in args.processus:
+            annonces, duree = mesurer(pages, parseur, nb_processus)
+            if reference is None:
+                reference = annonces
+            assert annonces == reference, f"{parseur} : annonces différentes de html.parser"
+            print(f"{parseur:<12} {nb_processus:>9} {len(annonces):>9} {len(annonces) / duree:>11.0f} "
+                  f"{len(pages) / duree:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
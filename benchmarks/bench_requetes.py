@@ -0,0 +1,90 @@
+"""Requêtes filtrées de /annonces : recherche par index contre parcours complet.
+
+Remplit une base temporaire d'annonces synthétiques (1M par défaut) via
+init_db()/lignes_annonces(), puis chronomètre chaque filtre du tableau de bord
+avec les index composites et avec `NOT INDEXED`, en affichant le plan SQLite.
+
+Usage : python -m benchmarks.bench_requetes [--lignes 1000000] [--repetitions 5]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from base_donnees import COLONNES_ANNONCES, COLONNES_INSERTION, clause_filtres, init_db, lignes_annonces
+from tests.donnees_synthetiques import generer_annonces
+
+TAILLE_LOT = 100_000
+
+REQUETES = {
+    "ville + tranche de prix": dict(villes=["La Marsa"], prix_min=200_000, prix_max=250_000),
+    "type + tranche de prix": dict(type_bien="Villa", prix_min=1_000_000, prix_max=1_020_000),
+    "nature + type + prix": dict(nature="Vente", type_bien="Appartement", prix_min=500_000, prix_max=510_000),
+    "villes + superficie": dict(villes=["Carthage", "Ariana"], superficie_min=100, superficie_max=110),
+}
+
+
+def remplir(chemin, nb_lignes):
+    init_db(chemin)
+    conn = sqlite3.connect(chemin)
+    insertion = (f"INSERT INTO annonces ({', '.join(COLONNES_INSERTION)}) "
+                 f"VALUES ({', '.join('?' * len(COLONNES_INSERTION))})")
+    for debut in range(0, nb_lignes, TAILLE_LOT):
+        taille = min(TAILLE_LOT, nb_lignes - debut)
+        brutes = generer_annonces(taille, graine=debut).rename(columns={"type_de_bien": "nature"})
+        annonces = brutes.reindex(columns=list(COLONNES_ANNONCES)).to_dict("records")
+        with conn:
+            conn.executemany(insertion, lignes_annonces(annonces))
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def requete(filtres, sans_index=False):
+    conditions, parametres = clause_filtres(**filtres)
+    source = "annonces NOT INDEXED" if sans_index else "annonces"
+    sql = f"SELECT id, prix_num, ville FROM {source} WHERE {' AND '.join(conditions)} ORDER BY id"
+    return sql, parametres
+
+
+def chronometrer(conn, sql, parametres, repetitions):
+    meilleur, nb = float("inf"), 0
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        nb = len(conn.execute(sql, parametres).fetchall())
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur, nb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, default=1_000_000)
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        debut = time.monotonic()
+        conn = remplir(os.path.join(dossier, "annonces.db"), args.lignes)
+        print(f"{args.lignes} annonces insérées en {time.monotonic() - debut:.1f} s\n")
+
+        print(f"{'filtre':<26} {'lignes':>7} {'index (ms)':>11} {'scan (ms)':>10} {'gain':>7}")
+        plans = []
+        for nom, filtres in REQUETES.items():
+            sql, parametres = requete(filtres)
+            duree_index, nb = chronometrer(conn, sql, parametres, args.repetitions)
+            sql_scan, _ = requete(filtres, sans_index=True)
+            duree_scan, _ = chronometrer(conn, sql_scan, parametres, args.repetitions)
+            print(f"{nom:<26} {nb:>7} {duree_index * 1000:>11.2f} {duree_scan * 1000:>10.1f} "
+                  f"{duree_scan / duree_index:>6.0f}x")
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametres).fetchall()
+            plans.append((nom, [ligne[-1] for ligne in plan]))
+        conn.close()
+
+    print("\nPlans (avec index) :")
+    for nom, details in plans:
+        print(f"  {nom} : {' | '.join(details)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Débit du scraper (pages/min) contre le serveur de fixtures local, selon le nombre de workers.
+
+Nécessite Chrome (comme scrapping.py). Aucune requête ne sort de la machine.
+
+Usage : python -m benchmarks.bench_scraping [--pages 20] [--workers 1 2 4] [--latence 0.2]
+"""
+import argparse
+import time
+
+from tests.serveur_fixtures import demarrer_serveur
+from scrapping import NATURES, scrape_annonces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20, help="pages par nature")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latence", type=float, default=0.2, help="latence simulée du serveur (s)")
+    parser.add_argument("--rps", type=float, default=0, help="limite de politesse (0 = aucune)")
+    args = parser.parse_args()
+
+    serveur, base_url = demarrer_serveur(args.pages, latence=args.latence)
+    resultats = []
+    try:
+        for nb_workers in args.workers:
+            debut = time.monotonic()
+            df = scrape_annonces(NATURES, nb_workers=nb_workers, requetes_par_seconde=args.rps,
+                                 base_url=base_url, fichier_sortie=None).lire()
+            duree = time.monotonic() - debut
+            resultats.append((nb_workers, len(df), 2 * args.pages / duree * 60))
+    finally:
+        serveur.shutdown()
+
+    print(f"\n{'workers':>8} {'annonces':>9} {'pages/min':>10}")
+    for nb_workers, nb_annonces, pages_min in resultats:
+        print(f"{nb_workers:>8} {nb_annonces:>9} {pages_min:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Temps de chargement : Excel (openpyxl + nettoyage) contre Parquet / Arrow IPC typés.
+
+Usage : python -m benchmarks.bench_stockage [--tailles 10000 100000] [--dossier /tmp]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from tests.donnees_synthetiques import generer_annonces
+from nettoyage import nettoyer_annonces
+from stockage import charger_annonces, charger_source, ecrire_annonces
+
+
+def chronometrer(fonction, *args):
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    return time.perf_counter() - debut, resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tailles", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dossier", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    print(f"{'lignes':>10} {'format':<10} {'écriture (s)':>13} {'lecture (s)':>12} {'taille (Mo)':>12}")
+    for taille in args.tailles:
+        brut = generer_annonces(taille)
+        nettoye = nettoyer_annonces(brut)
+        chemins = {
+            "xlsx": os.path.join(args.dossier, f"bench_{taille}.xlsx"),
+            "parquet": os.path.join(args.dossier, f"bench_{taille}.parquet"),
+            "feather": os.path.join(args.dossier, f"bench_{taille}.feather"),
+        }
+        ecritures = {
+            "xlsx": lambda: brut.to_excel(chemins["xlsx"], index=False),
+            "parquet": lambda: ecrire_annonces(nettoye, chemins["parquet"]),
+            "feather": lambda: ecrire_annonces(nettoye, chemins["feather"]),
+        }
+        for format_, chemin in chemins.items():
+            t_ecriture, _ = chronometrer(ecritures[format_])
+            # L'Excel est brut : sa lecture inclut le nettoyage, comme au chargement du tableau de bord
+            lecture = charger_source if format_ == "xlsx" else charger_annonces
+            t_lecture, _ = chronometrer(lecture, chemin)
+            taille_mo = os.path.getsize(chemin) / 1e6
+            print(f"{taille:>10,} {format_:<10} {t_ecriture:>13.2f} {t_lecture:>12.3f} {taille_mo:>12.1f}")
+            os.remove(chemin)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Test de charge du curseur de prix : profondeur de la file de callbacks.
+
+Lance le tableau de bord (serveur Werkzeug multi-thread) sur un jeu
+synthétique, puis simule plusieurs utilisateurs qui font glisser le curseur
+de prix : chaque glissement envoie une suite de valeurs rapprochées, sans
+attendre les réponses, comme le navigateur. Trois scénarios :
+- toutes les valeurs, sans coalescence serveur ;
+- toutes les valeurs, la dernière demande de chaque page gagne ;
+- anti-rebond navigateur (seule la valeur finale d'un glissement part) + coalescence.
+On relève le nombre de callbacks en cours (échantillonné), les abandons et
+le délai entre la dernière valeur d'un glissement et sa réponse.
+
+Usage : python -m benchmarks.charge_curseur [--lignes 200000] [--utilisateurs 8] [--glissements 3] [--valeurs 10]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+import requests
+
+from tests.donnees_synthetiques import generer_annonces
+from nettoyage import nettoyer_annonces
+from stockage import ecrire_annonces
+
+PORT = 8765
+
+
+class Echantillonneur(threading.Thread):
+    """Relève périodiquement le nombre de callbacks en cours."""
+
+    def __init__(self, lire, periode=0.005):
+        super().__init__(daemon=True)
+        self.lire = lire
+        self.periode = periode
+        self.valeurs = []
+        self.arret = threading.Event()
+
+    def run(self):
+        while not self.arret.is_set():
+            self.valeurs.append(self.lire())
+            time.sleep(self.periode)
+
+
+def charge_utile(dependance, plage, session):
+    """Corps d'une requête /_dash-update-component pour update_charts."""
+    valeurs = {"nature-dropdown": "Tous", "type-dropdown": "Tous", "prix-filtre": plage, "ville-dropdown": "Toutes"}
+    sorties = [o.rsplit(".", 1) for o in dependance["output"].strip(".").split("...")]
+    return {
+        "output": dependance["output"],
+        "outputs": [{"id": i, "property": p} for i, p in sorties],
+        "inputs": [dict(entree, value=valeurs[entree["id"]]) for entree in dependance["inputs"]],
+        "state": [
+            {"id": "signatures-sorties", "property": "data", "value": None},
+            {"id": "session-id", "property": "data", "value": session},
+        ],
+        "changedPropIds": ["prix-filtre.data"],
+    }
+
+
+def utilisateur(url, dependance, graine, args, anti_rebond, delais):
+    rng = np.random.default_rng(graine)
+    session = uuid.uuid4().hex
+    fils = []
+    for _ in range(args.glissements):
+        debut = int(rng.integers(0, 1_000_000))
+        fins = np.sort(rng.integers(debut + 10_000, 3_000_000, size=args.valeurs))
+        plages = [[debut, int(fin)] for fin in fins]
+        if anti_rebond:
+            # Les valeurs arrivent plus vite que le délai d'anti-rebond : seule la dernière part
+            plages = plages[-1:]
+        for i, plage in enumerate(plages):
+            derniere = i == len(plages) - 1
+
+            def envoyer(plage=plage, derniere=derniere):
+                envoi = time.perf_counter()
+                requests.post(url, json=charge_utile(dependance, plage, session), timeout=600)
+                if derniere:
+                    delais.append(time.perf_counter() - envoi)
+
+            fil = threading.Thread(target=envoyer)
+            fil.start()
+            fils.append(fil)
+            time.sleep(args.intervalle)
+        time.sleep(args.pause)
+    for fil in fils:
+        fil.join()
+
+
+def scenario(dashboard, url, dependance, args, coalescence, anti_rebond):
+    from coalescence import DernierGagnant
+
+    dashboard.coalescence = DernierGagnant(actif=coalescence)
+    dashboard.cache_figures.invalider()
+    echantillonneur = Echantillonneur(lambda: dashboard.coalescence.en_cours)
+    echantillonneur.start()
+    delais = []
+    debut = time.perf_counter()
+    fils = [
+        threading.Thread(target=utilisateur, args=(url, dependance, graine, args, anti_rebond, delais))
+        for graine in range(args.utilisateurs)
+    ]
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    duree = time.perf_counter() - debut
+    echantillonneur.arret.set()
+    echantillonneur.join()
+    profondeur = np.array(echantillonneur.valeurs or [0])
+    return {
+        "demandes": dashboard.coalescence.demandes,
+        "abandons": dashboard.coalescence.abandons,
+        "file_moyenne": profondeur.mean(),
+        "file_max": dashboard.coalescence.en_cours_max,
+        "delai_p50": np.percentile(delais, 50),
+        "delai_p95": np.percentile(delais, 95),
+        "duree": duree,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, default=200_000)
+    parser.add_argument("--utilisateurs", type=int, default=8)
+    parser.add_argument("--glissements", type=int, default=3, help="glissements par utilisateur")
+    parser.add_argument("--valeurs", type=int, default=10, help="valeurs envoyées par glissement")
+    parser.add_argument("--intervalle", type=float, default=0.03, help="entre deux valeurs d'un glissement (s)")
+    parser.add_argument("--pause", type=float, default=0.5, help="entre deux glissements (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "annonces.parquet")
+        ecrire_annonces(nettoyer_annonces(generer_annonces(args.lignes)), chemin)
+        # Le jeu partagé lit ANNONCES_SOURCES à l'import
+        os.environ["ANNONCES_SOURCES"] = chemin
+        import dashboard
+        from werkzeug.serving import make_server
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        serveur = make_server("127.0.0.1", PORT, dashboard.app.server, threaded=True)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{PORT}"
+        requests.get(base + "/", timeout=600)
+        dependance = next(d for d in requests.get(base + "/_dash-dependencies", timeout=60).json()
+                          if "signatures-sorties" in d["output"])
+        url = base + "/_dash-update-component"
+
+        resultats = []
+        for nom, coalescence, anti_rebond in [
+            ("sans coalescence", False, False),
+            ("dernière demande gagne", True, False),
+            ("anti-rebond + coalescence", True, True),
+        ]:
+            resultats.append((nom, scenario(dashboard, url, dependance, args, coalescence, anti_rebond)))
+        serveur.shutdown()
+
+    print(f"\n{args.utilisateurs} utilisateurs, {args.glissements} glissements de {args.valeurs} valeurs, {args.lignes} annonces")
+    print(f"{'scénario':<28} {'demandes':>9} {'abandons':>9} {'file moy.':>10} {'file max':>9} "
+          f"{'délai p50 (s)':>14} {'délai p95 (s)':>14} {'durée (s)':>10}")
+    for nom, r in resultats:
+        print(f"{nom:<28} {r['demandes']:>9} {r['abandons']:>9} {r['file_moyenne']:>10.1f} {r['file_max']:>9} "
+              f"{r['delai_p50']:>14.2f} {r['delai_p95']:>14.2f} {r['duree']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
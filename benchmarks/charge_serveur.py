@@ -0,0 +1,166 @@
+"""Test de charge du mode production (gunicorn) : latences et débit selon le nombre de workers.
+
+Prépare un jeu synthétique (base SQLite pour /annonces, Parquet pour le
+tableau de bord), puis lance pour chaque nombre de workers l'API
+(wsgi_api:app) et le tableau de bord (wsgi_dashboard:app) avec
+gunicorn.conf.py. Des clients concurrents envoient :
+- GET /annonces filtré (ville, tranche de prix aléatoires) ;
+- le callback principal du tableau de bord (update_charts) avec une plage de
+  prix aléatoire, donc le plus souvent hors du cache des figures.
+On relève p50 / p95 / p99 de la latence, les requêtes par seconde et la
+mémoire (PSS) de l'ensemble maître + workers, qui montre le partage des pages
+chargées avant le fork.
+
+Usage : python -m benchmarks.charge_serveur [--lignes 200000] [--workers 1 4 8] [--clients 16] [--requetes 400]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+import requests
+
+from benchmarks.bench_requetes import remplir
+from benchmarks.charge_curseur import charge_utile
+from tests.donnees_synthetiques import generer_annonces
+from nettoyage import nettoyer_annonces
+from stockage import ecrire_annonces
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8766
+VILLES = ["Tunis", "La Marsa", "Ariana", "Carthage", "Sousse"]
+
+
+def pss_mo(pid):
+    """PSS (Mo) du processus et de ses enfants directs, ou None hors Linux."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids = [pid] + [int(p) for p in f.read().split()]
+        total = 0
+        for p in pids:
+            with open(f"/proc/{p}/smaps_rollup") as f:
+                total += next(int(l.split()[1]) for l in f if l.startswith("Pss:"))
+        return total / 1024
+    except (OSError, StopIteration, ValueError):
+        return None
+
+
+def lancer(module, nb_workers, dossier, env):
+    commande = [sys.executable, "-m", "gunicorn", "-c", os.path.join(RACINE, "gunicorn.conf.py"),
+                "--workers", str(nb_workers), "-b", f"127.0.0.1:{PORT}", "--chdir", dossier,
+                "--pythonpath", RACINE, "--log-level", "warning", module]
+    processus = subprocess.Popen(commande, env=env)
+    base = f"http://127.0.0.1:{PORT}"
+    limite = time.monotonic() + 600
+    while time.monotonic() < limite:
+        try:
+            requests.get(base + "/", timeout=5)
+            return processus, base
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    processus.terminate()
+    raise RuntimeError(f"{module} ne répond pas")
+
+
+def arreter(processus):
+    processus.terminate()
+    processus.wait(timeout=60)
+
+
+def tirer(envoyer, nb_requetes, nb_clients):
+    """Latences (s) de nb_requetes réparties entre nb_clients threads, et durée totale."""
+    latences = []
+    compteur = iter(range(nb_requetes))
+    verrou = threading.Lock()
+
+    def client(graine):
+        rng = np.random.default_rng(graine)
+        session = requests.Session()
+        while True:
+            with verrou:
+                if next(compteur, None) is None:
+                    return
+            debut = time.perf_counter()
+            envoyer(session, rng)
+            duree = time.perf_counter() - debut
+            with verrou:
+                latences.append(duree)
+
+    fils = [threading.Thread(target=client, args=(graine,)) for graine in range(nb_clients)]
+    debut = time.perf_counter()
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    return np.array(latences), time.perf_counter() - debut
+
+
+def scenario_api(base):
+    def envoyer(session, rng):
+        prix_min = int(rng.integers(0, 2_500_000))
+        reponse = session.get(base + "/annonces", params={
+            "limit": 100, "ville": VILLES[rng.integers(len(VILLES))],
+            "min_prix": prix_min, "max_prix": prix_min + 500_000,
+        }, timeout=600)
+        reponse.raise_for_status()
+    return envoyer
+
+
+def scenario_tableau(base):
+    dependance = next(d for d in requests.get(base + "/_dash-dependencies", timeout=60).json()
+                      if "signatures-sorties" in d["output"])
+
+    def envoyer(session, rng):
+        debut = int(rng.integers(0, 1_000_000))
+        plage = [debut, int(rng.integers(debut + 10_000, 3_000_000))]
+        # Une session par requête : pas d'abandon par la coalescence
+        reponse = session.post(base + "/_dash-update-component",
+                               json=charge_utile(dependance, plage, uuid.uuid4().hex), timeout=600)
+        reponse.raise_for_status()
+    return envoyer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lignes", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requetes", type=int, default=400)
+    args = parser.parse_args()
+
+    resultats = []
+    with tempfile.TemporaryDirectory() as dossier:
+        remplir(os.path.join(dossier, "annonces.db"), args.lignes).close()
+        parquet = os.path.join(dossier, "annonces.parquet")
+        ecrire_annonces(nettoyer_annonces(generer_annonces(args.lignes)), parquet)
+        env = dict(os.environ, ANNONCES_SOURCES=parquet)
+
+        for nb_workers in args.workers:
+            for nom, module, scenario in [("/annonces", "wsgi_api:app", scenario_api),
+                                          ("update_charts", "wsgi_dashboard:app", scenario_tableau)]:
+                processus, base = lancer(module, nb_workers, dossier, env)
+                try:
+                    envoyer = scenario(base)
+                    tirer(envoyer, args.clients, args.clients)  # chauffe
+                    latences, duree = tirer(envoyer, args.requetes, args.clients)
+                    memoire = pss_mo(processus.pid)
+                finally:
+                    arreter(processus)
+                resultats.append((nom, nb_workers, latences, duree, memoire))
+
+    print(f"\n{args.lignes} annonces, {args.clients} clients, {args.requetes} requêtes, {os.cpu_count()} CPU")
+    print(f"{'route':<14} {'workers':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'req/s':>8} {'PSS (Mo)':>9}")
+    for nom, nb_workers, latences, duree, memoire in resultats:
+        p50, p95, p99 = np.percentile(latences, [50, 95, 99]) * 1000
+        print(f"{nom:<14} {nb_workers:>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {len(latences) / duree:>8.1f} "
+              f"{memoire if memoire is not None else float('nan'):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
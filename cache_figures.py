@@ -0,0 +1,142 @@
+"""Cache LRU borné des figures du tableau de bord, indexé par les entrées de chaque figure.
+
+Beaucoup d'utilisateurs consultent les mêmes combinaisons (ex. "Vente /
+Appartement / Tunis") : plutôt que de reconstruire et resérialiser les figures
+Plotly, le tableau de bord conserve chaque figure sérialisée sous la clé
+(version du jeu, graphique, signature de ses entrées). La signature est une
+empreinte des annonces ou des partiels par groupe que lit la figure
+(dashboard.signatures_sorties), pas de l'état des filtres : deux réglages qui
+sélectionnent les mêmes annonces partagent leurs entrées. Le classement des
+annonces n'y passe pas, ses pages étant lues dans l'ordre précalculé de l'index.
+
+Éviction par taille (LRU) et par durée de vie (TTL) ; invalidation complète
+lorsque le jeu de données est rechargé. Les compteurs sont exposés au format
+texte Prometheus par `texte_metriques()`, avec le temps de calcul de chaque
+graphique (ChronometreFigures).
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class CacheFigures:
+    def __init__(self, taille_max=256, ttl=900):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.version = 0
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def obtenir(self, cle):
+        """Valeur en cache ou None (compte un succès ou un échec)."""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                expire_le, valeur = entree
+                if time.monotonic() < expire_le:
+                    self._entrees.move_to_end(cle)
+                    self.succes += 1
+                    return valeur
+                del self._entrees[cle]
+                self.expirations += 1
+            self.echecs += 1
+            return None
+
+    def stocker(self, cle, valeur, version=None):
+        with self._verrou:
+            # Un calcul lancé avant une invalidation ne doit pas repeupler le cache
+            if version is not None and version != self.version:
+                return
+            self._entrees[cle] = (time.monotonic() + self.ttl, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def obtenir_ou_calculer(self, cle, calcul):
+        valeur = self.obtenir(cle)
+        if valeur is None:
+            version = self.version
+            valeur = calcul()
+            self.stocker(cle, valeur, version)
+        return valeur
+
+    def invalider(self):
+        """Vide le cache (à appeler quand les données sont rechargées)."""
+        with self._verrou:
+            self._entrees.clear()
+            self.version += 1
+            self.invalidations += 1
+
+    def statistiques(self):
+        with self._verrou:
+            return {
+                "entrees": len(self._entrees),
+                "taille_max": self.taille_max,
+                "succes": self.succes,
+                "echecs": self.echecs,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "version": self.version,
+            }
+
+    def texte_metriques(self, prefixe="dashboard_cache_figures"):
+        """Compteurs au format d'exposition texte Prometheus."""
+        stats = self.statistiques()
+        lignes = []
+        for nom, type_metrique in [
+            ("entrees", "gauge"), ("taille_max", "gauge"), ("succes", "counter"),
+            ("echecs", "counter"), ("evictions", "counter"), ("expirations", "counter"),
+            ("invalidations", "counter"),
+        ]:
+            lignes.append(f"# TYPE {prefixe}_{nom} {type_metrique}")
+            lignes.append(f"{prefixe}_{nom} {stats[nom]}")
+        return "\n".join(lignes) + "\n"
+
+
+class ChronometreFigures:
+    """Temps de calcul par graphique et type de sortie renvoyée (complete, patch, inchangee)."""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.calculs = {}  # graphique -> [nombre, secondes cumulées, max]
+        self.sorties = {}  # (graphique, sortie) -> nombre
+
+    @contextmanager
+    def mesurer(self, graphique):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            duree = time.perf_counter() - debut
+            with self._verrou:
+                mesure = self.calculs.setdefault(graphique, [0, 0.0, 0.0])
+                mesure[0] += 1
+                mesure[1] += duree
+                mesure[2] = max(mesure[2], duree)
+
+    def compter(self, graphique, sortie):
+        with self._verrou:
+            self.sorties[(graphique, sortie)] = self.sorties.get((graphique, sortie), 0) + 1
+
+    def texte_metriques(self, prefixe="dashboard_figure"):
+        """Compteurs au format d'exposition texte Prometheus, étiquetés par graphique."""
+        with self._verrou:
+            calculs = sorted(self.calculs.items())
+            sorties = sorted(self.sorties.items())
+        lignes = [f"# TYPE {prefixe}_calculs_total counter"]
+        lignes += [f'{prefixe}_calculs_total{{graphique="{g}"}} {m[0]}' for g, m in calculs]
+        lignes.append(f"# TYPE {prefixe}_secondes_total counter")
+        lignes += [f'{prefixe}_secondes_total{{graphique="{g}"}} {m[1]:.6f}' for g, m in calculs]
+        lignes.append(f"# TYPE {prefixe}_secondes_max gauge")
+        lignes += [f'{prefixe}_secondes_max{{graphique="{g}"}} {m[2]:.6f}' for g, m in calculs]
+        lignes.append(f"# TYPE {prefixe}_sorties_total counter")
+        lignes += [f'{prefixe}_sorties_total{{graphique="{g}",sortie="{s}"}} {n}' for (g, s), n in sorties]
+        return "\n".join(lignes) + "\n"
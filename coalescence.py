@@ -0,0 +1,68 @@
+"""Coalescence des callbacks du tableau de bord : la dernière demande gagne.
+
+Pendant qu'un utilisateur fait glisser le curseur de prix, chaque valeur
+intermédiaire qui atteint le serveur lance un recalcul complet ; sous
+plusieurs utilisateurs, le worker Flask accumule des calculs dont le
+résultat sera de toute façon ignoré par le navigateur. Chaque page reçoit
+un identifiant de session : une nouvelle demande de la même session rend
+les précédentes périmées, et celles-ci s'arrêtent au prochain point de
+contrôle (entre deux graphiques).
+
+Les compteurs (demandes, abandons, demandes en cours) sont exposés au format
+texte Prometheus.
+"""
+import threading
+from collections import OrderedDict
+
+SESSIONS_MAX = 10_000
+
+
+class DemandePerimee(Exception):
+    """Une demande plus récente de la même session est arrivée."""
+
+
+class DernierGagnant:
+    def __init__(self, sessions_max=SESSIONS_MAX, actif=True):
+        self.sessions_max = sessions_max
+        self.actif = actif
+        self._jetons = OrderedDict()
+        self._verrou = threading.Lock()
+        self.demandes = 0
+        self.abandons = 0
+        self.en_cours = 0
+        self.en_cours_max = 0
+
+    def entrer(self, session):
+        """Enregistre une nouvelle demande ; renvoie son jeton."""
+        with self._verrou:
+            self.demandes += 1
+            self.en_cours += 1
+            self.en_cours_max = max(self.en_cours_max, self.en_cours)
+            jeton = self._jetons.pop(session, 0) + 1
+            self._jetons[session] = jeton
+            # Sessions les plus anciennes oubliées (onglets fermés)
+            while len(self._jetons) > self.sessions_max:
+                self._jetons.popitem(last=False)
+            return jeton
+
+    def sortir(self):
+        with self._verrou:
+            self.en_cours -= 1
+
+    def verifier(self, session, jeton):
+        """Point de contrôle : lève DemandePerimee si une demande plus récente existe."""
+        if self.actif and session is not None and self._jetons.get(session, jeton) != jeton:
+            with self._verrou:
+                self.abandons += 1
+            raise DemandePerimee(session)
+
+    def texte_metriques(self, prefixe="dashboard_callbacks"):
+        """Compteurs au format d'exposition texte Prometheus."""
+        with self._verrou:
+            valeurs = [("demandes", "counter", self.demandes), ("abandons", "counter", self.abandons),
+                       ("en_cours", "gauge", self.en_cours), ("en_cours_max", "gauge", self.en_cours_max)]
+        lignes = []
+        for nom, type_metrique, valeur in valeurs:
+            lignes.append(f"# TYPE {prefixe}_{nom} {type_metrique}")
+            lignes.append(f"{prefixe}_{nom} {valeur}")
+        return "\n".join(lignes) + "\n"
@@ -1,25 +1,62 @@
+import time
+_DEBUT_IMPORT = time.perf_counter()
+
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import Dash, dcc, html, Input, Output, callback, callback_context
-import re
+from dash import Dash, dcc, html, Input, Output, State, Patch, ctx, no_update
+from dash.exceptions import PreventUpdate
 from dash.dash_table import DataTable
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template
 import numpy as np
 from datetime import datetime
+import hashlib
+import os
+import uuid
+from flask import Response, jsonify
+
+from cache_figures import CacheFigures, ChronometreFigures
+from coalescence import DemandePerimee, DernierGagnant
+from demarrage import phases_demarrage
+from index_filtres import IndexAnnonces, histogramme, matrice_comptes
+from nuage_points import detail_annonce, figure_nuage
+from donnees import jeu_compact
 
 # Load Bootstrap template for plots
 load_figure_template("bootstrap")
 
 # Initialize the app with a modern Bootstrap theme
+# Pendant le préchauffage, la page n'est qu'une coquille : les graphiques et
+# filtres des callbacks n'existent pas encore dans le layout initial
 app = Dash(__name__, external_stylesheets=[
     dbc.themes.COSMO,  # More modern theme
     "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css"  # Font Awesome icons
-])
+], suppress_callback_exceptions=True)
 
 app.title = "Immobilier Tunisie Dashboard"
 
+# Nombre de classes de l'histogramme des prix
+NB_CLASSES_PRIX = 30
+
+# Classement des annonces (DataTable paginée côté serveur) : taille de page par défaut et proposées
+TAILLE_PAGE_CLASSEMENT = 5
+TAILLES_PAGE_CLASSEMENT = [5, 10, 25, 50]
+COLONNES_CLASSEMENT = ['Titre', 'Prix', 'type_bien', 'nature', 'Ville', 'Superficie_nettoye', 'prix_m2']
+
+# Filtres à l'ouverture de la page (jeu complet)
+FILTRES_INITIAUX = ('Tous', 'Tous', None, 'Toutes')
+
+# Interrogation du préchauffage par la coquille (ms)
+INTERVALLE_PRECHAUFFAGE_MS = 500
+
+# Attente sans nouveau mouvement du curseur de prix avant d'interroger le serveur
+DELAI_CURSEUR_MS = 250
+
+# Cache des figures par signature de leurs entrées (nombre d'entrées, durée de vie en secondes)
+CACHE_TAILLE_MAX = 256
+CACHE_TTL = 900
+
 # Custom CSS for animations and more professional look
 app.index_string = '''
 <!DOCTYPE html>
@@ -157,128 +194,71 @@ app.index_string = '''
 </html>
 '''
 
-# Charger les données
-def load_data():
-    try:
-        df = pd.read_excel("Mubawab_Annonces.xlsx")
-        print("✅ Données chargées :")
-        print(df.head())
-        print("Shape initiale :", df.shape)
-
-        # Nettoyage : enlever les valeurs manquantes
-        df.dropna(subset=["Titre", "Prix", "Localisation"], inplace=True)
-        print("Après suppression des NaN :", df.shape)
-
-        # Nettoyage de la colonne 'Prix'
-        def nettoyer_prix(prix_str):
-            try:
-                if isinstance(prix_str, str):
-                    prix_str = prix_str.replace(" ", "").replace(".", "").replace(",", "")
-                    match = re.search(r"\d+", prix_str)
-                    if match:
-                        return int(match.group())
-                elif isinstance(prix_str, (int, float)):
-                    return int(prix_str)
-            except:
-                return None
-            return None
-
-        df["Prix_nettoye"] = df["Prix"].apply(nettoyer_prix)
-        df.dropna(subset=["Prix_nettoye"], inplace=True)
-        print("Après nettoyage du prix :", df.shape)
-
-        # Nettoyage de la colonne 'Localisation'
-        df["Ville"] = df["Localisation"].apply(
-            lambda x: str(x).split(",")[-1].strip() if isinstance(x, str) else "Inconnu"
-        )
+cache_figures = CacheFigures(taille_max=CACHE_TAILLE_MAX, ttl=CACHE_TTL)
+chrono_figures = ChronometreFigures()
+# Dernière demande gagnante par page (voir coalescence.py) ; DASHBOARD_COALESCENCE=0 pour comparer
+coalescence = DernierGagnant(actif=os.environ.get("DASHBOARD_COALESCENCE", "1") != "0")
 
-        # Création de la colonne 'type_bien' depuis le titre
-        def extraire_type_bien(titre):
-            titre = titre.lower()
-            if "appart" in titre:
-                return "Appartement"
-            elif "villa" in titre:
-                return "Villa"
-            elif "terrain" in titre:
-                return "Terrain"
-            elif "maison" in titre:
-                return "Maison"
-            else:
-                return "Autre"
-
-        df["type_bien"] = df["Titre"].apply(extraire_type_bien)
-        
-        # NOUVELLE FONCTIONNALITÉ: Détection de la nature (vente/location)
-        def determiner_nature(titre, prix):
-            titre_lower = str(titre).lower()
-            prix_str = str(prix).lower()
-            if "louer" in titre_lower or "locat" in titre_lower or "/mois" in prix_str or "par mois" in prix_str:
-                return "Location"
-            else:
-                return "Vente"
-                
-        df["nature"] = df.apply(lambda row: determiner_nature(row["Titre"], row["Prix"]), axis=1)
-        
-        # Nettoyage de la colonne 'Superficie'
-        def nettoyer_superficie(sup_str):
-            try:
-                if isinstance(sup_str, str):
-                    match = re.search(r"\d+", sup_str)
-                    if match:
-                        return int(match.group())
-                elif isinstance(sup_str, (int, float)):
-                    return int(sup_str)
-            except:
-                return None
-            return None
-            
-        df["Superficie_nettoye"] = df["Superficie"].apply(nettoyer_superficie)
-        
-        # Calculer prix au m²
-        df["prix_m2"] = df.apply(
-            lambda row: row["Prix_nettoye"] / row["Superficie_nettoye"] 
-            if pd.notnull(row["Superficie_nettoye"]) and row["Superficie_nettoye"] > 0 
-            else None, 
-            axis=1
-        )
-        
-        # Créer des catégories de prix
-        df["categorie_prix"] = pd.cut(
-            df["Prix_nettoye"], 
-            bins=[0, 100000, 250000, 500000, 1000000, float('inf')],
-            labels=["< 100K", "100K-250K", "250K-500K", "500K-1M", "> 1M"]
-        )
-        
-        return df
-    except Exception as e:
-        print(f"❌ Erreur lors du chargement des données: {e}")
-        return pd.DataFrame()
-
-df = load_data()
-
-# Fonction pour créer les figures
-def create_figures(dataframe):
-    if dataframe.empty:
-        return tuple([go.Figure() for _ in range(8)])
-    
-    # Couleurs cohérentes
-    colors = {
-        'Appartement': '#1f77b4',
-        'Villa': '#ff7f0e',
-        'Terrain': '#2ca02c',
-        'Maison': '#d62728',
-        'Autre': '#9467bd',
-        'Vente': '#2E86C1',
-        'Location': '#F39C12'
-    }
-    
+# (version, df, index, textes) remplacé d'un bloc à chaque rechargement du jeu
+_etat = (None, pd.DataFrame(), IndexAnnonces(pd.DataFrame()), None)
+
+def _installer(version, nouveau_df, textes):
+    """Abonné de jeu_compact : reconstruit l'index puis invalide le cache des figures."""
+    global _etat
+    with phases_demarrage.mesurer('index'):
+        index_annonces = IndexAnnonces(nouveau_df)
+    _etat = (version, nouveau_df, index_annonces, textes)
+    cache_figures.invalider()
+
+jeu_compact.abonner(_installer)
+
+# Données : jeu nettoyé compact (textes lus à la demande), chargé et rechargé quand
+# la source change par donnees.jeu_compact, seul chemin de chargement (voir donnees.py)
+def donnees_courantes():
+    """(version, df, index, textes) cohérents ; déclenche la vérification de la source."""
+    jeu_compact.obtenir()
+    return _etat
+
+# Compteurs du cache exposés pour Prometheus
+@app.server.route("/metrics")
+def metrics_endpoint():
+    return Response(cache_figures.texte_metriques() + chrono_figures.texte_metriques() + coalescence.texte_metriques()
+                    + phases_demarrage.texte_metriques(), mimetype="text/plain; version=0.0.4")
+
+# Contrôle de santé : répond tout de suite, même pendant le préchauffage
+@app.server.route("/sante")
+def sante_endpoint():
+    return jsonify(phases_demarrage.etat())
+
+# Couleurs cohérentes
+COULEURS = {
+    'Appartement': '#1f77b4',
+    'Villa': '#ff7f0e',
+    'Terrain': '#2ca02c',
+    'Maison': '#d62728',
+    'Autre': '#9467bd',
+    'Vente': '#2E86C1',
+    'Location': '#F39C12'
+}
+
+def _comptes_type(agregats):
+    return agregats.groupby('type_bien', sort=False)[['nombre', 'somme_prix']].sum().reset_index()
+
+def _comptes_ville(agregats):
+    return agregats.groupby('Ville', sort=False)['nombre'].sum().sort_values(ascending=False, kind='stable')
+
+# Une fonction par graphique. `lignes` : annonces sélectionnées ; `agregats` : table
+# (nature, type_bien, Ville, nombre, somme_prix) fournie par l'index.
+def figure_type_bien(lignes, agregats):
+    comptes_type = _comptes_type(agregats)
     # Figure 1: Répartition des types de biens
     fig_type_bien = px.pie(
-        dataframe, 
+        comptes_type, 
         names="type_bien",
+        values="nombre",
         title="<b>Répartition des types de biens</b>",
         color="type_bien",
-        color_discrete_map=colors,
+        color_discrete_map=COULEURS,
         hole=0.4
     )
     fig_type_bien.update_traces(textinfo='percent+label', pull=[0.05, 0.05, 0.05, 0.05, 0.05], textfont_size=12)
@@ -290,9 +270,12 @@ def create_figures(dataframe):
         plot_bgcolor='rgba(0,0,0,0)',
         title_font=dict(size=20, color="#2C3E50")
     )
-    
+    return fig_type_bien
+
+def figure_top_villes(lignes, agregats):
+    comptes_ville = _comptes_ville(agregats)
     # Figure 2: Top villes
-    top_villes = dataframe["Ville"].value_counts().head(10).reset_index()
+    top_villes = comptes_ville.head(10).reset_index()
     top_villes.columns = ["Ville", "Nombre d'annonces"]
     
     fig_top_villes = px.bar(
@@ -312,16 +295,21 @@ def create_figures(dataframe):
         plot_bgcolor='rgba(0,0,0,0)',
         title_font=dict(size=20, color="#2C3E50")
     )
-    
-    # Figure 3: Distribution des prix
-    fig_distribution_prix = px.histogram(
-        dataframe, 
-        x="Prix_nettoye",
-        nbins=30,
-        title="<b>Distribution des prix</b>",
-        color_discrete_sequence=['#5B86E5'],
-        opacity=0.8
-    )
+    return fig_top_villes
+
+def figure_distribution_prix(lignes, agregats):
+    # Figure 3: Distribution des prix, classes calculées côté serveur (taille fixe quel que soit le nombre d'annonces)
+    comptes_prix, bords_prix = histogramme(lignes['Prix_nettoye'], NB_CLASSES_PRIX)
+    fig_distribution_prix = go.Figure(go.Bar(
+        x=(bords_prix[:-1] + bords_prix[1:]) / 2,
+        y=comptes_prix,
+        width=np.diff(bords_prix),
+        customdata=np.column_stack([bords_prix[:-1], bords_prix[1:]]),
+        marker_color='#5B86E5',
+        opacity=0.8,
+        hovertemplate="%{customdata[0]:,.0f} – %{customdata[1]:,.0f} TND<br>%{y} annonces<extra></extra>",
+    ))
+    fig_distribution_prix.update_layout(title="<b>Distribution des prix</b>", bargap=0)
     fig_distribution_prix.update_layout(
         xaxis_title="<b>Prix (TND)</b>",
         yaxis_title="<b>Nombre d'annonces</b>",
@@ -330,15 +318,18 @@ def create_figures(dataframe):
         plot_bgcolor='rgba(0,0,0,0)',
         title_font=dict(size=20, color="#2C3E50")
     )
-    
+    return fig_distribution_prix
+
+def figure_prix_moyen(lignes, agregats):
+    comptes_type = _comptes_type(agregats)
     # Figure 4: Prix moyen par type de bien
-    prix_moyen_type = dataframe.groupby('type_bien')['Prix_nettoye'].mean().reset_index()
+    prix_moyen_type = comptes_type.assign(Prix_nettoye=comptes_type['somme_prix'] / comptes_type['nombre'])
     fig_prix_moyen = px.bar(
         prix_moyen_type,
         x='type_bien',
         y='Prix_nettoye',
         color='type_bien',
-        color_discrete_map=colors,
+        color_discrete_map=COULEURS,
         title="<b>Prix moyen par type de bien</b>",
         text_auto='.0f'
     )
@@ -350,39 +341,28 @@ def create_figures(dataframe):
         plot_bgcolor='rgba(0,0,0,0)',
         title_font=dict(size=20, color="#2C3E50")
     )
-    
+    return fig_prix_moyen
+
+def figure_scatter(lignes, agregats):
     # Figure 5: Scatter plot prix vs superficie
-    if 'Superficie_nettoye' in dataframe.columns and not dataframe['Superficie_nettoye'].isna().all():
-        fig_scatter = px.scatter(
-            dataframe.dropna(subset=['Superficie_nettoye']),
-            x='Superficie_nettoye',
-            y='Prix_nettoye',
-            color='type_bien',
-            color_discrete_map=colors,
-            title="<b>Relation entre superficie et prix</b>",
-            opacity=0.7,
-            size_max=15,
-            hover_data=['Titre', 'Prix', 'Ville']
-        )
-        fig_scatter.update_layout(
-            xaxis_title="<b>Superficie (m²)</b>",
-            yaxis_title="<b>Prix (TND)</b>",
-            margin=dict(t=50, b=20, l=20, r=20),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            title_font=dict(size=20, color="#2C3E50")
-        )
+    if 'Superficie_nettoye' in lignes.columns and not lignes['Superficie_nettoye'].isna().all():
+        # Scattergl / échantillon stratifié au-delà des seuils, détail au clic (voir nuage_points.py)
+        fig_scatter = figure_nuage(lignes, COULEURS)
     else:
         fig_scatter = go.Figure()
         fig_scatter.update_layout(title="<b>Données de superficie insuffisantes</b>")
-    
+    return fig_scatter
+
+def figure_nature(lignes, agregats):
     # NOUVEAU GRAPHIQUE 1: Répartition par nature (vente/location)
+    comptes_nature = agregats.groupby('nature', sort=False)['nombre'].sum().reset_index()
     fig_nature = px.pie(
-        dataframe, 
+        comptes_nature, 
         names="nature",
+        values="nombre",
         title="<b>Répartition vente/location</b>",
         color="nature", 
-        color_discrete_map={'Vente': colors['Vente'], 'Location': colors['Location']},
+        color_discrete_map={'Vente': COULEURS['Vente'], 'Location': COULEURS['Location']},
         hole=0.6
     )
     fig_nature.update_traces(textinfo='percent+label', pull=[0.05, 0.05], textfont_size=14)
@@ -393,16 +373,18 @@ def create_figures(dataframe):
         plot_bgcolor='rgba(0,0,0,0)',
         title_font=dict(size=20, color="#2C3E50")
     )
-    
+    return fig_nature
+
+def figure_prix_m2(lignes, agregats):
     # NOUVEAU GRAPHIQUE 2: Prix au m² par type
-    if 'prix_m2' in dataframe.columns and not dataframe['prix_m2'].isna().all():
-        prix_m2_type = dataframe.dropna(subset=['prix_m2']).groupby('type_bien')['prix_m2'].median().reset_index()
+    if 'prix_m2' in lignes.columns and not lignes['prix_m2'].isna().all():
+        prix_m2_type = lignes.dropna(subset=['prix_m2']).groupby('type_bien', observed=True)['prix_m2'].median().reset_index()
         fig_prix_m2 = px.bar(
             prix_m2_type,
             x='type_bien',
             y='prix_m2',
             color='type_bien',
-            color_discrete_map=colors,
+            color_discrete_map=COULEURS,
             title="<b>Prix médian au m² par type de bien</b>",
             text_auto='.0f'
         )
@@ -417,21 +399,25 @@ def create_figures(dataframe):
     else:
         fig_prix_m2 = go.Figure()
         fig_prix_m2.update_layout(title="<b>Données de prix/m² insuffisantes</b>")
+    return fig_prix_m2
+
+def figure_heatmap(lignes, agregats):
+    comptes_ville = _comptes_ville(agregats)
+    # NOUVEAU GRAPHIQUE 3: Heatmap Ville x Type de bien (bincount sur les partiels par groupe, sans pivot)
+    top_villes_list = comptes_ville.head(8).index.tolist()
+    matrice, types_heatmap = matrice_comptes(agregats, top_villes_list, 'type_bien')
     
-    # NOUVEAU GRAPHIQUE 3: Heatmap Ville x Type de bien
-    ville_type_count = dataframe.groupby(['Ville', 'type_bien']).size().reset_index(name='count')
-    top_villes_list = dataframe['Ville'].value_counts().head(8).index.tolist()
-    filtered_ville_type = ville_type_count[ville_type_count['Ville'].isin(top_villes_list)]
-    
-    pivot_data = filtered_ville_type.pivot(index='Ville', columns='type_bien', values='count').fillna(0)
-    
-    fig_heatmap = px.imshow(
-        pivot_data,
-        labels=dict(x="Type de bien", y="Ville", color="Nombre d'annonces"),
-        x=pivot_data.columns,
-        y=pivot_data.index,
-        color_continuous_scale='YlOrRd',
-        title="<b>Répartition des types de biens par ville</b>"
+    fig_heatmap = go.Figure(go.Heatmap(
+        z=matrice,
+        x=types_heatmap.tolist(),
+        y=top_villes_list,
+        colorscale='YlOrRd',
+        colorbar=dict(title="Nombre d'annonces"),
+        hovertemplate="Ville: %{y}<br>Type de bien: %{x}<br>Nombre d'annonces: %{z:.0f}<extra></extra>",
+    ))
+    fig_heatmap.update_layout(
+        title="<b>Répartition des types de biens par ville</b>",
+        yaxis=dict(autorange='reversed'),
     )
     fig_heatmap.update_layout(
         xaxis_title="<b>Type de bien</b>",
@@ -441,375 +427,556 @@ def create_figures(dataframe):
         plot_bgcolor='rgba(0,0,0,0)',
         title_font=dict(size=20, color="#2C3E50")
     )
-    
-    return fig_type_bien, fig_top_villes, fig_distribution_prix, fig_prix_moyen, fig_scatter, fig_nature, fig_prix_m2, fig_heatmap
-
-# Create the figures
-if not df.empty:
-    fig_type_bien, fig_top_villes, fig_distribution_prix, fig_prix_moyen, fig_scatter, fig_nature, fig_prix_m2, fig_heatmap = create_figures(df)
-else:
-    # Create empty figures
-    fig_type_bien = go.Figure()
-    fig_top_villes = go.Figure()
-    fig_distribution_prix = go.Figure()
-    fig_prix_moyen = go.Figure()
-    fig_scatter = go.Figure()
-    fig_nature = go.Figure()
-    fig_prix_m2 = go.Figure()
-    fig_heatmap = go.Figure()
-
-# Calculate key metrics
-if not df.empty:
-    nb_annonces = len(df)
-    prix_moyen = int(df['Prix_nettoye'].mean()) if 'Prix_nettoye' in df else 0
-    prix_median = int(df['Prix_nettoye'].median()) if 'Prix_nettoye' in df else 0
-    nb_villes = df['Ville'].nunique() if 'Ville' in df else 0
-    nb_vente = df[df['nature'] == 'Vente'].shape[0] if 'nature' in df else 0
-    nb_location = df[df['nature'] == 'Location'].shape[0] if 'nature' in df else 0
-    prix_moyen_m2 = int(df['prix_m2'].dropna().median()) if 'prix_m2' in df else 0
-else:
-    nb_annonces = 0
-    prix_moyen = 0
-    prix_median = 0
-    nb_villes = 0
-    nb_vente = 0
-    nb_location = 0
-    prix_moyen_m2 = 0
-
-# Layout components
-
-# Header avec animation et logo
-header = html.Div(
-    [
-        dbc.Navbar(
-            dbc.Container(
-                [
-                    html.A(
-                        dbc.Row(
-                            [
-                                dbc.Col(html.Img(src="https://www.mubawab-media.com/assets/logos/mubawab.png", className="logo-img"), width="auto"),
-                                dbc.Col(dbc.NavbarBrand("Analyse Immobilière Tunisie", className="ms-2 fade-in")),
-                            ],
-                            align="center",
+    return fig_heatmap
+
+# Sorties du callback des filtres -> (construction, dépendance). La dépendance
+# est la liste des clés des partiels par groupe que lit la sortie, ou LIGNES si
+# elle lit les annonces sélectionnées. Une sortie n'est recalculée et renvoyée
+# que si ses entrées ont changé (voir signatures_sorties).
+LIGNES = 'lignes'
+SORTIES_FIGURES = {
+    'nature-chart': (figure_nature, ['nature']),
+    'type-chart': (figure_type_bien, ['type_bien']),
+    'ville-chart': (figure_top_villes, ['Ville']),
+    'prix-distribution-chart': (figure_distribution_prix, LIGNES),
+    'prix-moyen-chart': (figure_prix_moyen, ['type_bien']),
+    'scatter-chart': (figure_scatter, LIGNES),
+    'prix-m2-chart': (figure_prix_m2, LIGNES),
+    'heatmap-chart': (figure_heatmap, ['Ville', 'type_bien']),
+}
+# Mise en page fixe : seuls ces champs de la trace sont renvoyés (Patch)
+CHAMPS_PATCH = {
+    'prix-distribution-chart': ['x', 'y', 'width', 'customdata'],
+    'heatmap-chart': ['x', 'y', 'z'],
+}
+SIGNATURE_VIDE = 'vide'
+
+def _empreinte(version, *tableaux):
+    empreinte = hashlib.blake2b(repr(version).encode(), digest_size=12)
+    for tableau in tableaux:
+        empreinte.update(np.ascontiguousarray(tableau).tobytes())
+    return empreinte.hexdigest()
+
+def signatures_sorties(version, positions, agregats):
+    """Empreinte des entrées de chaque sortie pour la sélection courante."""
+    if len(positions) == 0:
+        return {id_sortie: SIGNATURE_VIDE for id_sortie in SORTIES_FIGURES}
+    signature_lignes = _empreinte(version, positions)
+    signatures = {}
+    for id_sortie, (_, dependance) in SORTIES_FIGURES.items():
+        if dependance == LIGNES:
+            signatures[id_sortie] = signature_lignes
+        else:
+            partiels = agregats.groupby(dependance, sort=True)[['nombre', 'somme_prix']].sum()
+            signatures[id_sortie] = _empreinte(version, pd.util.hash_pandas_object(partiels).to_numpy())
+    return signatures
+
+def calculer_sorties(etat, filtres, signatures_client=None, controle=None):
+    """Sorties du callback des filtres (par id) et leurs signatures.
+
+    Une sortie dont la signature est celle déjà affichée par le client vaut
+    no_update ; les autres viennent du cache (version, sortie, signature) ou
+    sont calculées, et CHAMPS_PATCH limite l'envoi aux données de la trace.
+    `controle` est appelé avant chaque calcul (abandon d'une demande périmée).
+    """
+    version, df, index_annonces, _ = etat
+    positions = index_annonces.selection(*filtres)
+    agregats = index_annonces.agregats(*filtres, positions=positions)
+    signatures = signatures_sorties(version, positions, agregats)
+    client = signatures_client or {}
+    lignes = None
+    sorties = {}
+    for id_sortie, signature in signatures.items():
+        if client.get(id_sortie) == signature:
+            sorties[id_sortie] = no_update
+            chrono_figures.compter(id_sortie, 'inchangee')
+            continue
+        if controle is not None:
+            controle()
+        construction, dependance = SORTIES_FIGURES[id_sortie]
+        if dependance == LIGNES and lignes is None and signature != SIGNATURE_VIDE:
+            lignes = df.take(positions)
+
+        def calculer(construction=construction, id_sortie=id_sortie, vide=signature == SIGNATURE_VIDE):
+            with chrono_figures.mesurer(id_sortie):
+                return (go.Figure() if vide else construction(lignes, agregats)).to_plotly_json()
+
+        valeur = cache_figures.obtenir_ou_calculer((version, id_sortie, signature), calculer)
+        champs = CHAMPS_PATCH.get(id_sortie)
+        if champs and client.get(id_sortie) not in (None, SIGNATURE_VIDE) and signature != SIGNATURE_VIDE:
+            patch = Patch()
+            for champ in champs:
+                patch['data'][0][champ] = valeur['data'][0].get(champ)
+            valeur = patch
+            chrono_figures.compter(id_sortie, 'patch')
+        else:
+            chrono_figures.compter(id_sortie, 'complete')
+        sorties[id_sortie] = valeur
+
+    # Cartes d'indicateurs : partiels par groupe et médianes lues dans l'index trié
+    sorties.update(textes_kpis(index_annonces.kpis(*filtres, positions=positions)))
+    return sorties, signatures
+
+def page_classement(etat, filtres, cle='prix', page=0, taille=TAILLE_PAGE_CLASSEMENT):
+    """Lignes d'une page du classement par `cle` décroissante, et nombre de pages.
+
+    Les rangs sont lus dans l'ordre précalculé de l'index (pas de tri de la sélection).
+    """
+    _, df, index_annonces, textes = etat
+    positions, total = index_annonces.classement(*filtres, cle=cle, debut=page * taille, fin=(page + 1) * taille)
+    lignes = df.take(positions)
+    if textes is not None:
+        # Jeu compact : Titre et Prix lus pour la seule page affichée
+        lignes = lignes.join(textes.lire(positions, ['Titre', 'Prix']))
+    lignes = lignes.reindex(columns=COLONNES_CLASSEMENT)
+    lignes[['Superficie_nettoye', 'prix_m2']] = lignes[['Superficie_nettoye', 'prix_m2']].round(0)
+    lignes = lignes.astype(object).where(lignes.notna(), None)
+    return lignes.to_dict('records'), max(1, -(-total // taille))
+
+def prechauffer():
+    """Charge le jeu, construit l'index et remplit le cache avec la page d'ouverture."""
+    etat = donnees_courantes()
+    with phases_demarrage.mesurer('figures'):
+        calculer_sorties(etat, FILTRES_INITIAUX)
+        page_classement(etat, FILTRES_INITIAUX)
+
+# Cartes d'indicateurs : clé de IndexAnnonces.kpis() -> id du html.H2
+IDS_KPIS = {
+    "nb_annonces": "kpi-nb-annonces",
+    "prix_moyen": "kpi-prix-moyen",
+    "prix_median": "kpi-prix-median",
+    "nb_vente": "kpi-ventes",
+    "nb_location": "kpi-locations",
+    "prix_m2_median": "kpi-prix-m2",
+    "nb_villes": "kpi-villes",
+}
+# Parts des ventes / locations affichées sous leur carte
+IDS_PARTS = {"nb_vente": "kpi-ventes-part", "nb_location": "kpi-locations-part"}
+SORTIES_KPIS = list(IDS_KPIS.values()) + list(IDS_PARTS.values())
+
+def textes_kpis(kpis):
+    """Textes des cartes par id (0 quand la sélection est vide), dans l'ordre de SORTIES_KPIS."""
+    textes = {id_kpi: f"{0 if pd.isna(kpis[cle]) else int(kpis[cle]):,}" for cle, id_kpi in IDS_KPIS.items()}
+    for cle, id_part in IDS_PARTS.items():
+        textes[id_part] = f"({kpis[cle] / kpis['nb_annonces'] * 100:.1f}% du total)" if kpis["nb_annonces"] > 0 else ""
+    return textes
+
+# En-tête et pied de page : indépendants des données, servis aussi par la coquille
+def entete():
+    # Header avec animation et logo
+    header = html.Div(
+        [
+            dbc.Navbar(
+                dbc.Container(
+                    [
+                        html.A(
+                            dbc.Row(
+                                [
+                                    dbc.Col(html.Img(src="https://www.mubawab-media.com/assets/logos/mubawab.png", className="logo-img"), width="auto"),
+                                    dbc.Col(dbc.NavbarBrand("Analyse Immobilière Tunisie", className="ms-2 fade-in")),
+                                ],
+                                align="center",
+                            ),
+                            href="#",
                         ),
-                        href="#",
-                    ),
-                    dbc.NavbarToggler(id="navbar-toggler"),
-                    dbc.Collapse(
-                        id="navbar-collapse",
-                        navbar=True,
-                    ),
-                ],
-                fluid=True,
+                        dbc.NavbarToggler(id="navbar-toggler"),
+                        dbc.Collapse(
+                            id="navbar-collapse",
+                            navbar=True,
+                        ),
+                    ],
+                    fluid=True,
+                ),
+                color="primary",
+                dark=True,
+                className="mb-4",
             ),
-            color="primary",
-            dark=True,
-            className="mb-4",
-        ),
-        html.Div(
-            dbc.Container(
+            html.Div(
+                dbc.Container(
+                    [
+                        html.H1("Tableau de Bord Immobilier Tunisie", className="display-4 fade-in"),
+                        html.P(
+                            f"Dernière mise à jour: {datetime.now().strftime('%d/%m/%Y')}",
+                            className="lead fade-in"
+                        ),
+                    ]
+                ),
+                className="p-5 mb-4 bg-light rounded-3 fade-in",
+            ),
+        ]
+    )
+    return header
+
+def pied_de_page():
+    # Footer
+    footer = html.Footer(
+        dbc.Container(
+            dbc.Row(
                 [
-                    html.H1("Tableau de Bord Immobilier Tunisie", className="display-4 fade-in"),
-                    html.P(
-                        f"Dernière mise à jour: {datetime.now().strftime('%d/%m/%Y')}",
-                        className="lead fade-in"
+                    dbc.Col(
+                        [
+                            html.H5("Analyse Immobilière Tunisie", className="text-white"),
+                            html.P(
+                                "Tableau de bord analytique pour le marché immobilier tunisien",
+                                className="text-muted"
+                            ),
+                        ],
+                        width=6,
                     ),
                 ]
             ),
-            className="p-5 mb-4 bg-light rounded-3 fade-in",
+            className="py-4",
         ),
+        className="mt-4 footer",
+    )
+    return footer
+
+# Contenu du tableau de bord : métriques, listes et bornes du slider suivent
+# le jeu courant (rechargé par donnees.py)
+def construire_contenu():
+    etat = donnees_courantes()
+    df = etat[1]
+
+    # Figures et cartes du jeu complet (même cache que update_charts, rempli par
+    # le préchauffage). Leurs signatures vont au client : le premier appel du
+    # callback n'a rien à renvoyer.
+    sorties, signatures = calculer_sorties(etat, FILTRES_INITIAUX)
+    fig_type_bien = sorties['type-chart']
+    fig_top_villes = sorties['ville-chart']
+    fig_distribution_prix = sorties['prix-distribution-chart']
+    fig_prix_moyen = sorties['prix-moyen-chart']
+    fig_scatter = sorties['scatter-chart']
+    fig_nature = sorties['nature-chart']
+    fig_prix_m2 = sorties['prix-m2-chart']
+    fig_heatmap = sorties['heatmap-chart']
+    valeurs_kpis = sorties
+
+    # Première page du classement par prix (jeu complet)
+    donnees_classement, nb_pages_classement = page_classement(etat, FILTRES_INITIAUX)
+
+    # Plage initiale du curseur de prix (jeu complet)
+    plage_prix = [
+        int(df['Prix_nettoye'].min()) if not df.empty and 'Prix_nettoye' in df else 0,
+        int(df['Prix_nettoye'].max()) if not df.empty and 'Prix_nettoye' in df else 1000000
     ]
-)
 
-# Metrics cards
-metrics = dbc.Row(
-    [
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader("Nombre d'annonces"),
-                    dbc.CardBody(
-                        [
-                            html.H2(f"{nb_annonces:,}", className="card-title metric-value pulse"),
-                            html.P("annonces immobilières", className="card-text"),
-                        ]
-                    ),
-                ],
-                className="text-center h-100 metric-card hover-card",
-                color="light"
+    # Metrics cards
+    metrics = dbc.Row(
+        [
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader("Nombre d'annonces"),
+                        dbc.CardBody(
+                            [
+                                html.H2(valeurs_kpis["kpi-nb-annonces"], id="kpi-nb-annonces", className="card-title metric-value pulse"),
+                                html.P("annonces immobilières", className="card-text"),
+                            ]
+                        ),
+                    ],
+                    className="text-center h-100 metric-card hover-card",
+                    color="light"
+                ),
+                width={"size": 3, "offset": 0},
+                className="mb-4",
             ),
-            width={"size": 3, "offset": 0},
-            className="mb-4",
-        ),
-        dbc.Col(
-            dbc.Card(
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader("Prix moyen"),
+                        dbc.CardBody(
+                            [
+                                html.H2(valeurs_kpis["kpi-prix-moyen"], id="kpi-prix-moyen", className="card-title metric-value"),
+                                html.P("TND", className="card-text"),
+                            ]
+                        ),
+                    ],
+                    className="text-center h-100 metric-card hover-card",
+                    color="light"
+                ),
+                width={"size": 2, "offset": 0},
+                className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader("Prix médian"),
+                        dbc.CardBody(
+                            [
+                                html.H2(valeurs_kpis["kpi-prix-median"], id="kpi-prix-median", className="card-title metric-value"),
+                                html.P("TND", className="card-text"),
+                            ]
+                        ),
+                    ],
+                    className="text-center h-100 metric-card hover-card",
+                    color="light"
+                ),
+                width={"size": 2, "offset": 0},
+                className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader("Ventes"),
+                        dbc.CardBody(
+                            [
+                                html.H2(valeurs_kpis["kpi-ventes"], id="kpi-ventes", className="card-title metric-value"),
+                                html.P(valeurs_kpis["kpi-ventes-part"], id="kpi-ventes-part", className="card-text"),
+                            ]
+                        ),
+                    ],
+                    className="text-center h-100 metric-card hover-card",
+                    color="light"
+                ),
+                width={"size": 2, "offset": 0},
+                className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader("Locations"),
+                        dbc.CardBody(
+                            [
+                                html.H2(valeurs_kpis["kpi-locations"], id="kpi-locations", className="card-title metric-value"),
+                                html.P(valeurs_kpis["kpi-locations-part"], id="kpi-locations-part", className="card-text"),
+                            ]
+                        ),
+                    ],
+                    className="text-center h-100 metric-card hover-card",
+                    color="light"
+                ),
+                width={"size": 2, "offset": 0},
+                className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader("Prix/m² médian"),
+                        dbc.CardBody(
+                            [
+                                html.H2(valeurs_kpis["kpi-prix-m2"], id="kpi-prix-m2", className="card-title metric-value"),
+                                html.P("TND/m²", className="card-text"),
+                            ]
+                        ),
+                    ],
+                    className="text-center h-100 metric-card hover-card",
+                    color="light"
+                ),
+                width={"size": 3, "offset": 0},
+                className="mb-4"
+            ),
+            dbc.Col(
+                dbc.Card(
+                    [
+                        dbc.CardHeader("Villes"),
+                        dbc.CardBody(
+                            [
+                                html.H2(valeurs_kpis["kpi-villes"], id="kpi-villes", className="card-title metric-value"),
+                                html.P("zones différentes", className="card-text"),
+                            ]
+                        ),
+                    ],
+                    className="text-center h-100 metric-card hover-card",
+                    color="light"
+                ),
+                width={"size": 3, "offset": 0},
+                className="mb-4"
+            ),
+        ],
+        className="mb-4 fade-in",
+    )
+
+    # Filters panel
+    filters = dbc.Card(
+        [
+            dbc.CardHeader([
+                html.I(className="fas fa-filter me-2"),
+                "Filtres d'analyse"
+            ]),
+            dbc.CardBody(
                 [
-                    dbc.CardHeader("Prix moyen"),
-                    dbc.CardBody(
-                        [
-                            html.H2(f"{prix_moyen:,}", className="card-title metric-value"),
-                            html.P("TND", className="card-text"),
-                        ]
+                    html.P("Nature:", className="fw-bold"),
+                    dcc.Dropdown(
+                        id='nature-dropdown',
+                        options=[
+                            {'label': 'Tous', 'value': 'Tous'},
+                            {'label': 'Vente', 'value': 'Vente'},
+                            {'label': 'Location', 'value': 'Location'}
+                        ],
+                        value='Tous',
+                        multi=False,
+                        className="mb-3"
                     ),
-                ],
-                className="text-center h-100 metric-card hover-card",
-                color="light"
+                
+                    html.P("Type de bien:", className="fw-bold"),
+                    dcc.Dropdown(
+                        id='type-dropdown',
+                        options=[{'label': 'Tous', 'value': 'Tous'}] + [{'label': t, 'value': t} for t in df['type_bien'].unique()] if not df.empty else [],
+                        value='Tous',
+                        multi=False,
+                        className="mb-3"
+                    ),
+
+                    html.Hr(),
+                
+                    html.P("Gamme de prix (TND):", className="fw-bold"),
+                    dcc.RangeSlider(
+                        id='prix-slider',
+                        min=int(df['Prix_nettoye'].min()) if not df.empty and 'Prix_nettoye' in df else 0,
+                        max=int(df['Prix_nettoye'].max()) if not df.empty and 'Prix_nettoye' in df else 1000000,
+                        step=10000,
+                        marks={
+                            i: f'{i/1000:.0f}K' if i < 1000000 else f'{i/1000000:.0f}M' 
+                            for i in range(
+                                int(df['Prix_nettoye'].min()) if not df.empty and 'Prix_nettoye' in df else 0, 
+                                int(df['Prix_nettoye'].max()) if not df.empty and 'Prix_nettoye' in df else 1000000, 
+                                max(50000, int((df['Prix_nettoye'].max() - df['Prix_nettoye'].min())/10)) if not df.empty and 'Prix_nettoye' in df else 100000
+                            )
+                        },
+                        value=plage_prix,
+                        # Valeur transmise au relâchement seulement, puis filtrée par l'anti-rebond (prix-filtre)
+                        updatemode='mouseup',
+                        className="mt-2 mb-4",
+                    ),
+                    dcc.Store(id='prix-filtre', data=plage_prix),
+                
+                    html.P("Top villes:", className="fw-bold"),
+                    dcc.Dropdown(
+                        id='ville-dropdown',
+                        options=[{'label': 'Toutes', 'value': 'Toutes'}] + 
+                                [{'label': ville, 'value': ville} 
+                                 for ville in df['Ville'].value_counts().head(15).index.tolist()] if not df.empty else [],
+                        value='Toutes',
+                        multi=True,
+                        className="mb-3"
+                    ),
+                
+                    dbc.Button(
+                        [html.I(className="fas fa-sync-alt me-2"), "Réinitialiser les filtres"],
+                        id="reset-button",
+                        color="secondary",
+                        className="w-100 mt-3"
+                    )
+                ]
             ),
-            width={"size": 2, "offset": 0},
-            className="mb-4"
-        ),
-        dbc.Col(
-            dbc.Card(
+        ],
+        className="mb-4 fade-in filter-card",
+    )
+
+    # Charts layout
+    charts = dbc.Row(
+        [
+            dbc.Col(
                 [
-                    dbc.CardHeader("Prix médian"),
-                    dbc.CardBody(
+                    dbc.Row(
                         [
-                            html.H2(f"{prix_median:,}", className="card-title metric-value"),
-                            html.P("TND", className="card-text"),
+                            dbc.Col(
+                                dcc.Graph(id='nature-chart', figure=fig_nature, className="dash-graph"),# Cette partie continue la définition du layout des graphiques
+                                width=6,
+                                className="mb-4",
+                            ),
+                            dbc.Col(
+                                dcc.Graph(id='type-chart', figure=fig_type_bien, className="dash-graph"),
+                                width=6,
+                                className="mb-4",
+                            ),
                         ]
                     ),
-                ],
-                className="text-center h-100 metric-card hover-card",
-                color="light"
-            ),
-            width={"size": 2, "offset": 0},
-            className="mb-4"
-        ),
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader("Ventes"),
-                    dbc.CardBody(
+                    dbc.Row(
                         [
-                            html.H2(f"{nb_vente:,}", className="card-title metric-value"),
-                            html.P(f"({nb_vente/nb_annonces*100:.1f}% du total)" if nb_annonces > 0 else "", className="card-text"),
+                            dbc.Col(
+                                dcc.Graph(id='ville-chart', figure=fig_top_villes, className="dash-graph"),
+                                width=12,
+                                className="mb-4",
+                            ),
                         ]
                     ),
-                ],
-                className="text-center h-100 metric-card hover-card",
-                color="light"
-            ),
-            width={"size": 2, "offset": 0},
-            className="mb-4"
-        ),
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader("Locations"),
-                    dbc.CardBody(
+                    dbc.Row(
                         [
-                            html.H2(f"{nb_location:,}", className="card-title metric-value"),
-                            html.P(f"({nb_location/nb_annonces*100:.1f}% du total)" if nb_annonces > 0 else "", className="card-text"),
+                            dbc.Col(
+                                dcc.Graph(id='prix-distribution-chart', figure=fig_distribution_prix, className="dash-graph"),
+                                width=6,
+                                className="mb-4",
+                            ),
+                            dbc.Col(
+                                dcc.Graph(id='prix-moyen-chart', figure=fig_prix_moyen, className="dash-graph"),
+                                width=6,
+                                className="mb-4",
+                            ),
                         ]
                     ),
-                ],
-                className="text-center h-100 metric-card hover-card",
-                color="light"
-            ),
-            width={"size": 2, "offset": 0},
-            className="mb-4"
-        ),
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader("Prix/m² médian"),
-                    dbc.CardBody(
+                    dbc.Row(
                         [
-                            html.H2(f"{prix_moyen_m2:,}", className="card-title metric-value"),
-                            html.P("TND/m²", className="card-text"),
+                            dbc.Col(
+                                [
+                                    dcc.Graph(id='scatter-chart', figure=fig_scatter, className="dash-graph"),
+                                    html.Div(id='scatter-detail', className="small text-muted"),
+                                ],
+                                width=6,
+                                className="mb-4",
+                            ),
+                            dbc.Col(
+                                dcc.Graph(id='prix-m2-chart', figure=fig_prix_m2, className="dash-graph"),
+                                width=6,
+                                className="mb-4",
+                            ),
                         ]
                     ),
-                ],
-                className="text-center h-100 metric-card hover-card",
-                color="light"
-            ),
-            width={"size": 3, "offset": 0},
-            className="mb-4"
-        ),
-        dbc.Col(
-            dbc.Card(
-                [
-                    dbc.CardHeader("Villes"),
-                    dbc.CardBody(
+                    dbc.Row(
                         [
-                            html.H2(f"{nb_villes:,}", className="card-title metric-value"),
-                            html.P("zones différentes", className="card-text"),
+                            dbc.Col(
+                                dcc.Graph(id='heatmap-chart', figure=fig_heatmap, className="dash-graph"),
+                                width=12,
+                                className="mb-4",
+                            ),
                         ]
                     ),
                 ],
-                className="text-center h-100 metric-card hover-card",
-                color="light"
+                width=9,
             ),
-            width={"size": 3, "offset": 0},
-            className="mb-4"
-        ),
-    ],
-    className="mb-4 fade-in",
-)
-
-# Filters panel
-filters = dbc.Card(
-    [
-        dbc.CardHeader([
-            html.I(className="fas fa-filter me-2"),
-            "Filtres d'analyse"
-        ]),
-        dbc.CardBody(
-            [
-                html.P("Nature:", className="fw-bold"),
-                dcc.Dropdown(
-                    id='nature-dropdown',
-                    options=[
-                        {'label': 'Tous', 'value': 'Tous'},
-                        {'label': 'Vente', 'value': 'Vente'},
-                        {'label': 'Location', 'value': 'Location'}
-                    ],
-                    value='Tous',
-                    multi=False,
-                    className="mb-3"
-                ),
-                
-                html.P("Type de bien:", className="fw-bold"),
-                dcc.Dropdown(
-                    id='type-dropdown',
-                    options=[{'label': 'Tous', 'value': 'Tous'}] + [{'label': t, 'value': t} for t in df['type_bien'].unique()] if not df.empty else [],
-                    value='Tous',
-                    multi=False,
-                    className="mb-3"
-                ),
-
-                html.Hr(),
-                
-                html.P("Gamme de prix (TND):", className="fw-bold"),
-                dcc.RangeSlider(
-                    id='prix-slider',
-                    min=int(df['Prix_nettoye'].min()) if not df.empty and 'Prix_nettoye' in df else 0,
-                    max=int(df['Prix_nettoye'].max()) if not df.empty and 'Prix_nettoye' in df else 1000000,
-                    step=10000,
-                    marks={
-                        i: f'{i/1000:.0f}K' if i < 1000000 else f'{i/1000000:.0f}M' 
-                        for i in range(
-                            int(df['Prix_nettoye'].min()) if not df.empty and 'Prix_nettoye' in df else 0, 
-                            int(df['Prix_nettoye'].max()) if not df.empty and 'Prix_nettoye' in df else 1000000, 
-                            max(50000, int((df['Prix_nettoye'].max() - df['Prix_nettoye'].min())/10)) if not df.empty and 'Prix_nettoye' in df else 100000
-                        )
-                    },
-                    value=[
-                        int(df['Prix_nettoye'].min()) if not df.empty and 'Prix_nettoye' in df else 0, 
-                        int(df['Prix_nettoye'].max()) if not df.empty and 'Prix_nettoye' in df else 1000000
-                    ],
-                    className="mt-2 mb-4",
-                ),
-                
-                html.P("Top villes:", className="fw-bold"),
-                dcc.Dropdown(
-                    id='ville-dropdown',
-                    options=[{'label': 'Toutes', 'value': 'Toutes'}] + 
-                            [{'label': ville, 'value': ville} 
-                             for ville in df['Ville'].value_counts().head(15).index.tolist()] if not df.empty else [],
-                    value='Toutes',
-                    multi=True,
-                    className="mb-3"
-                ),
-                
-                dbc.Button(
-                    [html.I(className="fas fa-sync-alt me-2"), "Réinitialiser les filtres"],
-                    id="reset-button",
-                    color="secondary",
-                    className="w-100 mt-3"
-                )
-            ]
-        ),
-    ],
-    className="mb-4 fade-in filter-card",
-)
+            dbc.Col(
+                filters,
+                width=3,
+            ),
+        ],
+        className="fade-in",
+    )
 
-# Charts layout
-charts = dbc.Row(
-    [
-        dbc.Col(
-            [
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            dcc.Graph(id='nature-chart', figure=fig_nature, className="dash-graph"),# Cette partie continue la définition du layout des graphiques
-                            width=6,
-                            className="mb-4",
-                        ),
-                        dbc.Col(
-                            dcc.Graph(id='type-chart', figure=fig_type_bien, className="dash-graph"),
-                            width=6,
-                            className="mb-4",
-                        ),
-                    ]
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            dcc.Graph(id='ville-chart', figure=fig_top_villes, className="dash-graph"),
-                            width=12,
-                            className="mb-4",
-                        ),
-                    ]
-                ),
-                dbc.Row(
-                    [
-                        dbc.Col(
-                            dcc.Graph(id='prix-distribution-chart', figure=fig_distribution_prix, className="dash-graph"),
-                            width=6,
-                            className="mb-4",
-                        ),
-                        dbc.Col(
-                            dcc.Graph(id='prix-moyen-chart', figure=fig_prix_moyen, className="dash-graph"),
-                            width=6,
-                            className="mb-4",
-                        ),
-                    ]
-                ),
+    # Top annonces table : toujours présente (vide sans annonces), update_classement la cible
+    top_annonces_table = dbc.Card(
+        [
+            dbc.CardHeader([
+                html.I(className="fas fa-chart-line me-2"),
+                "Classement des annonces"
+            ]),
+            dbc.CardBody([
                 dbc.Row(
                     [
                         dbc.Col(
-                            dcc.Graph(id='scatter-chart', figure=fig_scatter, className="dash-graph"),
-                            width=6,
-                            className="mb-4",
-                        ),
-                        dbc.Col(
-                            dcc.Graph(id='prix-m2-chart', figure=fig_prix_m2, className="dash-graph"),
-                            width=6,
-                            className="mb-4",
+                            dcc.Dropdown(
+                                id='classement-cle',
+                                options=[
+                                    {'label': 'Prix le plus élevé', 'value': 'prix'},
+                                    {'label': 'Prix/m² le plus élevé', 'value': 'prix_m2'},
+                                    {'label': 'Plus grande superficie', 'value': 'superficie'},
+                                ],
+                                value='prix',
+                                clearable=False,
+                            ),
+                            width=4,
                         ),
-                    ]
-                ),
-                dbc.Row(
-                    [
                         dbc.Col(
-                            dcc.Graph(id='heatmap-chart', figure=fig_heatmap, className="dash-graph"),
-                            width=12,
-                            className="mb-4",
+                            dcc.Dropdown(
+                                id='classement-taille',
+                                options=[{'label': f"{t} par page", 'value': t} for t in TAILLES_PAGE_CLASSEMENT],
+                                value=TAILLE_PAGE_CLASSEMENT,
+                                clearable=False,
+                            ),
+                            width=2,
                         ),
-                    ]
+                    ],
+                    className="mb-3",
                 ),
-            ],
-            width=9,
-        ),
-        dbc.Col(
-            filters,
-            width=3,
-        ),
-    ],
-    className="fade-in",
-)
-
-# Top annonces table
-if not df.empty:
-    top_annonces = df.sort_values('Prix_nettoye', ascending=False).head(5)
-    top_annonces_table = dbc.Card(
-        [
-            dbc.CardHeader([
-                html.I(className="fas fa-chart-line me-2"),
-                "Top 5 annonces les plus chères"
-            ]),
-            dbc.CardBody(
                 DataTable(
                     id='top-annonces-table',
                     columns=[
@@ -818,8 +985,10 @@ if not df.empty:
                         {'name': 'Type', 'id': 'type_bien'},
                         {'name': 'Nature', 'id': 'nature'},  # Ajout de la colonne nature
                         {'name': 'Ville', 'id': 'Ville'},
+                        {'name': 'Superficie (m²)', 'id': 'Superficie_nettoye'},
+                        {'name': 'Prix/m²', 'id': 'prix_m2'},
                     ],
-                    data=top_annonces.to_dict('records'),
+                    data=donnees_classement,
                     style_header={
                         'backgroundColor': '#5B86E5',
                         'color': 'white',
@@ -837,41 +1006,18 @@ if not df.empty:
                             'backgroundColor': 'rgb(248, 248, 248)'
                         }
                     ],
-                    page_size=5,
-                )
-            )
+                    # Pagination côté serveur : seule la page affichée est envoyée
+                    page_action='custom',
+                    page_current=0,
+                    page_size=TAILLE_PAGE_CLASSEMENT,
+                    page_count=nb_pages_classement,
+                ),
+            ]),
         ],
         className="mb-4 fade-in",
     )
-else:
-    top_annonces_table = html.Div()
 
-# Footer
-footer = html.Footer(
-    dbc.Container(
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        html.H5("Analyse Immobilière Tunisie", className="text-white"),
-                        html.P(
-                            "Tableau de bord analytique pour le marché immobilier tunisien",
-                            className="text-muted"
-                        ),
-                    ],
-                    width=6,
-                ),
-            ]
-        ),
-        className="py-4",
-    ),
-    className="mt-4 footer",
-)
-
-# App layout
-app.layout = html.Div(
-    [
-        header,
+    return [
         dbc.Container(
             [
                 metrics,
@@ -880,65 +1026,148 @@ app.layout = html.Div(
             ],
             fluid=True,
         ),
-        footer
+        dcc.Store(id='signatures-sorties', data=signatures),
     ]
-)
+
+
+# Coquille servie tant que le préchauffage n'est pas terminé : elle s'affiche
+# sans attendre les données, puis l'intervalle la remplace par le contenu
+def coquille():
+    return dbc.Container(
+        [
+            dbc.Spinner(color="primary", size="lg"),
+            html.P("Chargement des annonces…", className="lead mt-3"),
+        ],
+        className="text-center py-5 fade-in",
+    )
+
+
+# Layout construit à chaque chargement de page
+def construire_layout():
+    pret = phases_demarrage.pret.is_set()
+    return html.Div(
+        [
+            entete(),
+            html.Div(construire_contenu() if pret else coquille(), id='contenu'),
+            pied_de_page(),
+            # Identifiant de la page : la dernière demande de la page gagne (voir coalescence.py)
+            dcc.Store(id='session-id', data=uuid.uuid4().hex),
+            dcc.Interval(id='prechauffage-intervalle', interval=INTERVALLE_PRECHAUFFAGE_MS, disabled=pret),
+        ]
+    )
+
+
+app.layout = construire_layout
 
 # Callbacks
+# Fin du préchauffage : la coquille est remplacée par le contenu, l'intervalle s'arrête
+@app.callback(
+    Output('contenu', 'children'),
+    Output('prechauffage-intervalle', 'disabled'),
+    Input('prechauffage-intervalle', 'n_intervals'),
+    prevent_initial_call=True,
+)
+def afficher_contenu(n_intervals):
+    if not phases_demarrage.pret.is_set():
+        raise PreventUpdate
+    return construire_contenu(), True
+
+# Le bouton de réinitialisation n'est pas une entrée : reset_filters remet les
+# filtres à zéro, ce qui déclenche ce callback une seule fois
 @app.callback(
     [
-        Output('nature-chart', 'figure'),
-        Output('type-chart', 'figure'),
-        Output('ville-chart', 'figure'),
-        Output('prix-distribution-chart', 'figure'),
-        Output('prix-moyen-chart', 'figure'),
-        Output('scatter-chart', 'figure'),
-        Output('prix-m2-chart', 'figure'),
-        Output('heatmap-chart', 'figure'),
-        Output('top-annonces-table', 'data'),  # Ajout de cet output
+        *[Output(id_figure, 'figure') for id_figure in SORTIES_FIGURES],
+        *[Output(id_kpi, 'children') for id_kpi in SORTIES_KPIS],
+        Output('signatures-sorties', 'data'),
     ],
     [
         Input('nature-dropdown', 'value'),
         Input('type-dropdown', 'value'),
-        Input('prix-slider', 'value'),
+        Input('prix-filtre', 'data'),
         Input('ville-dropdown', 'value'),
-        Input('reset-button', 'n_clicks')
-    ]
+    ],
+    State('signatures-sorties', 'data'),
+    State('session-id', 'data'),
 )
-def update_charts(nature_value, type_value, prix_range, villes_value, n_clicks):
-    ctx = callback_context
-    
-    # Reset filters if button was clicked
-    if ctx.triggered_id == 'reset-button':
-        # Don't actually filter the dataframe here, just return to original figures
-        return (*create_figures(df), df.sort_values('Prix_nettoye', ascending=False).head(5).to_dict('records'))
-    
-    # Apply filters
-    filtered_df = df.copy()
-    
-    # Filter by nature
-    if nature_value != 'Tous':
-        filtered_df = filtered_df[filtered_df['nature'] == nature_value]
-    
-    # Filter by type
-    if type_value != 'Tous':
-        filtered_df = filtered_df[filtered_df['type_bien'] == type_value]
-    
-    # Filter by price range
-    filtered_df = filtered_df[(filtered_df['Prix_nettoye'] >= prix_range[0]) & 
-                             (filtered_df['Prix_nettoye'] <= prix_range[1])]
-    
-    # Filter by ville
-    if villes_value != 'Toutes' and isinstance(villes_value, list) and len(villes_value) > 0 and 'Toutes' not in villes_value:
-        filtered_df = filtered_df[filtered_df['Ville'].isin(villes_value)]
-    
-    # Create updated figures with filtered dataframe
-    figures = create_figures(filtered_df)
-    
-    # Update top annonces table
-    top_annonces_data = filtered_df.sort_values('Prix_nettoye', ascending=False).head(5).to_dict('records')
-    
-    return (*figures, top_annonces_data)
+def update_charts(nature_value, type_value, prix_range, villes_value, signatures_client, session_id):
+    # Un seul instantané (version, df, index) pour tout le calcul, même si le jeu est rechargé entre-temps
+    etat = donnees_courantes()
+    filtres = (nature_value, type_value, prix_range, villes_value)
+    jeton = coalescence.entrer(session_id)
+    try:
+        sorties, signatures = calculer_sorties(
+            etat, filtres, signatures_client, controle=lambda: coalescence.verifier(session_id, jeton)
+        )
+    except DemandePerimee:
+        # Une demande plus récente de cette page est en cours : c'est elle qui répondra
+        raise PreventUpdate
+    finally:
+        coalescence.sortir()
+    return (*[sorties[id_sortie] for id_sortie in SORTIES_FIGURES], *[sorties[id_kpi] for id_kpi in SORTIES_KPIS], signatures)
+
+# Classement paginé : une page lue dans l'ordre précalculé de l'index à chaque
+# changement de filtre, de clé, de taille ou de page
+@app.callback(
+    Output('top-annonces-table', 'data'),
+    Output('top-annonces-table', 'page_count'),
+    Output('top-annonces-table', 'page_current'),
+    Output('top-annonces-table', 'page_size'),
+    Input('nature-dropdown', 'value'),
+    Input('type-dropdown', 'value'),
+    Input('prix-filtre', 'data'),
+    Input('ville-dropdown', 'value'),
+    Input('classement-cle', 'value'),
+    Input('classement-taille', 'value'),
+    Input('top-annonces-table', 'page_current'),
+)
+def update_classement(nature_value, type_value, prix_range, villes_value, cle, taille, page):
+    # Nouveau classement (filtre, clé ou taille) : retour à la première page
+    if ctx.triggered_id != 'top-annonces-table':
+        page = 0
+    taille = taille or TAILLE_PAGE_CLASSEMENT
+    filtres = (nature_value, type_value, prix_range, villes_value)
+    with chrono_figures.mesurer('top-annonces-table'):
+        donnees, nb_pages = page_classement(donnees_courantes(), filtres, cle or 'prix', page or 0, taille)
+    return donnees, nb_pages, page or 0, taille
+
+# Anti-rebond côté navigateur : la plage de prix n'est transmise (prix-filtre)
+# qu'après DELAI_CURSEUR_MS sans nouvelle valeur du curseur
+app.clientside_callback(
+    """
+    function(valeur) {
+        const etat = window.prixCurseur = window.prixCurseur || {numero: 0};
+        const numero = ++etat.numero;
+        return new Promise(resolve => setTimeout(
+            () => resolve(numero === etat.numero ? valeur : window.dash_clientside.no_update),
+            %d
+        ));
+    }
+    """ % DELAI_CURSEUR_MS,
+    Output('prix-filtre', 'data'),
+    Input('prix-slider', 'value'),
+    prevent_initial_call=True
+)
+
+# Détail d'une annonce du nuage prix/superficie, lu au clic plutôt qu'embarqué dans la figure
+@app.callback(
+    Output('scatter-detail', 'children'),
+    Input('scatter-chart', 'clickData'),
+    prevent_initial_call=True
+)
+def afficher_detail(click_data):
+    _, df, _, textes = donnees_courantes()
+    annonce = detail_annonce(df, click_data, textes)
+    if annonce is None:
+        return ""
+    superficie = annonce.get('Superficie_nettoye')
+    return [
+        html.Strong(annonce.get('Titre', '')),
+        html.Br(),
+        f"{annonce.get('Prix', '')} — {annonce.get('type_bien', '')} — {annonce.get('nature', '')} — {annonce.get('Ville', '')}",
+        f" — {superficie:.0f} m²" if pd.notna(superficie) else "",
+        html.Br(),
+        html.A("Voir l'annonce", href=annonce['Lien'], target="_blank") if isinstance(annonce.get('Lien'), str) and annonce['Lien'].startswith('http') else "",
+    ]
 
 # Reset callback for the filters
 @app.callback(
@@ -952,12 +1181,16 @@ def update_charts(nature_value, type_value, prix_range, villes_value, n_clicks):
     prevent_initial_call=True
 )
 def reset_filters(n_clicks):
+    _, df, _, _ = donnees_courantes()
     return ('Tous', 
             'Tous', 
             [int(df['Prix_nettoye'].min()) if not df.empty and 'Prix_nettoye' in df else 0, 
              int(df['Prix_nettoye'].max()) if not df.empty and 'Prix_nettoye' in df else 1000000],
             'Toutes')
 
+phases_demarrage.noter('import', time.perf_counter() - _DEBUT_IMPORT)
+phases_demarrage.prechauffer(prechauffer)
+
 # Run the app
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
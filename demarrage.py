@@ -0,0 +1,83 @@
+"""Démarrage du tableau de bord : durée des phases et préchauffage en arrière-plan.
+
+Les phases (import, chargement, nettoyage, compactage, index, figures) sont
+mesurées une seule fois : un rechargement ultérieur du jeu ne modifie pas la
+répartition du démarrage. Elle est affichée à la fin du préchauffage, renvoyée par /sante
+et exposée au format texte Prometheus.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PhasesDemarrage:
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.durees = {}  # phase -> secondes, dans l'ordre d'exécution
+        self.pret = threading.Event()
+        self._fil = None
+
+    def noter(self, phase, duree):
+        """Enregistre la première durée de `phase` ; les suivantes sont ignorées."""
+        with self._verrou:
+            self.durees.setdefault(phase, duree)
+
+    @contextmanager
+    def mesurer(self, phase):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.noter(phase, time.perf_counter() - debut)
+
+    def resume(self):
+        with self._verrou:
+            durees = dict(self.durees)
+        detail = " | ".join(f"{phase} {duree:.2f} s" for phase, duree in durees.items())
+        return f"⏱️ Démarrage : {detail} (total {sum(durees.values()):.2f} s)"
+
+    def etat(self):
+        """Résumé JSON pour le contrôle de santé."""
+        with self._verrou:
+            return {"pret": self.pret.is_set(), "phases": {p: round(d, 4) for p, d in self.durees.items()}}
+
+    def texte_metriques(self, prefixe="dashboard_demarrage"):
+        """Durées par phase au format d'exposition texte Prometheus."""
+        with self._verrou:
+            durees = list(self.durees.items())
+        lignes = [f"# TYPE {prefixe}_secondes gauge"]
+        lignes += [f'{prefixe}_secondes{{phase="{phase}"}} {duree:.6f}' for phase, duree in durees]
+        lignes.append(f"# TYPE {prefixe}_pret gauge")
+        lignes.append(f"{prefixe}_pret {int(self.pret.is_set())}")
+        return "\n".join(lignes) + "\n"
+
+    def attendre(self):
+        """Attend la fin du préchauffage s'il a été lancé (avant un fork, par exemple)."""
+        if self._fil is not None:
+            self._fil.join()
+
+    def prechauffer(self, fonction):
+        """Lance `fonction` dans un thread ; `pret` est levé à la fin, même en cas d'erreur.
+
+        Sans effet si le préchauffage est déjà lancé ou terminé.
+        """
+        with self._verrou:
+            if self._fil is not None:
+                return self._fil
+
+            def executer():
+                try:
+                    fonction()
+                except Exception as e:
+                    print(f"❌ Erreur lors du préchauffage: {e}")
+                finally:
+                    self.pret.set()
+                    print(self.resume())
+
+            self._fil = threading.Thread(target=executer, name="prechauffage", daemon=True)
+            self._fil.start()
+            return self._fil
+
+
+# Instance partagée du processus
+phases_demarrage = PhasesDemarrage()
@@ -0,0 +1,184 @@
+"""Jeu d'annonces nettoyé partagé par l'API (app.py) et le tableau de bord.
+
+Un seul module charge et nettoie les annonces, puis garde le résultat en
+mémoire : les deux applications importent `jeu_annonces` au lieu de relire et
+renettoyer le fichier chacune de leur côté (ou à chaque requête).
+
+Source : la première qui existe parmi `SOURCES` (Parquet écrit par le
+scraper, puis les exports Excel, ou une base SQLite `.db`). Une empreinte de
+la source (chemin, mtime, taille ; pour SQLite, le compteur `stats_version`
+incrémenté à chaque lot écrit) est relue au plus toutes les
+`INTERVALLE_VERIFICATION` secondes. Si elle a changé, un seul thread recharge
+pendant que les autres continuent de lire l'ancien jeu, puis le couple
+(version, DataFrame) est remplacé d'un bloc. Les abonnés (index et cache du
+tableau de bord) sont prévenus après chaque rechargement. Le premier
+chargement alimente les phases « chargement » et « nettoyage » du démarrage
+(voir demarrage.py).
+
+`jeu_compact` est la variante du tableau de bord : DataFrame réduit aux
+colonnes des graphiques (voir stockage.compacter_annonces) et textes des
+annonces lus à la demande (TextesAnnonces), pour tenir plus de workers par
+machine.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from base_donnees import lire_annonces
+from demarrage import phases_demarrage
+from nettoyage import nettoyer_annonces
+from stockage import (
+    COLONNES_COMPACTES,
+    FICHIER_PARQUET,
+    TextesAnnonces,
+    charger_annonces,
+    colonnes_fichier,
+    compacter_annonces,
+)
+
+FICHIER_EXCEL_SCRAPER = "Mubawab_Annonces_Location_Vente.xlsx"
+FICHIER_EXCEL_HISTORIQUE = "Mubawab_Annonces.xlsx"
+
+# Liste séparée par des virgules, par ordre de priorité (ex. "annonces.db")
+SOURCES = [s for s in os.environ.get("ANNONCES_SOURCES", "").split(",") if s] or [
+    FICHIER_PARQUET,
+    FICHIER_EXCEL_SCRAPER,
+    FICHIER_EXCEL_HISTORIQUE,
+]
+INTERVALLE_VERIFICATION = float(os.environ.get("ANNONCES_INTERVALLE", 5))
+
+
+def _est_base(chemin):
+    return chemin.lower().endswith((".db", ".sqlite", ".sqlite3"))
+
+
+def empreinte_source(chemin):
+    """Change dès que le contenu de la source change."""
+    if _est_base(chemin):
+        # En WAL, les écritures restent dans le -wal : le mtime de la base ne suffit pas
+        conn = sqlite3.connect(f"file:{chemin}?mode=ro", uri=True)
+        try:
+            return (chemin, "stats", conn.execute("SELECT version FROM stats_version").fetchone()[0])
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+    stat = os.stat(chemin)
+    return (chemin, stat.st_mtime_ns, stat.st_size)
+
+
+def _est_columnar(chemin):
+    return chemin.lower().endswith((".parquet", ".feather", ".arrow", ".ipc"))
+
+
+def charger_jeu(chemin, phases=phases_demarrage):
+    """Charge une source et renvoie le jeu nettoyé (colonnes de nettoyer_annonces)."""
+    with phases.mesurer("chargement"):
+        if _est_base(chemin):
+            conn = sqlite3.connect(f"file:{chemin}?mode=ro", uri=True)
+            try:
+                brut = lire_annonces(conn)
+            finally:
+                conn.close()
+        elif chemin.lower().endswith((".xlsx", ".xls")):
+            brut = pd.read_excel(chemin)
+        else:
+            # Parquet / Arrow : déjà nettoyé par le scraper
+            return charger_annonces(chemin)
+    with phases.mesurer("nettoyage"):
+        return nettoyer_annonces(brut)
+
+
+def charger_jeu_compact(chemin, phases=phases_demarrage):
+    """(jeu compact, TextesAnnonces) ; d'un fichier columnar, seules les colonnes compactes sont lues."""
+    if _est_columnar(chemin):
+        with phases.mesurer("chargement"):
+            presentes = colonnes_fichier(chemin)
+            df = charger_annonces(chemin, colonnes=[c for c in COLONNES_COMPACTES if c in presentes])
+    else:
+        df = charger_jeu(chemin, phases)
+    with phases.mesurer("compactage"):
+        return compacter_annonces(df), TextesAnnonces.pour_source(chemin, df)
+
+
+class JeuDonnees:
+    def __init__(self, sources=None, intervalle=INTERVALLE_VERIFICATION, compact=False):
+        self.sources = list(sources or SOURCES)
+        self.intervalle = intervalle
+        self.compact = compact
+        # (version, df, textes) remplacé d'un bloc : un lecteur ne voit jamais un état mélangé
+        self._etat = (None, *self._charger(None))
+        self._charge = False
+        self._derniere_verification = 0.0
+        self._verrou = threading.Lock()
+        self._abonnes = []
+        self.rechargements = 0
+
+    def source(self):
+        return next((s for s in self.sources if os.path.exists(s)), None)
+
+    def obtenir(self):
+        """Jeu courant ; vérifie la source au plus une fois par intervalle."""
+        if not self._charge or time.monotonic() - self._derniere_verification >= self.intervalle:
+            self.verifier()
+        return self._etat[1]
+
+    def _charger(self, chemin):
+        """(df, textes) ; textes vaut None hors mode compact (ils restent dans df)."""
+        if not self.compact:
+            return (charger_jeu(chemin) if chemin else pd.DataFrame()), None
+        if chemin:
+            return charger_jeu_compact(chemin)
+        vide = pd.DataFrame()
+        return compacter_annonces(vide), TextesAnnonces.pour_source(None, vide)
+
+    def etat(self):
+        """(version, df, textes) cohérents entre eux."""
+        self.obtenir()
+        return self._etat
+
+    def abonner(self, fonction):
+        """`fonction(version, df, textes)` est appelée après chaque rechargement (et tout de suite si déjà chargé)."""
+        self._abonnes.append(fonction)
+        if self._charge:
+            fonction(*self._etat)
+
+    def verifier(self, forcer=False):
+        """Recharge si la source a changé ; renvoie True si le jeu a été remplacé."""
+        # Premier chargement bloquant ; ensuite, un seul thread recharge à la fois
+        if not self._verrou.acquire(blocking=not self._charge or forcer):
+            return False
+        try:
+            self._derniere_verification = time.monotonic()
+            chemin = self.source()
+            try:
+                version = empreinte_source(chemin) if chemin else None
+                if self._charge and not forcer and version == self._etat[0]:
+                    return False
+                debut = time.perf_counter()
+                df, textes = self._charger(chemin)
+            except Exception as e:
+                # On garde l'ancien jeu : une écriture en cours ne doit pas vider le tableau de bord
+                print(f"❌ Erreur lors du chargement des données: {e}")
+                if self._charge:
+                    return False
+                version, (df, textes) = None, self._charger(None)
+            else:
+                print(f"✅ Données chargées depuis {chemin} : {df.shape} en {time.perf_counter() - debut:.2f} s")
+            self._etat = (version, df, textes)
+            self._charge = True
+            self.rechargements += 1
+            for fonction in self._abonnes:
+                fonction(version, df, textes)
+            return True
+        finally:
+            self._verrou.release()
+
+
+# Instance partagée du processus
+jeu_annonces = JeuDonnees()
+# Variante compacte, chargée seulement par le processus qui l'utilise (tableau de bord)
+jeu_compact = JeuDonnees(compact=True)
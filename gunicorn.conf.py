@@ -0,0 +1,33 @@
+"""Configuration gunicorn de l'API et du tableau de bord (mode production).
+
+    gunicorn -c gunicorn.conf.py -b 0.0.0.0:8000 wsgi_api:app
+    gunicorn -c gunicorn.conf.py -b 0.0.0.0:8050 wsgi_dashboard:app
+
+Avec preload_app, le jeu nettoyé (et, pour le tableau de bord, l'index et les
+figures de la page d'ouverture) est chargé une seule fois dans le processus
+maître avant le fork : les workers en partagent les pages en copie sur
+écriture au lieu d'en tenir chacun une copie. GUNICORN_PRELOAD=0 charge le jeu
+dans chaque worker (la coquille du tableau de bord est alors servie tout de suite).
+
+Les tâches de /scrape de l'API sont partagées entre les workers par
+taches_scraping.db (voir taches.py).
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+
+
+def pre_fork(server, worker):
+    # Un verrou tenu par le thread de préchauffage au moment du fork resterait pris dans le worker
+    demarrage = sys.modules.get("demarrage")
+    if demarrage is not None:
+        demarrage.phases_demarrage.attendre()
+    # Objets hérités hors du ramasse-miettes : ses passages n'écrivent plus dans les pages partagées
+    gc.freeze()
@@ -0,0 +1,284 @@
+"""Index en mémoire pour répondre aux filtres du tableau de bord sans rescanner le DataFrame.
+
+L'index est construit une fois par version du jeu chargé (donnees.jeu_compact) :
+- codes catégoriels (pd.factorize) pour nature, type_bien et Ville ;
+- permutation triée par prix pour découper la plage du RangeSlider par dichotomie ;
+- agrégats partiels (nombre, somme des prix) par groupe (nature, type_bien, Ville).
+
+Un changement de filtre se résume alors à une intersection de masques booléens
+sur les codes, et les agrégats par groupe sont obtenus en fusionnant les partiels
+précalculés (ou par np.bincount sur la sélection quand la plage de prix est réduite).
+Histogramme des prix et matrice Ville × type_bien des figures sont calculés ici
+aussi (np.histogram, np.bincount) : la figure ne transporte que les comptes.
+Les cartes d'indicateurs (kpis) en dérivent aussi. Une médiane ne se fusionne pas
+à partir de médianes par groupe : elle est lue au bon rang dans les tableaux
+triés par prix / prix au m², restreints aux groupes retenus, sans tri de la sélection.
+Le classement des annonces (prix, prix au m², superficie) est lu de la même façon
+dans un ordre précalculé par clé : une page du top-K ne trie jamais la sélection.
+"""
+import numpy as np
+import pandas as pd
+
+COLONNES_GROUPE = ["nature", "type_bien", "Ville"]
+# Clés de classement des annonces -> colonne du DataFrame
+CLES_CLASSEMENT = {"prix": "Prix_nettoye", "prix_m2": "prix_m2", "superficie": "Superficie_nettoye"}
+
+
+def histogramme(valeurs, nb_classes=30):
+    """Classes de même largeur (np.histogram) : (comptes, bords), NaN ignorés."""
+    valeurs = np.asarray(valeurs, dtype="float64")
+    valeurs = valeurs[~np.isnan(valeurs)]
+    if len(valeurs) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.histogram(valeurs, bins=nb_classes)
+
+
+def matrice_comptes(agregats, lignes, colonnes):
+    """Nombre d'annonces par (ligne, colonne) via np.bincount sur les codes catégoriels.
+
+    `lignes` : valeurs retenues pour agregats['Ville'] (dans l'ordre voulu) ;
+    `colonnes` : colonne de regroupement (type_bien). Renvoie (matrice, étiquettes des colonnes).
+    """
+    codes_lignes = pd.Index(lignes).get_indexer(agregats["Ville"])
+    codes_colonnes, etiquettes = pd.factorize(agregats[colonnes], sort=True)
+    garde = codes_lignes >= 0
+    plat = codes_lignes[garde] * len(etiquettes) + codes_colonnes[garde]
+    matrice = np.bincount(plat, weights=agregats["nombre"].to_numpy()[garde], minlength=len(lignes) * len(etiquettes))
+    matrice = matrice.reshape(len(lignes), len(etiquettes))
+    # Types absents des villes retenues : colonnes retirées, comme le pivot d'origine
+    presentes = matrice.sum(axis=0) > 0
+    return matrice[:, presentes], pd.Index(etiquettes)[presentes]
+
+
+def _est_tous(valeur, tous):
+    return valeur is None or valeur == tous
+
+
+def _villes_filtrees(villes):
+    # Même règle que le callback : 'Toutes', None ou liste vide = pas de filtre
+    if not isinstance(villes, (list, tuple)) or len(villes) == 0 or 'Toutes' in villes:
+        return None
+    return list(villes)
+
+
+def _mediane_triee(valeurs_triees, garde=None):
+    """Médiane des valeurs retenues par `garde` dans un tableau déjà trié (NaN si vide)."""
+    if garde is not None:
+        rangs = np.flatnonzero(garde)
+        if len(rangs) == 0:
+            return np.nan
+        milieu = (len(rangs) - 1) // 2, len(rangs) // 2
+        return float(valeurs_triees[rangs[milieu[0]]] + valeurs_triees[rangs[milieu[1]]]) / 2
+    if len(valeurs_triees) == 0:
+        return np.nan
+    n = len(valeurs_triees)
+    return float(valeurs_triees[(n - 1) // 2] + valeurs_triees[n // 2]) / 2
+
+
+class IndexAnnonces:
+    def __init__(self, dataframe):
+        self.taille = len(dataframe)
+        if self.taille == 0:
+            # Jeu vide (aucune source disponible) : index vide mais utilisable
+            dataframe = dataframe.reindex(columns=COLONNES_GROUPE + list(CLES_CLASSEMENT.values()))
+
+        # Codes catégoriels
+        self.codes = {}
+        self.categories = {}
+        for colonne in COLONNES_GROUPE:
+            codes, uniques = pd.factorize(dataframe[colonne])
+            self.codes[colonne] = codes.astype(np.int32)
+            self.categories[colonne] = pd.Index(uniques)
+
+        # Permutation triée par prix pour la plage du slider
+        self.prix = dataframe["Prix_nettoye"].to_numpy(dtype="float64")
+        self.ordre_prix = np.argsort(self.prix, kind="stable")
+        self.prix_tries = self.prix[self.ordre_prix]
+
+        # Prix au m² triés (NaN en fin) pour sa médiane
+        prix_m2 = dataframe["prix_m2"].to_numpy(dtype="float64") if "prix_m2" in dataframe else np.full(self.taille, np.nan)
+        ordre_m2 = np.argsort(prix_m2, kind="stable")
+        self.nb_m2 = int(np.count_nonzero(~np.isnan(prix_m2)))
+        self.m2_tries = prix_m2[ordre_m2][:self.nb_m2]
+        self.prix_ordre_m2 = self.prix[ordre_m2][:self.nb_m2]
+
+        # Ordres croissants (NaN exclus) par clé de classement : un top-K filtré s'y lit sans tri
+        superficie = dataframe["Superficie_nettoye"].to_numpy(dtype="float64")
+        ordre_superficie = np.argsort(superficie, kind="stable")
+        self.ordres = {
+            "prix": self.ordre_prix,
+            "prix_m2": ordre_m2[:self.nb_m2],
+            "superficie": ordre_superficie[:int(np.count_nonzero(~np.isnan(superficie)))],
+        }
+
+        # Code de groupe combiné (nature, type_bien, Ville)
+        self.dimensions = [len(self.categories[c]) for c in COLONNES_GROUPE]
+        self.code_groupe = np.ravel_multi_index(
+            [self.codes[c] for c in COLONNES_GROUPE], self.dimensions
+        ) if self.taille else np.empty(0, dtype=np.int64)
+        self.nb_groupes = int(np.prod(self.dimensions))
+        # Code de groupe dans l'ordre des prix (et des prix au m²) : médianes sans tri
+        self.groupe_ordre_prix = self.code_groupe[self.ordre_prix]
+        self.groupe_ordre_m2 = self.code_groupe[ordre_m2][:self.nb_m2]
+
+        # Agrégats partiels précalculés par groupe
+        self.nombre_groupe = np.bincount(self.code_groupe, minlength=self.nb_groupes)
+        self.somme_groupe = np.bincount(self.code_groupe, weights=self.prix, minlength=self.nb_groupes)
+
+    # -- Sélection -----------------------------------------------------------
+
+    def _autorises(self, colonne, valeurs):
+        """Table de correspondance code -> booléen pour les valeurs retenues."""
+        return self.categories[colonne].isin(valeurs)
+
+    def _masques_codes(self, nature, type_bien, villes):
+        masques = []
+        if not _est_tous(nature, 'Tous'):
+            masques.append(("nature", self._autorises("nature", [nature])))
+        if not _est_tous(type_bien, 'Tous'):
+            masques.append(("type_bien", self._autorises("type_bien", [type_bien])))
+        villes = _villes_filtrees(villes)
+        if villes is not None:
+            masques.append(("Ville", self._autorises("Ville", villes)))
+        return masques
+
+    def plage_complete(self, prix_range):
+        return (
+            prix_range is None
+            or self.taille == 0
+            or (prix_range[0] <= self.prix_tries[0] and prix_range[1] >= self.prix_tries[-1])
+        )
+
+    def tranche_prix(self, prix_range):
+        """Bornes [debut, fin) dans prix_tries couvrant prix_range (inclusif)."""
+        if prix_range is None:
+            return 0, self.taille
+        debut = np.searchsorted(self.prix_tries, prix_range[0], side="left")
+        fin = np.searchsorted(self.prix_tries, prix_range[1], side="right")
+        return int(debut), int(max(debut, fin))
+
+    def selection(self, nature='Tous', type_bien='Tous', prix_range=None, villes='Toutes'):
+        """Positions (ordre d'origine) des lignes qui passent tous les filtres."""
+        masques = self._masques_codes(nature, type_bien, villes)
+        if self.plage_complete(prix_range):
+            if not masques:
+                return np.arange(self.taille)
+            garde = np.ones(self.taille, dtype=bool)
+            for colonne, autorises in masques:
+                garde &= autorises[self.codes[colonne]]
+            return np.flatnonzero(garde)
+
+        debut, fin = self.tranche_prix(prix_range)
+        candidats = self.ordre_prix[debut:fin]
+        if masques:
+            garde = np.ones(len(candidats), dtype=bool)
+            for colonne, autorises in masques:
+                garde &= autorises[self.codes[colonne][candidats]]
+            candidats = candidats[garde]
+        return np.sort(candidats)
+
+    def classement(self, nature='Tous', type_bien='Tous', prix_range=None, villes='Toutes', cle="prix", debut=0, fin=5):
+        """Positions des annonces de rang [debut, fin) par `cle` décroissante, et nombre d'annonces classées.
+
+        Sans filtre, simple tranche de l'ordre précalculé ; sinon un masque
+        booléen dans l'ordre de la clé (jamais de tri de la sélection).
+        Les annonces sans valeur pour la clé ne sont pas classées.
+        """
+        ordre = self.ordres[cle]
+        filtre_prix = not self.plage_complete(prix_range)
+        if cle == "prix" and filtre_prix:
+            # La plage de prix est déjà une tranche de l'ordre des prix
+            debut_prix, fin_prix = self.tranche_prix(prix_range)
+            ordre, filtre_prix = ordre[debut_prix:fin_prix], False
+        garde = None
+        if self._masques_codes(nature, type_bien, villes):
+            garde = self._groupes_autorises(nature, type_bien, villes)[self.code_groupe[ordre]]
+        if filtre_prix:
+            prix = self.prix[ordre]
+            dans_plage = (prix >= prix_range[0]) & (prix <= prix_range[1])
+            garde = dans_plage if garde is None else garde & dans_plage
+        if garde is not None:
+            ordre = ordre[garde]
+        total = len(ordre)
+        # Décroissant : rang r = ordre[total - 1 - r]
+        return ordre[max(total - fin, 0):max(total - debut, 0)][::-1], total
+
+    # -- Agrégats ------------------------------------------------------------
+
+    def _groupes_autorises(self, nature, type_bien, villes):
+        garde = np.ones(self.dimensions, dtype=bool)
+        for colonne, autorises in self._masques_codes(nature, type_bien, villes):
+            forme = [1, 1, 1]
+            axe = COLONNES_GROUPE.index(colonne)
+            forme[axe] = len(autorises)
+            garde &= autorises.reshape(forme)
+        return garde.ravel()
+
+    def agregats(self, nature='Tous', type_bien='Tous', prix_range=None, villes='Toutes', positions=None):
+        """Agrégats (nombre, somme_prix) par groupe pour l'état de filtre donné.
+
+        Sur la plage de prix complète, les partiels précalculés sont simplement
+        fusionnés ; sinon on agrège la sélection par np.bincount sur les codes.
+        """
+        return self._table_groupes(*self._partiels(nature, type_bien, prix_range, villes, positions))
+
+    def _partiels(self, nature, type_bien, prix_range, villes, positions=None):
+        """Tableaux (nombre, somme_prix) indexés par code de groupe."""
+        if self.plage_complete(prix_range):
+            nombre = np.where(self._groupes_autorises(nature, type_bien, villes), self.nombre_groupe, 0)
+            somme = np.where(nombre > 0, self.somme_groupe, 0.0)
+        else:
+            if positions is None:
+                positions = self.selection(nature, type_bien, prix_range, villes)
+            codes = self.code_groupe[positions]
+            nombre = np.bincount(codes, minlength=self.nb_groupes)
+            somme = np.bincount(codes, weights=self.prix[positions], minlength=self.nb_groupes)
+        return nombre, somme
+
+    def kpis(self, nature='Tous', type_bien='Tous', prix_range=None, villes='Toutes', positions=None):
+        """Indicateurs des cartes du tableau de bord pour l'état de filtre donné.
+
+        Nombre, somme et répartitions viennent des partiels par groupe ; les
+        médianes sont lues au rang voulu dans les tableaux triés, restreints à la
+        tranche de prix et aux groupes retenus (aucun tri ni rescan du DataFrame).
+        """
+        nombre, somme = self._partiels(nature, type_bien, prix_range, villes, positions)
+        total = int(nombre.sum())
+        par_axe = nombre.reshape(self.dimensions) if self.taille else np.zeros((0, 0, 0), dtype=np.int64)
+        par_nature = dict(zip(self.categories["nature"], par_axe.sum(axis=(1, 2))))
+
+        groupes = None
+        if self._masques_codes(nature, type_bien, villes):
+            groupes = self._groupes_autorises(nature, type_bien, villes)
+        debut, fin = (0, self.taille) if self.plage_complete(prix_range) else self.tranche_prix(prix_range)
+        garde = None if groupes is None else groupes[self.groupe_ordre_prix[debut:fin]]
+        prix_median = _mediane_triee(self.prix_tries[debut:fin], garde)
+
+        garde_m2 = None
+        if not self.plage_complete(prix_range):
+            garde_m2 = (self.prix_ordre_m2 >= prix_range[0]) & (self.prix_ordre_m2 <= prix_range[1])
+        if groupes is not None:
+            garde_groupes = groupes[self.groupe_ordre_m2]
+            garde_m2 = garde_groupes if garde_m2 is None else garde_m2 & garde_groupes
+        prix_m2_median = _mediane_triee(self.m2_tries, garde_m2)
+
+        return {
+            "nb_annonces": total,
+            "prix_moyen": float(somme.sum()) / total if total else np.nan,
+            "prix_median": prix_median,
+            "nb_villes": int(np.count_nonzero(par_axe.sum(axis=(0, 1)))),
+            "nb_vente": int(par_nature.get("Vente", 0)),
+            "nb_location": int(par_nature.get("Location", 0)),
+            "prix_m2_median": prix_m2_median,
+        }
+
+    def _table_groupes(self, nombre, somme):
+        non_vides = np.flatnonzero(nombre)
+        indices = np.unravel_index(non_vides, self.dimensions)
+        table = {
+            colonne: self.categories[colonne].take(indices[i]).to_numpy()
+            for i, colonne in enumerate(COLONNES_GROUPE)
+        }
+        table["nombre"] = nombre[non_vides]
+        table["somme_prix"] = somme[non_vides]
+        return pd.DataFrame(table)
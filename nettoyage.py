@@ -0,0 +1,225 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Bornes et libellés des catégories de prix
+BORNES_CATEGORIES_PRIX = [0, 100000, 250000, 500000, 1000000, float('inf')]
+LIBELLES_CATEGORIES_PRIX = ["< 100K", "100K-250K", "250K-500K", "500K-1M", "> 1M"]
+
+# Mots-clés du titre -> type de bien (l'ordre compte : premier trouvé)
+MOTS_CLES_TYPE_BIEN = [
+    ("appart", "Appartement"),
+    ("villa", "Villa"),
+    ("terrain", "Terrain"),
+    ("maison", "Maison"),
+]
+
+# Caractères c tels que c.isspace() : ceux que str.strip() retire
+BLANCS = ("\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005"
+          "\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000")
+
+
+# ---------------------------------------------------------------------------
+# Versions ligne par ligne (référence historique de l'ancien load_data du tableau de bord)
+# ---------------------------------------------------------------------------
+
+def nettoyer_prix(prix_str):
+    try:
+        if isinstance(prix_str, str):
+            prix_str = prix_str.replace(" ", "").replace(".", "").replace(",", "")
+            match = re.search(r"\d+", prix_str)
+            if match:
+                return int(match.group())
+        elif isinstance(prix_str, (int, float)):
+            return int(prix_str)
+    except:
+        return None
+    return None
+
+
+def extraire_type_bien(titre):
+    titre = titre.lower()
+    if "appart" in titre:
+        return "Appartement"
+    elif "villa" in titre:
+        return "Villa"
+    elif "terrain" in titre:
+        return "Terrain"
+    elif "maison" in titre:
+        return "Maison"
+    else:
+        return "Autre"
+
+
+def determiner_nature(titre, prix):
+    titre_lower = str(titre).lower()
+    prix_str = str(prix).lower()
+    if "louer" in titre_lower or "locat" in titre_lower or "/mois" in prix_str or "par mois" in prix_str:
+        return "Location"
+    else:
+        return "Vente"
+
+
+def nettoyer_superficie(sup_str):
+    try:
+        if isinstance(sup_str, str):
+            match = re.search(r"\d+", sup_str)
+            if match:
+                return int(match.group())
+        elif isinstance(sup_str, (int, float)):
+            return int(sup_str)
+    except:
+        return None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Versions vectorisées (pyarrow.compute / NumPy)
+# ---------------------------------------------------------------------------
+
+def _masque_chaines(serie):
+    # Vrai là où la valeur est une chaîne (isinstance(x, str) de la version ligne)
+    if pd.api.types.infer_dtype(serie, skipna=True) == "string":
+        return serie.notna().to_numpy()
+    return np.fromiter((isinstance(v, str) for v in serie.to_numpy()), dtype=bool, count=len(serie))
+
+
+def _chaines(serie, masque_chaines):
+    # Chaînes de la colonne en tableau Arrow : les expressions régulières sont évaluées
+    # par pyarrow.compute (RE2) sur tout le tableau, sans passer par un objet Python par ligne
+    return pa.array(serie[masque_chaines], type=pa.string(), from_pandas=True)
+
+
+def _premier_entier(chaines):
+    # Équivalent de int(re.search(r"\d+", s).group()), NaN si aucun chiffre
+    chiffres = pc.struct_field(pc.extract_regex(chaines, r"(?P<chiffres>\p{Nd}+)"), [0])
+    if not pc.any(pc.invert(pc.string_is_ascii(chiffres))).as_py():
+        return pc.cast(chiffres, pa.float64()).to_numpy(zero_copy_only=False)
+    # Chiffres d'une autre écriture (\d de re est Unicode) : float() les convertit, pas Arrow
+    return np.array([np.nan if c is None else float(c) for c in chiffres.to_pylist()], dtype="float64")
+
+
+def _valeurs_numeriques(serie, masque_chaines):
+    # int(x) pour les int/float déjà numériques (NaN/inf -> None comme dans la version ligne)
+    valeurs = pd.to_numeric(serie.where(~masque_chaines), errors="coerce").to_numpy(dtype="float64", copy=True)
+    valeurs[~np.isfinite(valeurs)] = np.nan
+    return np.trunc(valeurs)
+
+
+def _assembler(serie, valeurs):
+    # Même dtype que Series.apply : int64 si aucune valeur manquante, float64 sinon
+    resultat = pd.Series(valeurs, index=serie.index, dtype="float64")
+    if len(resultat) and resultat.notna().all():
+        return resultat.astype("int64")
+    return resultat
+
+
+def _serie_texte(valeurs, index):
+    # Même dtype que Series.apply renvoyant des chaînes : inféré (str avec pandas 3), object si vide
+    return pd.Series(valeurs, index=index, dtype=None if len(valeurs) else object)
+
+
+def nettoyer_prix_serie(serie):
+    masque = _masque_chaines(serie)
+    valeurs = _valeurs_numeriques(serie, masque)
+    compacts = _chaines(serie, masque)
+    for separateur in " .,":
+        compacts = pc.replace_substring(compacts, separateur, "")
+    valeurs[masque] = _premier_entier(compacts)
+    return _assembler(serie, valeurs)
+
+
+def nettoyer_superficie_serie(serie):
+    masque = _masque_chaines(serie)
+    valeurs = _valeurs_numeriques(serie, masque)
+    valeurs[masque] = _premier_entier(_chaines(serie, masque))
+    return _assembler(serie, valeurs)
+
+
+def extraire_ville_serie(serie):
+    masque = _masque_chaines(serie)
+    villes = np.full(len(serie), "Inconnu", dtype=object)
+    # Texte après la dernière virgule (split(",")[-1]), sans les blancs de str.strip()
+    apres_virgule = pc.replace_substring_regex(_chaines(serie, masque), r"(?s)^.*,", "")
+    villes[masque] = pc.utf8_trim(apres_virgule, BLANCS).to_numpy(zero_copy_only=False)
+    return _serie_texte(villes, serie.index)
+
+
+def extraire_type_bien_serie(serie):
+    titres = serie.astype(str).str.lower()
+    conditions = [titres.str.contains(mot, regex=False).to_numpy() for mot, _ in MOTS_CLES_TYPE_BIEN]
+    choix = [type_bien for _, type_bien in MOTS_CLES_TYPE_BIEN]
+    return _serie_texte(np.select(conditions, choix, default="Autre").astype(object), serie.index)
+
+
+def determiner_nature_serie(titres, prix):
+    titres = titres.astype(str).str.lower()
+    prix = prix.astype(str).str.lower()
+    location = (
+        titres.str.contains("louer", regex=False)
+        | titres.str.contains("locat", regex=False)
+        | prix.str.contains("/mois", regex=False)
+        | prix.str.contains("par mois", regex=False)
+    )
+    return _serie_texte(np.where(location.to_numpy(), "Location", "Vente").astype(object), titres.index)
+
+
+def calculer_prix_m2(prix, superficie):
+    prix = prix.to_numpy(dtype="float64")
+    superficie = superficie.to_numpy(dtype="float64")
+    valide = np.isfinite(superficie) & (superficie > 0)
+    prix_m2 = np.full(len(prix), np.nan)
+    np.divide(prix, superficie, out=prix_m2, where=valide)
+    return prix_m2
+
+
+def categoriser_prix(prix):
+    return pd.cut(prix, bins=BORNES_CATEGORIES_PRIX, labels=LIBELLES_CATEGORIES_PRIX)
+
+
+def nettoyer_annonces(df, verbose=False):
+    """Applique tout le nettoyage des annonces sur un DataFrame brut.
+
+    Produit les colonnes Prix_nettoye, Ville, type_bien, nature,
+    Superficie_nettoye, prix_m2 et categorie_prix sans boucle Python par ligne.
+    """
+    df = df.dropna(subset=["Titre", "Prix", "Localisation"]).copy()
+    if verbose:
+        print("Après suppression des NaN :", df.shape)
+
+    df["Prix_nettoye"] = nettoyer_prix_serie(df["Prix"])
+    df = df.dropna(subset=["Prix_nettoye"])
+    if verbose:
+        print("Après nettoyage du prix :", df.shape)
+
+    df["Ville"] = extraire_ville_serie(df["Localisation"])
+    df["type_bien"] = extraire_type_bien_serie(df["Titre"])
+    df["nature"] = determiner_nature_serie(df["Titre"], df["Prix"])
+    df["Superficie_nettoye"] = nettoyer_superficie_serie(df["Superficie"])
+    df["prix_m2"] = calculer_prix_m2(df["Prix_nettoye"], df["Superficie_nettoye"])
+    df["categorie_prix"] = categoriser_prix(df["Prix_nettoye"])
+    return df
+
+
+def nettoyer_annonces_ligne(df):
+    """Ancienne implémentation à base d'apply(), conservée comme référence."""
+    df = df.dropna(subset=["Titre", "Prix", "Localisation"]).copy()
+    df["Prix_nettoye"] = df["Prix"].apply(nettoyer_prix)
+    df = df.dropna(subset=["Prix_nettoye"])
+    df["Ville"] = df["Localisation"].apply(
+        lambda x: str(x).split(",")[-1].strip() if isinstance(x, str) else "Inconnu"
+    )
+    df["type_bien"] = df["Titre"].apply(extraire_type_bien)
+    df["nature"] = df.apply(lambda row: determiner_nature(row["Titre"], row["Prix"]), axis=1)
+    df["Superficie_nettoye"] = df["Superficie"].apply(nettoyer_superficie)
+    df["prix_m2"] = df.apply(
+        lambda row: row["Prix_nettoye"] / row["Superficie_nettoye"]
+        if pd.notnull(row["Superficie_nettoye"]) and row["Superficie_nettoye"] > 0
+        else None,
+        axis=1
+    )
+    df["categorie_prix"] = categoriser_prix(df["Prix_nettoye"])
+    return df
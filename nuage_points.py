@@ -0,0 +1,102 @@
+"""Nuage prix / superficie du tableau de bord, en mode grands volumes.
+
+Avec px.scatter sur toutes les lignes (et Titre / Prix / Ville en hover),
+la figure pèse des dizaines de Mo à quelques centaines de milliers de points :
+sérialisation du callback et rendu SVG du navigateur décrochent. Ici :
+- jusqu'à SEUIL_WEBGL points : rendu SVG classique ;
+- au-delà : traces Scattergl (WebGL) ;
+- au-delà de SEUIL_ECHANTILLON : échantillon stratifié par type_bien
+  (proportionnel, avec un plancher par type pour garder les types rares).
+Le détail d'une annonce n'est plus embarqué dans la figure : chaque point ne
+porte que l'étiquette de sa ligne (customdata), relue au clic par le
+callback du tableau de bord (voir detail_annonce).
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+SEUIL_WEBGL = 2_000
+SEUIL_ECHANTILLON = 20_000
+TAILLE_ECHANTILLON = 20_000
+PLANCHER_PAR_TYPE = 500
+GRAINE = 0
+
+COLONNES_DETAIL = ["Titre", "Prix", "Ville", "Superficie_nettoye", "type_bien", "nature", "Lien"]
+
+
+def echantillon_stratifie(codes, taille, plancher=PLANCHER_PAR_TYPE, graine=GRAINE):
+    """Positions d'un échantillon d'environ `taille` lignes, stratifié sur `codes`.
+
+    Chaque strate garde une part proportionnelle à son effectif, et au moins
+    `plancher` lignes (ou toutes si elle en a moins). Déterministe pour une
+    graine donnée : un même filtre redonne le même échantillon (cache).
+    """
+    n = len(codes)
+    if n <= taille:
+        return np.arange(n)
+    effectifs = np.bincount(codes)
+    quotas = np.minimum(effectifs, np.maximum(np.round(effectifs * taille / n).astype(np.int64), plancher))
+    # Clés aléatoires triées à l'intérieur de chaque strate : on garde les `quota` premières
+    cles = np.random.default_rng(graine).random(n)
+    ordre = np.lexsort((cles, codes))
+    debuts = np.concatenate(([0], np.cumsum(effectifs)[:-1]))
+    rang = np.arange(n) - np.repeat(debuts, effectifs)
+    garde = rang < np.repeat(quotas, effectifs)
+    return np.sort(ordre[garde])
+
+
+def figure_nuage(dataframe, couleurs, seuil_webgl=SEUIL_WEBGL, seuil_echantillon=SEUIL_ECHANTILLON,
+                 taille_echantillon=TAILLE_ECHANTILLON):
+    """Figure prix / superficie des annonces de `dataframe` ayant une superficie."""
+    points = dataframe[dataframe["Superficie_nettoye"].notna()]
+    total = len(points)
+    titre = "<b>Relation entre superficie et prix</b>"
+    if total > seuil_echantillon:
+        codes, _ = pd.factorize(points["type_bien"])
+        points = points.take(echantillon_stratifie(codes, taille_echantillon))
+        titre += f"<br><sup>échantillon stratifié par type : {len(points):,} annonces sur {total:,}</sup>"
+    Trace = go.Scattergl if len(points) > seuil_webgl else go.Scatter
+
+    fig = go.Figure()
+    for type_bien, groupe in points.groupby("type_bien", sort=False, observed=True):
+        fig.add_trace(Trace(
+            x=groupe["Superficie_nettoye"].to_numpy(),
+            y=groupe["Prix_nettoye"].to_numpy(),
+            customdata=groupe.index.to_numpy(),
+            mode="markers",
+            name=str(type_bien),
+            marker=dict(color=couleurs.get(type_bien), opacity=0.7),
+            hovertemplate="%{x:,.0f} m² — %{y:,.0f} TND<br><i>cliquer pour le détail</i><extra>%{fullData.name}</extra>",
+        ))
+    fig.update_layout(
+        title=titre,
+        legend_title_text="type_bien",
+        xaxis_title="<b>Superficie (m²)</b>",
+        yaxis_title="<b>Prix (TND)</b>",
+        margin=dict(t=50, b=20, l=20, r=20),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        title_font=dict(size=20, color="#2C3E50")
+    )
+    return fig
+
+
+def detail_annonce(dataframe, click_data, textes=None):
+    """Ligne (dict) de l'annonce cliquée dans le nuage, ou None.
+
+    Avec un jeu compact, Titre, Prix et Lien sont lus dans `textes` (TextesAnnonces).
+    """
+    if not click_data or not click_data.get("points"):
+        return None
+    etiquette = click_data["points"][0].get("customdata")
+    if isinstance(etiquette, list):
+        etiquette = etiquette[0] if etiquette else None
+    # Jeu rechargé depuis le rendu de la figure : l'étiquette peut ne plus exister
+    if etiquette is None or etiquette not in dataframe.index:
+        return None
+    ligne = dataframe.loc[etiquette]
+    annonce = {colonne: ligne[colonne] for colonne in COLONNES_DETAIL if colonne in ligne.index}
+    if textes is not None:
+        # Index du jeu compact = numéro de ligne des textes
+        annonce.update(textes.lire([etiquette]).iloc[0].to_dict())
+    return annonce
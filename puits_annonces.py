@@ -0,0 +1,138 @@
+"""Puits d'écriture des annonces scrapées, page par page, avec point de reprise.
+
+Le scraper émet un lot d'annonces par page ; chaque puits l'écrit tout de suite
+sur disque et mémorise la dernière page terminée par nature. Un crawl
+interrompu reprend à la page suivante au lieu de repartir de la page 1.
+
+- PuitsSQLite : table `annonces` de annonces.db (+ table `checkpoints`) via
+  ingestion.py, lot, checkpoint et agrégats stats_* dans la même transaction ;
+- PuitsCSV : un fichier CSV par page dans un dossier, checkpoint JSON ;
+- PuitsMemoire : liste en mémoire, sans reprise (tests, benchmarks).
+"""
+import glob
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from base_donnees import DB_NAME, lire_annonces
+from ingestion import connecter, ecrire_lot
+
+
+class PuitsMemoire:
+    persistant = False
+
+    def __init__(self):
+        self.annonces = []
+
+    def checkpoint(self, nature):
+        return 0
+
+    def ecrire_lot(self, nature, page, total_pages, annonces):
+        self.annonces.extend(annonces)
+
+    def terminer(self, nature):
+        pass
+
+    def lire(self):
+        return pd.DataFrame(self.annonces)
+
+    def fermer(self):
+        pass
+
+
+class PuitsSQLite:
+    persistant = True
+
+    def __init__(self, db_name=DB_NAME):
+        self.conn = connecter(db_name)
+
+    def checkpoint(self, nature):
+        ligne = self.conn.execute(
+            "SELECT derniere_page FROM checkpoints WHERE nature = ?", (nature,)
+        ).fetchone()
+        return ligne[0] if ligne else 0
+
+    def ecrire_lot(self, nature, page, total_pages, annonces):
+        with self.conn:
+            # UPSERT sur le lien (annonce déjà présente mise à jour) et agrégats de /stats
+            ecrire_lot(self.conn, annonces)
+            self.conn.execute(
+                '''INSERT INTO checkpoints (nature, derniere_page, total_pages, maj_le) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(nature) DO UPDATE SET derniere_page = excluded.derniere_page,
+                                                     total_pages = excluded.total_pages,
+                                                     maj_le = excluded.maj_le''',
+                (nature, page, total_pages, datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def terminer(self, nature):
+        with self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE nature = ?", (nature,))
+
+    def lire(self):
+        return lire_annonces(self.conn)
+
+    def fermer(self):
+        self.conn.close()
+
+
+class PuitsCSV:
+    persistant = True
+
+    def __init__(self, dossier="scraping_parts"):
+        self.dossier = dossier
+        os.makedirs(dossier, exist_ok=True)
+        self.fichier_checkpoint = os.path.join(dossier, "checkpoint.json")
+        self.session = datetime.now().strftime("%Y%m%d%H%M%S")
+        self.etat = {}
+        if os.path.exists(self.fichier_checkpoint):
+            with open(self.fichier_checkpoint, encoding="utf-8") as f:
+                self.etat = json.load(f)
+
+    def _sauver_etat(self):
+        # Écriture atomique : un crash ne laisse jamais un checkpoint à moitié écrit
+        temporaire = self.fichier_checkpoint + ".tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(self.etat, f)
+        os.replace(temporaire, self.fichier_checkpoint)
+
+    def checkpoint(self, nature):
+        etat = self.etat.get(nature)
+        if etat:
+            # On reprend dans les fichiers de la session interrompue
+            self.session = etat["session"]
+            return etat["page"]
+        return 0
+
+    def ecrire_lot(self, nature, page, total_pages, annonces):
+        if annonces:
+            chemin = os.path.join(self.dossier, f"{self.session}_{nature}_p{page:05d}.csv")
+            pd.DataFrame(annonces).to_csv(chemin + ".tmp", index=False)
+            os.replace(chemin + ".tmp", chemin)
+        self.etat[nature] = {"page": page, "total": total_pages, "session": self.session}
+        self._sauver_etat()
+
+    def terminer(self, nature):
+        self.etat.pop(nature, None)
+        self._sauver_etat()
+
+    def lire(self):
+        fichiers = sorted(glob.glob(os.path.join(self.dossier, "*_p*.csv")))
+        if not fichiers:
+            return pd.DataFrame()
+        df = pd.concat((pd.read_csv(f) for f in fichiers), ignore_index=True)
+        return df.drop_duplicates(subset="Lien", keep="last")
+
+    def fermer(self):
+        pass
+
+
+def creer_puits(type_puits, chemin=None):
+    if type_puits == "sqlite":
+        return PuitsSQLite(chemin or DB_NAME)
+    if type_puits == "csv":
+        return PuitsCSV(chemin or "scraping_parts")
+    if type_puits == "memoire":
+        return PuitsMemoire()
+    raise ValueError(f"Puits inconnu : {type_puits}")
@@ -0,0 +1,68 @@
+"""Registre persistant des annonces déjà vues, pour le crawl incrémental.
+
+Chaque annonce est identifiée par son `Lien` (à défaut, par l'empreinte
+titre+prix) et mémorisée avec une empreinte SHA-1 de titre+prix+lien : une
+annonce connue dont l'empreinte change (prix modifié) est signalée comme modifiée.
+"""
+import hashlib
+import sqlite3
+from datetime import datetime
+
+FICHIER_REGISTRE = "annonces_vues.db"
+
+
+def empreinte(annonce):
+    contenu = "|".join(str(annonce.get(champ, "")) for champ in ("Titre", "Prix", "Lien"))
+    return hashlib.sha1(contenu.encode("utf-8")).hexdigest()
+
+
+def cle_annonce(annonce):
+    lien = annonce.get("Lien")
+    if lien and lien != "N/A":
+        return lien
+    return "sans-lien:" + hashlib.sha1(f"{annonce.get('Titre')}|{annonce.get('Prix')}".encode("utf-8")).hexdigest()
+
+
+class RegistreAnnonces:
+    def __init__(self, chemin=FICHIER_REGISTRE):
+        self.conn = sqlite3.connect(chemin, check_same_thread=False)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS annonces_vues (
+                                cle TEXT PRIMARY KEY,
+                                empreinte TEXT NOT NULL,
+                                prix TEXT,
+                                vu_le TEXT)
+                          ''')
+        self.conn.commit()
+
+    def classer(self, annonces):
+        """Répartit une page d'annonces en (nouvelles, modifiees, inchangees)."""
+        cles = [cle_annonce(a) for a in annonces]
+        connues = {}
+        if cles:
+            marqueurs = ",".join("?" * len(cles))
+            connues = dict(self.conn.execute(
+                f"SELECT cle, empreinte FROM annonces_vues WHERE cle IN ({marqueurs})", cles
+            ))
+        nouvelles, modifiees, inchangees = [], [], []
+        for cle, annonce in zip(cles, annonces):
+            if cle not in connues:
+                nouvelles.append(annonce)
+            elif connues[cle] != empreinte(annonce):
+                modifiees.append(annonce)
+            else:
+                inchangees.append(annonce)
+        return nouvelles, modifiees, inchangees
+
+    def enregistrer(self, annonces):
+        maintenant = datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.executemany(
+                '''INSERT INTO annonces_vues (cle, empreinte, prix, vu_le) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(cle) DO UPDATE SET empreinte = excluded.empreinte,
+                                                  prix = excluded.prix,
+                                                  vu_le = excluded.vu_le''',
+                [(cle_annonce(a), empreinte(a), a.get("Prix"), maintenant) for a in annonces],
+            )
+
+    def fermer(self):
+        self.conn.close()
@@ -1,89 +1,444 @@
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
-import time
-import pandas as pd
-from bs4 import BeautifulSoup
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
 
-# Configuration de Selenium
-options = webdriver.ChromeOptions()
-options.add_argument("--disable-gpu")
-options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+from analyse_pages import BASE_URL, PARSEURS, AnalyseurPages
+from nettoyage import nettoyer_annonces
+from puits_annonces import PuitsMemoire, creer_puits
+from registre_annonces import FICHIER_REGISTRE, RegistreAnnonces
+from stockage import FICHIER_PARQUET, charger_annonces, ecrire_annonces, exporter_excel
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-driver.implicitly_wait(10)
+FICHIER_SORTIE = FICHIER_PARQUET
+FICHIER_EXCEL = "Mubawab_Annonces_Location_Vente.xlsx"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 
 # Définir les types de biens à scraper
-nature = {
+NATURES = {
     "location": "immobilier-a-louer",
     "vente": "immobilier-a-vendre"
 }
 
-annonces_list = []
 
-for nature_label, url_part in nature.items():
-    print(f"\n📥 SCRAPING pour : {nature_label.upper()}")
+class ScrapingAnnule(Exception):
+    """Levée par scrape_annonces quand l'événement d'annulation est positionné."""
+
+
+# Configuration de Selenium
+def creer_driver(headless=True):
+    options = webdriver.ChromeOptions()
+    options.add_argument("--disable-gpu")
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument(f"user-agent={USER_AGENT}")
+    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+
+
+def url_page(url_part, page, base_url=BASE_URL):
+    return f"{base_url}/fr/ct/tunis/{url_part}:p:{page}"
+
+
+class LimiteurDebit:
+    """Limite globale de politesse : au plus `requetes_par_seconde` chargements,
+    tous workers confondus (espacement minimal entre deux requêtes)."""
+
+    def __init__(self, requetes_par_seconde=1.0):
+        self.intervalle = 1.0 / requetes_par_seconde if requetes_par_seconde else 0.0
+        self._prochain = 0.0
+        self._verrou = threading.Lock()
+
+    def attendre(self):
+        with self._verrou:
+            maintenant = time.monotonic()
+            depart = max(maintenant, self._prochain)
+            self._prochain = depart + self.intervalle
+        if depart > maintenant:
+            time.sleep(depart - maintenant)
+
+
+class PoolNavigateurs:
+    """Pool de drivers Chrome partagés entre les threads de scraping."""
+
+    def __init__(self, taille, fabrique=creer_driver):
+        self.taille = taille
+        self._fabrique = fabrique
+        self._libres = queue.Queue()
+        self._tous = []
+        self._verrou = threading.Lock()
+
+    @contextmanager
+    def acquerir(self):
+        try:
+            driver = self._libres.get_nowait()
+        except queue.Empty:
+            with self._verrou:
+                creer = len(self._tous) < self.taille
+                if creer:
+                    driver = self._fabrique()
+                    self._tous.append(driver)
+            if not creer:
+                driver = self._libres.get()
+        try:
+            yield driver
+        finally:
+            self._libres.put(driver)
+
+    def fermer(self):
+        for driver in self._tous:
+            driver.quit()
+        self._tous = []
+
+
+def charger_page(driver, url, delai_max=20, delai_defilement=2):
+    """Charge une page et attend explicitement les annonces au lieu de sleep fixes.
+
+    On attend la présence d'un `div.listingBox`, puis on fait défiler tant que de
+    nouvelles annonces (chargement paresseux) apparaissent dans `delai_defilement`.
+    """
+    driver.get(url)
+    try:
+        WebDriverWait(driver, delai_max).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "div.listingBox"))
+        )
+    except TimeoutException:
+        # Page sans annonce (ou fin de pagination) : on renvoie ce qu'on a
+        return driver.page_source
+
+    nb_annonces = len(driver.find_elements(By.CSS_SELECTOR, "div.listingBox"))
+    while True:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        try:
+            WebDriverWait(driver, delai_defilement).until(
+                lambda d: len(d.find_elements(By.CSS_SELECTOR, "div.listingBox")) > nb_annonces
+            )
+        except TimeoutException:
+            break
+        nb_annonces = len(driver.find_elements(By.CSS_SELECTOR, "div.listingBox"))
+    return driver.page_source
+
+
+class RecuperateurSelenium:
+    """Récupère le HTML rendu par un navigateur du pool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def recuperer(self, url):
+        with self.pool.acquerir() as driver:
+            return charger_page(driver, url)
+
+    def fermer(self):
+        self.pool.fermer()
+
+
+class RecuperateurHTTP:
+    """Récupère le HTML rendu côté serveur sans navigateur.
+
+    Une seule session requests (keep-alive) partagée par les threads, avec un
+    pool de `taille_pool` connexions. Si une page ne contient aucune annonce
+    (rendu côté client), elle est rechargée via `secours` (Selenium) lorsqu'il est fourni.
+    """
+
+    def __init__(self, taille_pool=8, secours=None, delai_max=20):
+        self.secours = secours
+        self.delai_max = delai_max
+        self.pages_secours = 0
+        self._verrou = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "fr-FR,fr;q=0.9"})
+        adaptateur = HTTPAdapter(
+            pool_connections=taille_pool,
+            pool_maxsize=taille_pool,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+        )
+        self.session.mount("http://", adaptateur)
+        self.session.mount("https://", adaptateur)
+
+    def recuperer(self, url):
+        reponse = self.session.get(url, timeout=self.delai_max)
+        reponse.raise_for_status()
+        html = reponse.text
+        if self.secours is not None and "listingBox" not in html:
+            with self._verrou:
+                self.pages_secours += 1
+            return self.secours.recuperer(url)
+        return html
+
+    def fermer(self):
+        self.session.close()
+        if self.secours is not None:
+            self.secours.fermer()
+
+
+def creer_recuperateur(backend, nb_workers, fabrique_driver=creer_driver):
+    """`selenium` : navigateurs uniquement ; `http` : requêtes HTTP avec repli
+    Selenium (les navigateurs ne sont lancés qu'au premier repli)."""
+    if backend == "selenium":
+        return RecuperateurSelenium(PoolNavigateurs(nb_workers, fabrique_driver))
+    if backend == "http":
+        return RecuperateurHTTP(nb_workers, secours=RecuperateurSelenium(PoolNavigateurs(nb_workers, fabrique_driver)))
+    raise ValueError(f"Backend inconnu : {backend}")
+
+
+def scraper_page(recuperateur, limiteur, analyseur, url, nature_label, base_url=BASE_URL):
+    """Récupère la page et la confie à `analyseur` ; retourne le Future de (total_pages, annonces)."""
+    limiteur.attendre()
+    html = recuperateur.recuperer(url)
+    return analyseur.soumettre(html, nature_label, base_url)
+
+
+def iterer_pages(executeur, recuperateur, limiteur, analyseur, nature_label, url_part, pages, avance,
+                 base_url=BASE_URL):
+    """Génère (page, annonces) dans l'ordre des pages en gardant `avance` pages en vol.
+
+    Une page est en vol de sa récupération (threads de `executeur`) jusqu'à la fin
+    de son analyse (processus de `analyseur`) : les threads passent à la page
+    suivante sans attendre l'analyse.
+
+    Le consommateur peut s'arrêter à tout moment : les pages pas encore lancées
+    sont annulées à la fermeture du générateur.
+    """
+    pages = iter(pages)
+    en_vol = deque()
+
+    def lancer(page):
+        url = url_page(url_part, page, base_url)
+        en_vol.append((page, executeur.submit(scraper_page, recuperateur, limiteur, analyseur, url,
+                                              nature_label, base_url)))
+
+    try:
+        for page in itertools.islice(pages, avance):
+            lancer(page)
+        while en_vol:
+            page, future = en_vol.popleft()
+            _, annonces = future.result().result()
+            suivante = next(pages, None)
+            if suivante is not None:
+                lancer(suivante)
+            yield page, annonces
+    finally:
+        for _, future in en_vol:
+            future.cancel()
+
+
+def fusionner_excel(fichier, delta):
+    """Upsert du delta (clé : Lien) dans le fichier Excel existant."""
+    if os.path.exists(fichier):
+        existant = pd.read_excel(fichier)
+        df = pd.concat([existant, delta], ignore_index=True)
+        df = df.drop_duplicates(subset="Lien", keep="last")
+    else:
+        df = delta
+    df.to_excel(fichier, index=False)
+    return df
+
+
+def iterer_annonces(natures, recuperateur, limiteur, analyseur, nb_workers, base_url=BASE_URL,
+                    incremental=False, registre=None, reprises=None, statistiques=None):
+    """Génère un lot par page : (nature_label, page, total_pages, annonces).
+
+    `reprises` associe à chaque nature la dernière page déjà traitée : la
+    pagination reprend juste après. En mode `incremental`, seuls les nouveaux
+    éléments et les prix modifiés sont émis, et la nature s'arrête à la première
+    page entièrement connue du `registre`. Un lot vide de fin (`annonces=None`)
+    signale qu'une nature est terminée.
+    """
+    reprises = reprises or {}
+    statistiques = statistiques if statistiques is not None else {}
+    executeur = ThreadPoolExecutor(max_workers=nb_workers)
+    suite = None
+    try:
+        for nature_label, url_part in natures.items():
+            print(f"\n📥 SCRAPING pour : {nature_label.upper()}")
+
+            # La première page donne le nombre total de pages
+            total_pages, annonces = scraper_page(recuperateur, limiteur, analyseur, url_page(url_part, 1, base_url),
+                                                 nature_label, base_url).result()
+            print(f"➡️  Nombre total de pages : {total_pages}")
+
+            depart = reprises.get(nature_label, 0) + 1
+            if depart > 1:
+                print(f"⏩ Reprise après la page {depart - 1}")
+            suite = iterer_pages(
+                executeur, recuperateur, limiteur, analyseur, nature_label, url_part,
+                range(max(depart, 2), total_pages + 1), 2 * nb_workers, base_url,
+            )
+            pages = itertools.chain([(1, annonces)] if depart == 1 else [], suite)
+
+            for page, annonces in pages:
+                statistiques["pages"] = statistiques.get("pages", 0) + 1
+                if not incremental:
+                    print(f"🔄 Page {page}/{total_pages} : {len(annonces)} annonces")
+                    yield nature_label, page, total_pages, annonces
+                    continue
+
+                nouvelles, modifiees, _ = registre.classer(annonces)
+                statistiques["nouvelles"] = statistiques.get("nouvelles", 0) + len(nouvelles)
+                statistiques["modifiees"] = statistiques.get("modifiees", 0) + len(modifiees)
+                print(f"🔄 Page {page}/{total_pages} : {len(nouvelles)} nouvelles, {len(modifiees)} modifiées")
+                yield nature_label, page, total_pages, nouvelles + modifiees
+                if not nouvelles and not modifiees:
+                    print("⏹️  Page entièrement connue : arrêt de la pagination")
+                    suite.close()
+                    break
+
+            yield nature_label, None, total_pages, None
+    finally:
+        # Générateur fermé avant la fin (annulation, erreur) : les pages en file ne sont
+        # jamais récupérées, seules celles déjà lancées se terminent
+        if suite is not None:
+            suite.close()
+        executeur.shutdown(wait=True, cancel_futures=True)
+
+
+def fusionner_columnar(fichier, delta):
+    """Upsert du delta nettoyé (clé : Lien) dans le fichier Parquet/Arrow existant."""
+    if os.path.exists(fichier):
+        delta = pd.concat([charger_annonces(fichier), delta], ignore_index=True)
+        delta = delta.drop_duplicates(subset="Lien", keep="last")
+    return delta
+
+
+def exporter_resultats(df, fichier_sortie, fichier_excel=None, fusionner=False):
+    """Écrit le jeu nettoyé au format columnar, et l'Excel brut si demandé."""
+    if df.empty:
+        return
+    if fichier_sortie:
+        nettoye = nettoyer_annonces(df)
+        if fusionner:
+            nettoye = fusionner_columnar(fichier_sortie, nettoye)
+        ecrire_annonces(nettoye, fichier_sortie)
+    if fichier_excel:
+        if fusionner:
+            fusionner_excel(fichier_excel, df)
+        else:
+            # Export vers Excel
+            exporter_excel(df, fichier_excel)
+
+
+def scrape_annonces(natures=NATURES, nb_workers=4, requetes_par_seconde=1.0, base_url=BASE_URL,
+                    fichier_sortie=FICHIER_SORTIE, backend="selenium", fabrique_driver=creer_driver,
+                    incremental=False, registre=None, puits=None, reprendre=True, fichier_excel=None,
+                    progression=None, annulation=None, parseur="auto", nb_processus=0):
+    """Scrape toutes les pages de chaque nature en parallèle.
+
+    La plage de pages `{url_part}:p:{n}` est répartie entre `nb_workers` threads
+    (navigateurs Chrome ou connexions HTTP selon `backend`) ; `requetes_par_seconde`
+    borne le débit global. Le HTML récupéré est analysé par `nb_processus`
+    processus avec `parseur` (voir analyse_pages.py ; 0 : dans les threads de
+    récupération).
+
+    Chaque page est écrite dès qu'elle est prête dans `puits` (voir
+    puits_annonces.py, PuitsMemoire par défaut) avec un checkpoint ; avec
+    `reprendre`, un crawl interrompu repart de la dernière page terminée.
+    Retourne le puits ; en fin de crawl, le jeu nettoyé est écrit en Parquet dans
+    `fichier_sortie` (voir stockage.py) et, si demandé, exporté brut dans `fichier_excel`.
+
+    En mode `incremental`, la pagination d'une nature s'arrête à la première page
+    qui ne contient que des annonces déjà connues du `registre` (RegistreAnnonces),
+    et seul le delta (nouvelles annonces + prix modifiés) est écrit.
+
+    `progression(nature, page, total_pages, nb_annonces)` est appelé après chaque
+    page écrite. Si l'événement `annulation` (threading.Event) est positionné, le
+    crawl s'arrête entre deux pages et lève ScrapingAnnule ; le checkpoint du
+    puits permet de reprendre plus tard.
+    """
+    if incremental and registre is None:
+        registre = RegistreAnnonces()
+    if puits is None:
+        puits = PuitsMemoire()
+    reprises = {nature: puits.checkpoint(nature) for nature in natures} if reprendre else {}
+    analyseur = AnalyseurPages(parseur, nb_processus)
+    recuperateur = creer_recuperateur(backend, nb_workers, fabrique_driver)
+    limiteur = LimiteurDebit(requetes_par_seconde)
+    statistiques = {}
+    debut = time.monotonic()
+
+    lots = iterer_annonces(natures, recuperateur, limiteur, analyseur, nb_workers, base_url,
+                           incremental, registre, reprises, statistiques)
+    try:
+        for nature_label, page, total_pages, annonces in lots:
+            if annulation is not None and annulation.is_set():
+                raise ScrapingAnnule("Scraping annulé")
+            if page is None:
+                puits.terminer(nature_label)
+                continue
+            puits.ecrire_lot(nature_label, page, total_pages, annonces)
+            if incremental:
+                # Le registre n'est mis à jour qu'une fois le lot écrit
+                registre.enregistrer(annonces)
+            if progression is not None:
+                progression(nature_label, page, total_pages, len(annonces))
+    finally:
+        # Annule les pages encore en file avant de fermer les navigateurs
+        lots.close()
+        recuperateur.fermer()
+        analyseur.fermer()
+
+    duree = time.monotonic() - debut
+    pages_traitees = statistiques.get("pages", 0)
+    print(f"⏱️  {pages_traitees} pages en {duree:.1f} s ({pages_traitees / duree * 60:.1f} pages/min, "
+          f"analyse : {analyseur.parseur}, {nb_processus} processus)")
+    if isinstance(recuperateur, RecuperateurHTTP):
+        print(f"🌐 Pages rechargées via Selenium : {recuperateur.pages_secours}")
+    if incremental:
+        print(f"🆕 {statistiques.get('nouvelles', 0)} nouvelles annonces, "
+              f"{statistiques.get('modifiees', 0)} prix modifiés")
 
-    base_url = f"https://www.mubawab.tn/fr/ct/tunis/{url_part}:p:{{}}"
+    if fichier_sortie or fichier_excel:
+        # Un puits persistant contient déjà tout ; sinon on fusionne le delta incrémental
+        exporter_resultats(puits.lire(), fichier_sortie, fichier_excel,
+                           fusionner=incremental and not puits.persistant)
+    return puits
 
-    # Charger la première page
-    driver.get(base_url.format(1))
-    time.sleep(5)
 
-    html = driver.page_source
-    soup = BeautifulSoup(html, "html.parser")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping des annonces Mubawab (Tunis)")
+    parser.add_argument("--workers", type=int, default=4, help="nombre de navigateurs en parallèle")
+    parser.add_argument("--rps", type=float, default=1.0, help="requêtes par seconde (tous workers)")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--sortie", default=FICHIER_SORTIE, help="jeu nettoyé (.parquet ou .feather)")
+    parser.add_argument("--excel", nargs="?", const=FICHIER_EXCEL, help="export Excel optionnel")
+    parser.add_argument("--backend", choices=["selenium", "http"], default="selenium",
+                        help="http : sans navigateur, repli Selenium si les annonces manquent")
+    parser.add_argument("--parseur", choices=PARSEURS, default="auto",
+                        help="analyse HTML : auto = selectolax, sinon lxml, sinon html.parser")
+    parser.add_argument("--processus", type=int, default=0,
+                        help="processus d'analyse du HTML (0 = dans les threads de récupération)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="s'arrêter aux annonces déjà connues et fusionner le delta")
+    parser.add_argument("--registre", default=FICHIER_REGISTRE, help="base SQLite des annonces vues")
+    parser.add_argument("--puits", choices=["sqlite", "csv"], default="sqlite",
+                        help="écriture page par page : table annonces (annonces.db) ou CSV par page")
+    parser.add_argument("--chemin-puits", help="base SQLite ou dossier CSV (défaut : annonces.db / scraping_parts)")
+    parser.add_argument("--depuis-debut", action="store_true", help="ignorer le checkpoint et repartir de la page 1")
+    args = parser.parse_args()
 
-    # Nombre total de pages
+    puits = creer_puits(args.puits, args.chemin_puits)
     try:
-        total_pages = int(soup.select_one("#lastPageSpan").text.strip())
-        print(f"➡️  Nombre total de pages : {total_pages}")
-    except:
-        total_pages = 1
-
-    # Boucle sur toutes les pages
-    for page in range(1, total_pages + 1):
-        print(f"🔄 Page {page}/{total_pages}...")
-        driver.get(base_url.format(page))
-        time.sleep(5)
-
-        for _ in range(5):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-
-        html = driver.page_source
-        soup = BeautifulSoup(html, "html.parser")
-        annonces = soup.select("div.listingBox.feat, div.listingBox")
-
-        for annonce in annonces:
-            titre = annonce.select_one("h2.listingTit a")
-            prix = annonce.select_one("span.priceTag")
-            localisation = annonce.select_one("span.listingH3")
-            details = annonce.select("div.adDetailFeature span")
-            superficie = details[0] if len(details) > 0 else None
-            nb_pieces = details[1] if len(details) > 1 else None
-            nb_chambres = details[2] if len(details) > 2 else None
-            nb_sdb = details[3] if len(details) > 3 else None
-            lien = titre["href"] if titre else None
-
-            if titre and prix:
-                annonce_data = {
-                    "nature": nature_label,
-                    "Titre": titre.text.strip(),
-                    "Prix": prix.text.strip(),
-                    "Localisation": localisation.text.strip() if localisation else "N/A",
-                    "Superficie": superficie.text.strip() if superficie else "N/A",
-                    "Pièces": nb_pieces.text.strip() if nb_pieces else "N/A",
-                    "Chambres": nb_chambres.text.strip() if nb_chambres else "N/A",
-                    "Salles de bain": nb_sdb.text.strip() if nb_sdb else "N/A",
-                    "Lien": f"https://www.mubawab.tn{lien}" if lien else "N/A",
-                }
-                annonces_list.append(annonce_data)
-
-driver.quit()
-
-# Export vers Excel
-df = pd.DataFrame(annonces_list)
-df.to_excel("Mubawab_Annonces_Location_Vente.xlsx", index=False)
-
-print("Scraping terminé ✅ .")
\ No newline at end of file
+        scrape_annonces(nb_workers=args.workers, requetes_par_seconde=args.rps,
+                        base_url=args.base_url, fichier_sortie=args.sortie, backend=args.backend,
+                        incremental=args.incremental,
+                        registre=RegistreAnnonces(args.registre) if args.incremental else None,
+                        puits=puits, reprendre=not args.depuis_debut, fichier_excel=args.excel,
+                        parseur=args.parseur, nb_processus=args.processus)
+    finally:
+        puits.fermer()
+    print("Scraping terminé ✅ .")
@@ -0,0 +1,173 @@
+"""Formats de réponse des points d'accès de données de l'API (/annonces, /annonces_csv).
+
+Le format est choisi par ?format= ou, à défaut, par l'en-tête Accept :
+- json : tableau d'objets, une clé par colonne et par annonce (défaut) ;
+- colonnes : JSON en colonnes, {"annonces": {"Prix": [...], ...}} : chaque nom
+  de colonne n'apparaît qu'une fois (pd.DataFrame(reponse["annonces"]) dans
+  les deux cas) ;
+- arrow : flux Arrow IPC (tampons compressés en zstd) ;
+- parquet : fichier Parquet (zstd).
+Les exports SQLite en arrow / parquet sont diffusés lot par lot (flux_tableau) :
+un RecordBatch ou un groupe de lignes par lot lu au curseur.
+Les données passent toutes par une table Arrow : les NaN des colonnes
+numériques deviennent null, y compris en JSON.
+
+Les réponses JSON sont compressées selon Accept-Encoding (brotli si le module
+est installé, sinon gzip) au-delà de TAILLE_MIN_COMPRESSION octets.
+"""
+import gzip
+import json
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import brotli
+except ImportError:  # module optionnel : gzip seul
+    brotli = None
+
+TYPES_MIME = {
+    "json": "application/json",
+    "colonnes": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+FORMATS_BINAIRES = {"arrow", "parquet"}
+TYPES_COMPRESSIBLES = {"application/json"}
+TAILLE_MIN_COMPRESSION = 1024
+NIVEAU_GZIP = 6
+QUALITE_BROTLI = 5
+
+
+def format_demande(format_param, accept_mimetypes):
+    """Nom du format demandé, ou None s'il est inconnu ; JSON pour Accept: */*."""
+    if format_param:
+        return format_param if format_param in TYPES_MIME else None
+    meilleur = accept_mimetypes.best_match(
+        [TYPES_MIME["json"], TYPES_MIME["arrow"], TYPES_MIME["parquet"]], default=TYPES_MIME["json"]
+    )
+    return next(nom for nom, type_mime in TYPES_MIME.items() if type_mime == meilleur)
+
+
+def encodage_accepte(accept_encodings):
+    """'br', 'gzip' ou None selon Accept-Encoding."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compresser(corps, encodage):
+    if encodage == "br":
+        return brotli.compress(corps, quality=QUALITE_BROTLI)
+    return gzip.compress(corps, compresslevel=NIVEAU_GZIP)
+
+
+def table_depuis_dataframe(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Colonnes objet de types mélangés (Excel : nombres et textes) : converties en texte
+        objets = df.select_dtypes("object").columns
+        return pa.Table.from_pandas(df.astype({c: "string" for c in objets}), preserve_index=False)
+
+
+def table_depuis_lignes(colonnes, lignes, schema=None):
+    """Table Arrow de lignes SQLite (tuples dans l'ordre de `colonnes`) ; types inférés sans `schema`."""
+    valeurs = list(zip(*lignes)) if lignes else [[] for _ in colonnes]
+    if schema is None:
+        return pa.Table.from_arrays([pa.array(v) for v in valeurs], names=list(colonnes))
+    return pa.Table.from_arrays([pa.array(v, type=champ.type) for v, champ in zip(valeurs, schema)], schema=schema)
+
+
+def schema_lignes(colonnes, entieres):
+    """Schéma fixé d'avance d'un export diffusé : entiers pour `entieres`, texte sinon."""
+    return pa.schema([(nom, pa.int64() if nom in entieres else pa.string()) for nom in colonnes])
+
+
+class _Tampon:
+    """Fichier en écriture seule dont les octets écrits sont retirés au fur et à mesure."""
+
+    def __init__(self):
+        self._morceaux = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, donnees):
+        donnees = bytes(donnees)
+        self._morceaux.append(donnees)
+        self._position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vider(self):
+        corps = b"".join(self._morceaux)
+        self._morceaux = []
+        return corps
+
+
+def flux_tableau(schema, lots, format_):
+    """Octets arrow ou parquet de `lots` (listes de lignes), produits lot par lot.
+
+    Seul le lot courant est en mémoire ; le pied du fichier Parquet part en dernier.
+    """
+    tampon = _Tampon()
+    if format_ == "arrow":
+        ecrivain = pa.ipc.new_stream(tampon, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    else:
+        ecrivain = pq.ParquetWriter(tampon, schema, compression="zstd")
+    with ecrivain:
+        for lignes in lots:
+            ecrivain.write_table(table_depuis_lignes(schema.names, lignes, schema))
+            yield tampon.vider()
+    yield tampon.vider()
+
+
+def corps_tableau(table, format_, extra=None):
+    """(octets, type MIME) de `table` ; `extra` : clés ajoutées aux réponses JSON (ex. next_after_id)."""
+    if format_ == "arrow":
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")) as ecrivain:
+            ecrivain.write_table(table)
+        return sink.getvalue().to_pybytes(), TYPES_MIME[format_]
+    if format_ == "parquet":
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression="zstd")
+        return sink.getvalue().to_pybytes(), TYPES_MIME[format_]
+    if format_ == "colonnes":
+        annonces = {nom: table.column(nom).to_pylist() for nom in table.column_names}
+    else:
+        annonces = table.to_pylist()
+    corps = json.dumps({"annonces": annonces, **(extra or {})}, ensure_ascii=False, separators=(",", ":"), default=str)
+    return corps.encode("utf-8"), TYPES_MIME[format_]
+
+
+class CacheExports:
+    """Corps encodés du jeu courant, par clé (format, encodage) ; vidé quand la version change."""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._version = None
+        self._corps = {}
+
+    def obtenir(self, version, cle, calculer):
+        with self._verrou:
+            if version != self._version:
+                self._version, self._corps = version, {}
+            if cle in self._corps:
+                return self._corps[cle]
+        valeur = calculer()
+        with self._verrou:
+            if version == self._version:
+                self._corps[cle] = valeur
+        return valeur
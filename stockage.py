@@ -0,0 +1,207 @@
+"""Stockage columnar des annonces nettoyées (Parquet / Arrow IPC).
+
+Le jeu nettoyé est écrit avec des colonnes typées (prix en entiers, superficie
+en entier nullable, Ville / type_bien / nature / categorie_prix en catégories)
+et relu avec memory-map : bien plus rapide et moins gourmand que openpyxl.
+L'Excel ne sert plus que d'export optionnel.
+
+Pour le tableau de bord, compacter_annonces ne garde en mémoire que les
+colonnes des graphiques (catégories, prix en int32, superficie et prix au m²
+en float32). Titre, Prix et Lien, utiles au seul tableau et au détail d'une
+annonce, sont lus à la demande par numéro de ligne (TextesAnnonces) : dans le
+fichier columnar quand la source en est un (groupes de lignes de
+TAILLE_GROUPE_LIGNES), sinon dans une table Arrow (titres dictionnarisés).
+
+Usage : python stockage.py Mubawab_Annonces.xlsx [Mubawab_Annonces.parquet] [--excel export.xlsx]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from nettoyage import nettoyer_annonces
+
+FICHIER_PARQUET = "Mubawab_Annonces.parquet"
+
+COLONNES_CATEGORIELLES = ["Ville", "type_bien", "nature", "categorie_prix"]
+COLONNES_TEXTE = ["Titre", "Prix", "Localisation", "Superficie", "Pièces", "Chambres", "Salles de bain", "Lien"]
+# Colonnes du jeu compact (graphiques et index) et colonnes texte lues à la demande
+COLONNES_COMPACTES = ["Prix_nettoye", "Ville", "type_bien", "nature", "Superficie_nettoye", "prix_m2", "categorie_prix"]
+COLONNES_DIFFEREES = ["Titre", "Prix", "Lien"]
+# Lignes par groupe Parquet : une lecture à la demande ne décompresse que les groupes concernés
+TAILLE_GROUPE_LIGNES = 16_384
+
+
+def typer_annonces(df):
+    """Applique le schéma de stockage à un DataFrame sorti de nettoyer_annonces."""
+    df = df.copy()
+    df["Prix_nettoye"] = df["Prix_nettoye"].astype("int64")
+    df["Superficie_nettoye"] = df["Superficie_nettoye"].round().astype("Int32")
+    df["prix_m2"] = df["prix_m2"].astype("float64")
+    for colonne in COLONNES_CATEGORIELLES:
+        if colonne in df:
+            df[colonne] = df[colonne].astype("category")
+    for colonne in COLONNES_TEXTE:
+        if colonne in df:
+            df[colonne] = df[colonne].astype("string")
+    return df.reset_index(drop=True)
+
+
+def _est_arrow_ipc(chemin):
+    return os.path.splitext(chemin)[1].lower() in (".feather", ".arrow", ".ipc")
+
+
+def ecrire_annonces(df, chemin=FICHIER_PARQUET):
+    """Écrit le jeu nettoyé en Parquet (ou Arrow IPC selon l'extension), de façon atomique."""
+    table = pa.Table.from_pandas(typer_annonces(df), preserve_index=False)
+    temporaire = chemin + ".tmp"
+    if _est_arrow_ipc(chemin):
+        # Non compressé : les colonnes numériques sont lues en zero-copy via memory-map
+        feather.write_feather(table, temporaire, compression="uncompressed")
+    else:
+        pq.write_table(table, temporaire, compression="zstd", row_group_size=TAILLE_GROUPE_LIGNES)
+    os.replace(temporaire, chemin)
+
+
+def colonnes_fichier(chemin):
+    """Noms des colonnes d'un fichier écrit par ecrire_annonces, sans le lire."""
+    if _est_arrow_ipc(chemin):
+        with pa.memory_map(chemin) as source:
+            return pa.ipc.open_file(source).schema.names
+    return pq.read_schema(chemin).names
+
+
+def charger_annonces(chemin=FICHIER_PARQUET, colonnes=None):
+    """Relit un fichier écrit par ecrire_annonces (memory-map quand c'est possible)."""
+    if _est_arrow_ipc(chemin):
+        table = feather.read_table(chemin, columns=colonnes, memory_map=True)
+    else:
+        table = pq.read_table(chemin, columns=colonnes, memory_map=True)
+    df = table.to_pandas()
+    # Entier nullable -> float64 (NaN) en mémoire, comme attendu par les figures et l'index
+    if "Superficie_nettoye" in df:
+        df["Superficie_nettoye"] = df["Superficie_nettoye"].astype("float64")
+    return df
+
+
+def charger_source(chemin):
+    """Charge des annonces nettoyées depuis Parquet/Arrow, ou depuis un Excel brut (nettoyé à la volée)."""
+    if chemin.lower().endswith((".xlsx", ".xls")):
+        return nettoyer_annonces(pd.read_excel(chemin))
+    return charger_annonces(chemin)
+
+
+def _entier_reduit(serie):
+    """int32 si toutes les valeurs sont présentes et tiennent sur 32 bits, sinon inchangée."""
+    limites = np.iinfo(np.int32)
+    if serie.notna().all() and (serie.empty or (serie.min() >= limites.min and serie.max() <= limites.max)):
+        return serie.astype("int32")
+    return serie
+
+
+def compacter_annonces(df):
+    """Jeu compact du tableau de bord : numéro de ligne en index, sans colonnes texte."""
+    compact = df.reindex(columns=[c for c in COLONNES_COMPACTES if c in df]).reset_index(drop=True)
+    if "Prix_nettoye" in compact:
+        compact["Prix_nettoye"] = _entier_reduit(compact["Prix_nettoye"])
+    for colonne in ["Superficie_nettoye", "prix_m2"]:
+        if colonne in compact:
+            compact[colonne] = compact[colonne].astype("float32")
+    for colonne in COLONNES_CATEGORIELLES:
+        if colonne in compact:
+            compact[colonne] = compact[colonne].astype("category")
+    return compact
+
+
+class TextesAnnonces:
+    """Colonnes texte d'un jeu compact, lues par numéro de ligne."""
+
+    def __init__(self, table=None, chemin=None):
+        self.table = table
+        self.chemin = chemin
+        if chemin is not None:
+            stat = os.stat(chemin)
+            self._empreinte = (stat.st_mtime_ns, stat.st_size)
+            self._colonnes = [c for c in COLONNES_DIFFEREES if c in colonnes_fichier(chemin)]
+            self._bornes = None
+
+    @classmethod
+    def pour_source(cls, chemin, df):
+        """Lecture dans le fichier si `df` en est la relecture ligne à ligne, sinon table Arrow en mémoire."""
+        if chemin and chemin.lower().endswith((".parquet", ".feather", ".arrow", ".ipc")) and os.path.exists(chemin):
+            return cls(chemin=chemin)
+        colonnes = [c for c in COLONNES_DIFFEREES if c in df]
+        table = pa.Table.from_pandas(df[colonnes].astype("string"), preserve_index=False)
+        if "Titre" in colonnes:
+            # Titres très répétés (« Appartement S+2 ... ») : une seule copie de chaque chaîne
+            table = table.set_column(colonnes.index("Titre"), "Titre", pc.dictionary_encode(table["Titre"]))
+        return cls(table=table)
+
+    @property
+    def nbytes(self):
+        """Mémoire occupée dans le processus (0 quand les textes restent dans le fichier)."""
+        return self.table.nbytes if self.table is not None else 0
+
+    def lire(self, positions, colonnes=None):
+        """DataFrame des `colonnes` pour ces numéros de ligne (index = numéros de ligne)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        colonnes = list(colonnes or COLONNES_DIFFEREES)
+        disponibles = self.table.column_names if self.table is not None else self._colonnes
+        presentes = [c for c in colonnes if c in disponibles]
+        if self.table is not None:
+            table = self.table.select(presentes).take(positions)
+        else:
+            table = self._lire_fichier(positions, presentes)
+        if table is None:
+            lignes = pd.DataFrame(index=positions)
+        else:
+            lignes = table.to_pandas()
+            lignes.index = positions
+        return lignes.reindex(columns=colonnes)
+
+    def _lire_fichier(self, positions, colonnes):
+        stat = os.stat(self.chemin)
+        if (stat.st_mtime_ns, stat.st_size) != self._empreinte:
+            # Fichier remplacé depuis le chargement : le jeu va être rechargé, les lignes ne correspondent plus
+            return None
+        if _est_arrow_ipc(self.chemin):
+            return feather.read_table(self.chemin, columns=colonnes, memory_map=True).take(positions)
+        fichier = pq.ParquetFile(self.chemin, memory_map=True)
+        if self._bornes is None:
+            tailles = [fichier.metadata.row_group(i).num_rows for i in range(fichier.num_row_groups)]
+            self._bornes = np.concatenate(([0], np.cumsum(tailles)))
+        groupes = np.searchsorted(self._bornes, positions, side="right") - 1
+        lus = np.unique(groupes)
+        table = fichier.read_row_groups(lus.tolist(), columns=colonnes)
+        # Position de chaque ligne dans la concaténation des groupes lus
+        debuts = np.concatenate(([0], np.cumsum(np.diff(self._bornes)[lus])[:-1]))
+        return table.take(positions - self._bornes[groupes] + debuts[np.searchsorted(lus, groupes)])
+
+
+def exporter_excel(df, chemin):
+    df.to_excel(chemin, index=False)
+
+
+def convertir(source, destination=FICHIER_PARQUET):
+    """Nettoie un export Excel du scraper et l'écrit au format columnar."""
+    df = nettoyer_annonces(pd.read_excel(source))
+    ecrire_annonces(df, destination)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversion Excel -> Parquet/Arrow des annonces nettoyées")
+    parser.add_argument("source", help="fichier Excel brut du scraper")
+    parser.add_argument("destination", nargs="?", default=FICHIER_PARQUET, help=".parquet ou .feather/.arrow")
+    parser.add_argument("--excel", help="export Excel optionnel du jeu nettoyé")
+    args = parser.parse_args()
+
+    df = convertir(args.source, args.destination)
+    if args.excel:
+        exporter_excel(df, args.excel)
+    print(f"✅ {len(df)} annonces écrites dans {args.destination}")
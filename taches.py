@@ -0,0 +1,366 @@
+"""Tâches de scraping en arrière-plan pour POST /scrape.
+
+Chaque crawl reçoit un identifiant et tourne dans un pool borné de threads ;
+GET /scrape/<id> lit sa progression (pages faites / total, annonces, débit) et
+DELETE /scrape/<id> l'annule entre deux pages (le checkpoint du puits permet
+de reprendre). Une nature ne peut être crawlée que par une tâche à la fois :
+redemander exactement les mêmes natures rejoint la tâche en cours, un
+chevauchement partiel est refusé.
+
+L'état des tâches et le verrou des natures sont tenus dans une base SQLite
+(`chemin_etat`, taches_scraping.db par défaut) partagée par les workers
+gunicorn : chaque tâche tourne dans le worker qui l'a reçue et y publie sa
+progression après chaque page ; les autres workers la lisent, la rejoignent ou
+l'annulent (drapeau relevé par le worker propriétaire à la page suivante). Les
+tâches d'un worker arrêté sont passées en échec et leurs natures libérées.
+
+Les options passées à scrape_annonces (backend, base_url, débit...) sont
+fixées à la création du gestionnaire : tests/test_taches.py le pointe sur le
+serveur de fixtures local (tests/serveur_fixtures.py).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from puits_annonces import creer_puits
+from registre_annonces import RegistreAnnonces
+from scrapping import NATURES, ScrapingAnnule, scrape_annonces
+
+NB_TACHES_MAX = 2
+HISTORIQUE_MAX = 100
+FICHIER_TACHES = "taches_scraping.db"
+
+EN_ATTENTE = "en_attente"
+EN_COURS = "en_cours"
+ANNULATION = "annulation"
+ANNULEE = "annulee"
+TERMINEE = "terminee"
+ECHEC = "echec"
+STATUTS_ACTIFS = (EN_ATTENTE, EN_COURS, ANNULATION)
+
+COLONNES_TACHES = ["id", "natures", "incremental", "statut", "erreur", "pages_faites", "pages_totales",
+                   "annonces", "cree_le", "debut", "fin"]
+SCHEMA_TACHES = [
+    '''CREATE TABLE IF NOT EXISTS taches (
+           id TEXT PRIMARY KEY,
+           natures TEXT NOT NULL,
+           incremental INTEGER NOT NULL,
+           statut TEXT NOT NULL,
+           erreur TEXT,
+           pages_faites INTEGER NOT NULL,
+           pages_totales TEXT NOT NULL,
+           annonces INTEGER NOT NULL,
+           cree_le REAL NOT NULL,
+           debut REAL,
+           fin REAL,
+           annulation INTEGER NOT NULL DEFAULT 0,
+           processus TEXT NOT NULL)''',
+    # Verrou des natures : une ligne par nature crawlée, supprimée à la fin de la tâche
+    '''CREATE TABLE IF NOT EXISTS natures_actives (
+           nature TEXT PRIMARY KEY,
+           id_tache TEXT NOT NULL)''',
+]
+
+
+class NaturesOccupees(Exception):
+    """Une partie des natures demandées est déjà crawlée par d'autres tâches."""
+
+    def __init__(self, taches):
+        super().__init__(f"Natures déjà en cours de scraping : {', '.join(sorted(taches))}")
+        self.taches = taches
+
+
+class TacheScraping:
+    def __init__(self, natures, incremental=False):
+        self.id = uuid.uuid4().hex
+        self.natures = list(natures)
+        self.incremental = incremental
+        self.statut = EN_ATTENTE
+        self.erreur = None
+        self.pages_faites = 0
+        self.pages_totales = {}
+        self.annonces = 0
+        self.cree_le = time.time()
+        self.debut = None
+        self.fin = None
+        self.annulation = threading.Event()
+        self.future = None
+        self._verrou = threading.Lock()
+
+    def progression(self, nature, page, total_pages, nb_annonces):
+        with self._verrou:
+            self.pages_faites += 1
+            self.pages_totales[nature] = total_pages
+            self.annonces += nb_annonces
+
+    def actif(self):
+        return self.statut in STATUTS_ACTIFS
+
+    def ligne(self):
+        """Valeurs de COLONNES_TACHES, pour la base partagée."""
+        with self._verrou:
+            return (self.id, json.dumps(self.natures), int(self.incremental), self.statut, self.erreur,
+                    self.pages_faites, json.dumps(self.pages_totales), self.annonces, self.cree_le,
+                    self.debut, self.fin)
+
+    @classmethod
+    def depuis_ligne(cls, ligne):
+        """Instantané d'une tâche lue dans la base (tournant éventuellement dans un autre worker)."""
+        valeurs = dict(zip(COLONNES_TACHES, ligne))
+        tache = cls(json.loads(valeurs.pop("natures")), bool(valeurs.pop("incremental")))
+        valeurs["pages_totales"] = json.loads(valeurs["pages_totales"])
+        tache.__dict__.update(valeurs)
+        return tache
+
+    def etat(self):
+        with self._verrou:
+            fin = self.fin or time.time()
+            duree = fin - self.debut if self.debut else 0.0
+            return {
+                "id": self.id,
+                "statut": self.statut,
+                "natures": self.natures,
+                "incremental": self.incremental,
+                "pages_faites": self.pages_faites,
+                # Connu nature par nature, dès la première page de chacune
+                "pages_totales": sum(self.pages_totales.values()) if self.pages_totales else None,
+                "annonces": self.annonces,
+                "duree": round(duree, 1),
+                "pages_par_minute": round(self.pages_faites / duree * 60, 1) if duree else 0.0,
+                "annonces_par_seconde": round(self.annonces / duree, 1) if duree else 0.0,
+                "erreur": self.erreur,
+            }
+
+
+def identite_processus(pid=None):
+    """pid:instant de démarrage (Linux) : un pid repris par un autre processus ne passe pas pour vivant."""
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f"{pid}:{f.read().rsplit(')', 1)[1].split()[19]}"
+    except (OSError, IndexError):
+        return str(pid)
+
+
+def processus_vivant(identite):
+    if identite == identite_processus():
+        return True
+    if os.name == "nt":
+        # Pas de gunicorn : un seul processus, une autre identité vient d'un lancement précédent
+        return False
+    pid = int(identite.split(":")[0])
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return identite_processus(pid) == identite
+
+
+class GestionnaireTaches:
+    def __init__(self, nb_taches=NB_TACHES_MAX, type_puits="sqlite", chemin_puits=None,
+                 chemin_etat=FICHIER_TACHES, **options):
+        self.executeur = ThreadPoolExecutor(max_workers=nb_taches, thread_name_prefix="scraping")
+        self.type_puits = type_puits
+        self.chemin_puits = chemin_puits
+        self.chemin_etat = chemin_etat
+        self.options = options
+        # Tâches lancées par ce processus ; les autres ne sont connues que par la base
+        self._taches = OrderedDict()
+        self._schema_cree = False
+        self._verrou = threading.RLock()
+
+    @contextmanager
+    def _transaction(self):
+        """Connexion à la base partagée, ouverte pour un seul échange (elle ne survit pas au fork)."""
+        conn = sqlite3.connect(self.chemin_etat, timeout=30, isolation_level=None)
+        try:
+            if not self._schema_cree:
+                conn.execute("PRAGMA journal_mode = WAL")
+                for requete in SCHEMA_TACHES:
+                    conn.execute(requete)
+                self._schema_cree = True
+            # Écriture réservée dès le début : lecture du verrou et prise des natures sans concurrence
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def soumettre(self, natures=None, incremental=False):
+        """Retourne (tache, nouvelle) ; lève NaturesOccupees en cas de chevauchement partiel."""
+        natures = list(natures or NATURES)
+        inconnues = [n for n in natures if n not in NATURES]
+        if inconnues:
+            raise ValueError(f"Natures inconnues : {', '.join(inconnues)}")
+        with self._verrou:
+            with self._transaction() as conn:
+                self._liberer_orphelines(conn)
+                occupees = {id_ for (id_,) in conn.execute(
+                    f"SELECT id_tache FROM natures_actives WHERE nature IN ({','.join('?' * len(natures))})",
+                    natures,
+                )}
+                if occupees:
+                    id_tache = next(iter(occupees))
+                    tache = self._taches.get(id_tache) or self._lire(conn, id_tache)
+                    if len(occupees) == 1 and set(tache.natures) == set(natures):
+                        # Même demande qu'une tâche en cours : on la rejoint
+                        return tache, False
+                    raise NaturesOccupees(occupees)
+                tache = TacheScraping(natures, incremental)
+                conn.execute(
+                    f"INSERT INTO taches ({', '.join(COLONNES_TACHES)}, processus) "
+                    f"VALUES ({', '.join('?' * (len(COLONNES_TACHES) + 1))})",
+                    tache.ligne() + (identite_processus(),),
+                )
+                conn.executemany("INSERT INTO natures_actives (nature, id_tache) VALUES (?, ?)",
+                                 [(nature, tache.id) for nature in natures])
+                self._purger(conn)
+            self._taches[tache.id] = tache
+            tache.future = self.executeur.submit(self._executer, tache)
+        return tache, True
+
+    def obtenir(self, id_tache):
+        with self._verrou:
+            if id_tache in self._taches:
+                return self._taches[id_tache]
+        with self._transaction() as conn:
+            self._liberer_orphelines(conn)
+            return self._lire(conn, id_tache)
+
+    def lister(self):
+        with self._transaction() as conn:
+            self._liberer_orphelines(conn)
+            lignes = conn.execute(f"SELECT {', '.join(COLONNES_TACHES)} FROM taches ORDER BY cree_le").fetchall()
+        with self._verrou:
+            return [self._taches.get(ligne[0]) or TacheScraping.depuis_ligne(ligne) for ligne in lignes]
+
+    def annuler(self, id_tache):
+        with self._verrou:
+            tache = self._taches.get(id_tache)
+            if tache is not None:
+                if not tache.actif():
+                    return tache
+                tache.annulation.set()
+                if tache.future.cancel():
+                    # Jamais démarrée : on libère tout de suite ses natures
+                    self._finir(tache, ANNULEE)
+                elif tache.statut == EN_COURS:
+                    tache.statut = ANNULATION
+                    self._publier(tache)
+                return tache
+        # Tâche d'un autre worker : il relève le drapeau avant sa prochaine page
+        with self._transaction() as conn:
+            self._liberer_orphelines(conn)
+            tache = self._lire(conn, id_tache)
+            if tache is None or not tache.actif():
+                return tache
+            if tache.statut == EN_COURS:
+                tache.statut = ANNULATION
+            conn.execute("UPDATE taches SET annulation = 1, statut = ? WHERE id = ?", (tache.statut, id_tache))
+            return tache
+
+    def arreter(self):
+        """Annule les tâches actives de ce processus et attend la fin de celles déjà démarrées."""
+        for id_tache in list(self._taches):
+            self.annuler(id_tache)
+        self.executeur.shutdown(wait=True)
+
+    def _executer(self, tache):
+        with self._verrou:
+            tache.debut = time.time()
+            tache.statut = EN_COURS
+        puits = registre = None
+
+        def progression(*args):
+            tache.progression(*args)
+            self._publier(tache)
+
+        try:
+            self._publier(tache)
+            # Connexions SQLite créées dans le thread qui les utilise ; un échec (chemin
+            # invalide, base verrouillée) termine la tâche en échec et libère ses natures
+            puits = creer_puits(self.type_puits, self.chemin_puits)
+            registre = RegistreAnnonces() if tache.incremental else None
+            if tache.annulation.is_set():
+                raise ScrapingAnnule("Scraping annulé")
+            scrape_annonces(
+                {n: NATURES[n] for n in tache.natures}, incremental=tache.incremental, registre=registre,
+                puits=puits, progression=progression, annulation=tache.annulation, **self.options,
+            )
+            self._finir(tache, TERMINEE)
+        except ScrapingAnnule:
+            self._finir(tache, ANNULEE)
+        except Exception as e:
+            tache.erreur = str(e)
+            self._finir(tache, ECHEC)
+        finally:
+            if puits is not None:
+                puits.fermer()
+            if registre is not None:
+                registre.fermer()
+
+    def _publier(self, tache):
+        """Écrit l'état de la tâche dans la base ; relève une annulation demandée par un autre worker."""
+        with self._verrou, self._transaction() as conn:
+            (annulation,) = conn.execute("SELECT annulation FROM taches WHERE id = ?", (tache.id,)).fetchone()
+            if annulation and not tache.annulation.is_set():
+                tache.annulation.set()
+                if tache.statut == EN_COURS:
+                    tache.statut = ANNULATION
+            self._ecrire(conn, tache)
+
+    def _finir(self, tache, statut):
+        with self._verrou:
+            tache.statut = statut
+            tache.fin = time.time()
+            with self._transaction() as conn:
+                self._ecrire(conn, tache)
+                conn.execute("DELETE FROM natures_actives WHERE id_tache = ?", (tache.id,))
+
+    @staticmethod
+    def _ecrire(conn, tache):
+        conn.execute(
+            f"UPDATE taches SET {', '.join(f'{c} = ?' for c in COLONNES_TACHES[1:])} WHERE id = ?",
+            tache.ligne()[1:] + (tache.id,),
+        )
+
+    @staticmethod
+    def _lire(conn, id_tache):
+        ligne = conn.execute(f"SELECT {', '.join(COLONNES_TACHES)} FROM taches WHERE id = ?", (id_tache,)).fetchone()
+        return TacheScraping.depuis_ligne(ligne) if ligne else None
+
+    @staticmethod
+    def _liberer_orphelines(conn):
+        # Worker arrêté (redémarré par gunicorn, tué) : ses tâches ne finiront jamais
+        actives = conn.execute(
+            f"SELECT id, processus FROM taches WHERE statut IN ({','.join('?' * len(STATUTS_ACTIFS))})",
+            STATUTS_ACTIFS,
+        ).fetchall()
+        orphelines = [(id_,) for id_, processus in actives if not processus_vivant(processus)]
+        conn.executemany("UPDATE taches SET statut = ?, erreur = ?, fin = ? WHERE id = ?",
+                         [(ECHEC, "Worker arrêté pendant la tâche", time.time(), id_) for (id_,) in orphelines])
+        conn.executemany("DELETE FROM natures_actives WHERE id_tache = ?", orphelines)
+
+    def _purger(self, conn):
+        # Historique borné : les plus anciennes tâches terminées sont oubliées
+        conn.execute(
+            f"""DELETE FROM taches WHERE id IN (
+                   SELECT id FROM taches WHERE statut NOT IN ({','.join('?' * len(STATUTS_ACTIFS))})
+                   ORDER BY cree_le LIMIT max(0, (SELECT COUNT(*) FROM taches) - ?))""",
+            STATUTS_ACTIFS + (HISTORIQUE_MAX,),
+        )
+        terminees = [id_ for id_, t in self._taches.items() if not t.actif()]
+        for id_ in terminees[:max(0, len(self._taches) - HISTORIQUE_MAX)]:
+            del self._taches[id_]
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Les modules du projet sont à la racine du dépôt (python -m pytest ou pytest depuis n'importe où)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.serveur_fixtures import demarrer_serveur  # noqa: E402
+
+NB_PAGES = 6
+
+
+@pytest.fixture
+def serveur():
+    """demarrer(latence, pages) -> base_url ; `serveur.requetes` : instants d'arrivée des requêtes,
+    `serveur.chemins` : chemins demandés, dans le même ordre, `serveur.pages` : HTML servi par
+    (url_part, page) par le dernier serveur démarré."""
+    def demarrer(latence=0.0, pages=NB_PAGES):
+        instance, base_url = demarrer_serveur(pages, latence=latence)
+        servir = instance.RequestHandlerClass.do_GET
+
+        def do_GET(gestionnaire):
+            demarrer.requetes.append(time.monotonic())
+            demarrer.chemins.append(gestionnaire.path)
+            servir(gestionnaire)
+
+        instance.RequestHandlerClass.do_GET = do_GET
+        demarres.append(instance)
+        demarrer.pages = instance.RequestHandlerClass.pages
+        return base_url
+
+    demarres = []
+    demarrer.requetes = []
+    demarrer.chemins = []
+    yield demarrer
+    for instance in demarres:
+        instance.shutdown()
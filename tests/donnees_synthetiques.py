@@ -0,0 +1,61 @@
+"""Génération d'annonces synthétiques au format brut du scraper.
+
+Les valeurs imitent ce que produit scrapping.py (prix "7 500 TND",
+superficie "70\\n\\t\\t\\tm²", localisation "Quartier, Ville", ...) afin que
+les benchmarks et les tests exercent les mêmes chemins de nettoyage que les vraies données.
+"""
+import numpy as np
+import pandas as pd
+
+QUARTIERS = [
+    "Bab El Khadra", "Montplaisir", "Tunis", "Abou El Kacem Chebbi", "Les Jardins de Carthage",
+    "République", "Bab Bhar", "Bab Jazira", "Bab Souika", "Montfleury", "El Menzah 9",
+    "Sidi Bahri", "Hedi Chaker", "El Mourouj 6", "La Marsa", "Ennasr 2", "Lac 2",
+]
+VILLES = ["Tunis", "Le Kram", "El Menzah", "La Marsa", "Ariana", "Ben Arous", "La Soukra", "Carthage"]
+TITRES = [
+    "À louer Un Appartement S1 au Cœur de Lafayette", "Villa H7 avec un grand dépôt Montplaisir",
+    "S2 en location", "Terrain constructible de 500 m²", "Maison traditionnelle à vendre",
+    "Appartement haut standing", "Bloc en location", "Duplex vue mer", "Local commercial",
+    "A louer une villa en s4 avec piscine",
+]
+
+
+def generer_annonces(n, graine=0):
+    """Retourne un DataFrame brut de n annonces (colonnes du scraper)."""
+    rng = np.random.default_rng(graine)
+    montants = rng.integers(100, 3_000_000, size=n)
+    formats_prix = rng.integers(0, 10, size=n)
+    prix = np.array([f"{m:,} TND".replace(",", " ") for m in montants], dtype=object)
+    prix[formats_prix == 0] = "Prix à consulter"
+    a_partir = formats_prix == 1
+    prix[a_partir] = ["À partir de " + p for p in prix[a_partir]]
+    prix[formats_prix == 2] = [f"{m:,} TND/mois".replace(",", ".") for m in montants[formats_prix == 2]]
+
+    surfaces = rng.integers(20, 2000, size=n)
+    formats_sup = rng.integers(0, 8, size=n)
+    superficie = np.array([f"{s}\n\t\t\t\t\t\tm²" for s in surfaces], dtype=object)
+    superficie[formats_sup == 0] = "Haut standing"
+    superficie[formats_sup == 1] = np.nan
+
+    localisation = np.array(
+        [f"{q}, {v}" for q, v in zip(rng.choice(QUARTIERS, size=n), rng.choice(VILLES, size=n))],
+        dtype=object,
+    )
+    localisation[rng.random(n) < 0.01] = np.nan
+
+    titres = rng.choice(TITRES, size=n).astype(object)
+    natures = rng.choice(["location", "vente"], size=n)
+    liens = [f"https://www.mubawab.tn/fr/a/{i}/annonce-{i}" for i in range(n)]
+
+    return pd.DataFrame({
+        "type_de_bien": natures,
+        "Titre": titres,
+        "Prix": prix,
+        "Localisation": localisation,
+        "Superficie": superficie,
+        "Pièces": "3 Pièces",
+        "Chambres": "2 Chambres",
+        "Salles de bain": "1 Salle de bain",
+        "Lien": liens,
+    })
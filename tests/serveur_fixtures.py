@@ -0,0 +1,115 @@
+"""Serveur HTTP local qui sert des pages de listing au format Mubawab.
+
+Les pages reprennent le balisage lu par scrapping.py (div.listingBox,
+h2.listingTit a, span.priceTag, span.listingH3, div.adDetailFeature span,
+#lastPageSpan) et sont servies sous /fr/ct/tunis/{url_part}:p:{n}, ce qui
+permet de faire tourner le scraper hors ligne : scrape_annonces(base_url=...).
+
+Usage autonome : python -m tests.serveur_fixtures [--pages 20] [--port 8765]
+"""
+import argparse
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from tests.donnees_synthetiques import QUARTIERS, TITRES, VILLES
+
+MODELE_ANNONCE = """
+<div class="listingBox{classe}">
+  <h2 class="listingTit"><a href="/fr/a/{id}/{slug}">{titre}</a></h2>
+  <span class="priceTag">{prix}</span>
+  <span class="listingH3">{quartier}, {ville}</span>
+  <div class="adDetailFeature">
+    <span>{surface}
+\t\t\t\t\t\tm²</span><span>{pieces} Pièces</span><span>{chambres} Chambres</span><span>1 Salle de bain</span>
+  </div>
+</div>"""
+
+MODELE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Mubawab - {url_part} page {page}</title></head>
+<body>
+<div id="listing">{annonces}</div>
+<div class="paginationDots"><span id="lastPageSpan">{total}</span></div>
+</body></html>"""
+
+MOTIF_URL = re.compile(r"^/fr/ct/tunis/(?P<url_part>[\w-]+):p:(?P<page>\d+)$")
+
+
+def generer_page(url_part, page, total_pages, annonces_par_page=30, graine=0):
+    """HTML d'une page de listing ; déterministe pour (url_part, page, graine)."""
+    rng = np.random.default_rng([graine, page, len(url_part)])
+    annonces = []
+    for i in range(annonces_par_page):
+        identifiant = (page * 1000 + i) * (1 if "vendre" in url_part else -1) + 10_000_000
+        titre = TITRES[rng.integers(len(TITRES))]
+        annonces.append(MODELE_ANNONCE.format(
+            classe=" feat" if i == 0 else "",
+            id=identifiant,
+            slug=f"annonce-{identifiant}",
+            titre=titre,
+            prix=f"{int(rng.integers(500, 2_000_000)):,} TND".replace(",", " "),
+            quartier=QUARTIERS[rng.integers(len(QUARTIERS))],
+            ville=VILLES[rng.integers(len(VILLES))],
+            surface=int(rng.integers(20, 800)),
+            pieces=int(rng.integers(1, 8)),
+            chambres=int(rng.integers(1, 5)),
+        ))
+    return MODELE_PAGE.format(url_part=url_part, page=page, total=total_pages, annonces="".join(annonces))
+
+
+def creer_gestionnaire(total_pages, annonces_par_page, latence):
+    cache = {}
+
+    class GestionnaireFixtures(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # HTML servi par (url_part, page) ; modifiable pour simuler une annonce ajoutée ou un prix changé
+        pages = cache
+
+        def do_GET(self):
+            correspondance = MOTIF_URL.match(self.path)
+            if not correspondance or int(correspondance["page"]) > total_pages:
+                self.send_error(404)
+                return
+            cle = (correspondance["url_part"], int(correspondance["page"]))
+            if cle not in cache:
+                cache[cle] = generer_page(cle[0], cle[1], total_pages, annonces_par_page).encode("utf-8")
+            if latence:
+                time.sleep(latence)
+            corps = cache[cle]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, *args):
+            pass
+
+    return GestionnaireFixtures
+
+
+def demarrer_serveur(total_pages=20, annonces_par_page=30, latence=0.0, port=0):
+    """Démarre le serveur dans un thread ; retourne (serveur, base_url)."""
+    serveur = ThreadingHTTPServer(("127.0.0.1", port), creer_gestionnaire(total_pages, annonces_par_page, latence))
+    serveur.daemon_threads = True
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur, f"http://127.0.0.1:{serveur.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--annonces", type=int, default=30)
+    parser.add_argument("--latence", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    serveur, base_url = demarrer_serveur(args.pages, args.annonces, args.latence, args.port)
+    print(f"Fixtures servies sur {base_url}/fr/ct/tunis/immobilier-a-vendre:p:1 (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        serveur.shutdown()
@@ -0,0 +1,244 @@
+"""Points d'accès de l'API (app.py) sur une base annonces.db temporaire."""
+import io
+import json
+import os
+import sqlite3
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import app
+from ingestion import connecter, ingerer
+from tests.donnees_synthetiques import generer_annonces
+
+NB_ANNONCES = 1200
+
+
+@pytest.fixture(scope="module")
+def base(tmp_path_factory):
+    """Base remplie par lots comme par le scraper ; `nature` en minuscules, comme scrapping.py."""
+    chemin = os.path.join(tmp_path_factory.mktemp("api"), "annonces.db")
+    brut = generer_annonces(NB_ANNONCES).rename(columns={"type_de_bien": "nature"})
+    conn = connecter(chemin)
+    try:
+        ingerer(conn, [brut.iloc[debut:debut + 300] for debut in range(0, NB_ANNONCES, 300)])
+    finally:
+        conn.close()
+    return chemin
+
+
+@pytest.fixture
+def client(base, monkeypatch):
+    monkeypatch.setattr(app, "db_name", base)
+    return app.app.test_client()
+
+
+@pytest.fixture(scope="module")
+def annonces(base):
+    """Table annonces entière, pour comparer les réponses à pandas."""
+    with sqlite3.connect(base) as conn:
+        return pd.read_sql(f"SELECT {', '.join(app.COLONNES_ANNONCES)} FROM annonces ORDER BY id", conn)
+
+
+def pages(client, url):
+    """Suit next_after_id jusqu'à la dernière page ; renvoie la liste des pages."""
+    resultat, after_id = [], 0
+    while after_id is not None:
+        separateur = "&" if "?" in url else "?"
+        corps = client.get(f"{url}{separateur}after_id={after_id}").get_json()
+        resultat.append(corps["annonces"])
+        after_id = corps["next_after_id"]
+    return resultat
+
+
+def test_pagination_par_cle(client, annonces):
+    lues = pages(client, "/annonces?limit=250")
+    assert [len(p) for p in lues] == [250, 250, 250, 250, 200]
+    assert [a["id"] for p in lues for a in p] == annonces["id"].tolist()
+    premiere = lues[0][0]
+    assert premiere == annonces.iloc[0].where(annonces.iloc[0].notna(), None).to_dict()
+
+
+def test_limite_par_defaut_et_page_pleine(client):
+    corps = client.get("/annonces").get_json()
+    assert len(corps["annonces"]) == app.LIMITE_PAR_DEFAUT
+    assert corps["next_after_id"] == corps["annonces"][-1]["id"]
+    # Page exactement pleine à la fin : une dernière page vide clôt la pagination
+    corps = client.get(f"/annonces?limit=100&after_id={NB_ANNONCES - 100}").get_json()
+    assert corps["next_after_id"] == NB_ANNONCES
+    corps = client.get(f"/annonces?after_id={NB_ANNONCES}").get_json()
+    assert corps == {"annonces": [], "next_after_id": None}
+
+
+def test_projection_fields(client):
+    annonces = client.get("/annonces?fields=prix, ville,prix&limit=5").get_json()["annonces"]
+    assert [list(a) for a in annonces] == [["id", "prix", "ville"]] * 5
+    # L'id est toujours renvoyé, une seule fois
+    assert list(client.get("/annonces?fields=id,titre&limit=1").get_json()["annonces"][0]) == ["id", "titre"]
+
+
+@pytest.mark.parametrize("entetes, url", [
+    ({}, "/annonces?format=ndjson"),
+    ({"Accept": "application/x-ndjson"}, "/annonces"),
+])
+def test_ndjson_diffuse_toute_la_selection(client, annonces, entetes, url):
+    reponse = client.get(url, headers=entetes)
+    assert reponse.mimetype == "application/x-ndjson" and reponse.is_streamed
+    lignes = [json.loads(ligne) for ligne in reponse.get_data(as_text=True).splitlines()]
+    # Sans limite explicite : toute la sélection, au-delà de LIMITE_MAX
+    assert [ligne["id"] for ligne in lignes] == annonces["id"].tolist()
+
+
+def test_ndjson_limite_et_projection(client):
+    reponse = client.get("/annonces?format=ndjson&limit=7&after_id=10&fields=ville")
+    lignes = [json.loads(ligne) for ligne in reponse.get_data(as_text=True).splitlines()]
+    assert [ligne["id"] for ligne in lignes] == list(range(11, 18))
+    assert all(list(ligne) == ["id", "ville"] for ligne in lignes)
+
+
+@pytest.mark.parametrize("requete, message", [
+    ("limit=abc", "'limit' doit être un entier"),
+    ("limit=0", "'limit' doit être supérieur ou égal à 1"),
+    (f"limit={app.LIMITE_MAX + 1}", f"'limit' doit être inférieur ou égal à {app.LIMITE_MAX}"),
+    ("after_id=-1", "'after_id' doit être supérieur ou égal à 0"),
+    ("min_prix=cher", "'min_prix' doit être un entier"),
+    ("fields=prix,couleur,age", "Colonnes inconnues : couleur, age"),
+    ("format=ndjson&limit=0", "'limit' doit être supérieur ou égal à 1"),
+])
+def test_parametres_invalides(client, requete, message):
+    reponse = client.get(f"/annonces?{requete}")
+    assert reponse.status_code == 400
+    assert reponse.get_json() == {"error": message}
+
+
+def filtrer(df, nature=None, type_bien=None, ville=(), min_prix=None, max_prix=None,
+            min_superficie=None, max_superficie=None):
+    """Même sélection que clause_filtres, en pandas (une borne exclut les valeurs manquantes)."""
+    garde = pd.Series(True, index=df.index)
+    if nature:
+        garde &= df["nature"] == nature.lower()
+    if type_bien:
+        garde &= df["type_bien"] == type_bien
+    if ville:
+        garde &= df["ville"].isin(ville)
+    for colonne, minimum, maximum in [("prix_num", min_prix, max_prix),
+                                      ("superficie_num", min_superficie, max_superficie)]:
+        if minimum is not None:
+            garde &= df[colonne] >= minimum
+        if maximum is not None:
+            garde &= df[colonne] <= maximum
+    return df[garde]
+
+
+FILTRES = [
+    {"nature": "Vente"},
+    {"nature": "location", "type_bien": "Appartement"},
+    {"ville": ["Tunis"]},
+    {"ville": ["Tunis", "La Marsa", "Ariana"], "min_prix": 200_000, "max_prix": 1_500_000},
+    {"type_bien": "Villa", "min_superficie": 100, "max_superficie": 800},
+    {"nature": "vente", "type_bien": "Terrain", "ville": ["Carthage", "Le Kram"], "max_prix": 2_000_000,
+     "min_superficie": 500},
+    {"min_prix": 1_000_000},
+    {"ville": ["Ville absente"]},
+    {"min_prix": 900_000, "max_prix": 100_000},
+]
+
+
+@pytest.mark.parametrize("filtres", FILTRES, ids=str)
+def test_filtres_sql_comme_pandas(client, annonces, filtres):
+    parametres = [(nom, v) for nom, valeur in filtres.items() for v in (valeur if isinstance(valeur, list) else [valeur])]
+    requete = "&".join(f"{nom}={valeur}" for nom, valeur in parametres)
+    attendu = filtrer(annonces, **filtres)["id"].tolist()
+    lues = [a for page in pages(client, f"/annonces?{requete}&limit=100") for a in page]
+    assert [a["id"] for a in lues] == attendu
+    # Même sélection en ndjson et en pagination
+    reponse = client.get(f"/annonces?{requete}&format=ndjson")
+    assert [json.loads(ligne)["id"] for ligne in reponse.get_data(as_text=True).splitlines()] == attendu
+
+
+@pytest.mark.parametrize("filtres", [
+    {"ville": ["Tunis"], "min_prix": 1, "max_prix": 2},
+    {"nature": "vente", "type_bien": "Villa", "min_prix": 1},
+    {"ville": ["Tunis", "Ariana"], "min_superficie": 1},
+], ids=str)
+def test_filtres_resolus_par_les_index(base, filtres):
+    conditions, parametres = app.clause_filtres(
+        nature=filtres.get("nature"), type_bien=filtres.get("type_bien"), villes=filtres.get("ville"),
+        prix_min=filtres.get("min_prix"), prix_max=filtres.get("max_prix"),
+        superficie_min=filtres.get("min_superficie"),
+    )
+    with sqlite3.connect(base) as conn:
+        plan = [ligne[-1] for ligne in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT id FROM annonces WHERE {' AND '.join(conditions)}", parametres)]
+    # Recherche dans un index secondaire, jamais un parcours de la table
+    assert any("USING INDEX idx_annonces_" in etape or "USING COVERING INDEX idx_annonces_" in etape
+               for etape in plan), plan
+    assert "SCAN annonces" not in plan, plan
+
+
+def lire_binaire(reponse, format_):
+    corps = reponse.get_data()
+    if format_ == "arrow":
+        return pa.ipc.open_stream(corps).read_pandas()
+    return pd.read_parquet(io.BytesIO(corps))
+
+
+@pytest.mark.parametrize("format_, type_mime", [("arrow", "application/vnd.apache.arrow.stream"),
+                                                ("parquet", "application/vnd.apache.parquet")])
+def test_export_binaire_diffuse(client, annonces, monkeypatch, format_, type_mime):
+    # Lots plus petits que la sélection : plusieurs RecordBatch / groupes de lignes
+    monkeypatch.setattr(app, "TAILLE_LOT_BINAIRE", 250)
+    reponse = client.get(f"/annonces?format={format_}")
+    assert reponse.status_code == 200 and reponse.is_streamed and reponse.mimetype == type_mime
+    assert "X-Next-After-Id" not in reponse.headers
+    # Toute la sélection, au-delà de LIMITE_MAX
+    df = lire_binaire(reponse, format_)
+    pd.testing.assert_frame_equal(df, annonces, check_dtype=False)
+
+    corps = io.BytesIO(reponse.get_data())
+    if format_ == "arrow":
+        lecteur = pa.ipc.open_stream(corps)
+        schema, nb_lots = lecteur.schema, sum(1 for _ in lecteur)
+    else:
+        fichier = pq.ParquetFile(corps)
+        schema, nb_lots = fichier.schema_arrow, fichier.num_row_groups
+    assert nb_lots == -(-NB_ANNONCES // 250)
+    # Schéma fixé avant le premier lot : entiers pour id / prix_num / superficie_num, texte sinon
+    assert {champ.name: str(champ.type) for champ in schema} == {
+        nom: "int64" if nom in app.COLONNES_ENTIERES else "string" for nom in app.COLONNES_ANNONCES}
+
+
+@pytest.mark.parametrize("format_", ["arrow", "parquet"])
+def test_export_binaire_limite_et_id_suivant(client, annonces, format_):
+    attendu = annonces.loc[(annonces["ville"] == "Tunis") & (annonces["id"] > 100), "id"].tolist()
+    assert len(attendu) % 40
+    # Pages suivies par l'en-tête X-Next-After-Id, calculé avant l'envoi du corps
+    lues, after_id = [], 100
+    while after_id is not None:
+        reponse = client.get(f"/annonces?format={format_}&ville=Tunis&limit=40&after_id={after_id}&fields=prix")
+        df = lire_binaire(reponse, format_)
+        assert list(df.columns) == ["id", "prix"]
+        lues.append(df["id"].tolist())
+        after_id = reponse.headers.get("X-Next-After-Id")
+        if after_id is not None:
+            assert after_id == str(lues[-1][-1])
+    assert [len(page) for page in lues[:-1]] == [40] * (len(lues) - 1) and len(lues[-1]) < 40
+    assert [i for page in lues for i in page] == attendu
+
+    # Sélection vide : schéma seul
+    reponse = client.get(f"/annonces?format={format_}&ville=Ville absente")
+    df = lire_binaire(reponse, format_)
+    assert len(df) == 0 and list(df.columns) == app.COLONNES_ANNONCES
+    assert "X-Next-After-Id" not in reponse.headers
+
+
+@pytest.mark.parametrize("url, message", [
+    ("/annonces?format=xml", "'format' doit valoir json, colonnes, arrow, parquet ou ndjson"),
+    ("/annonces_csv?format=xml", "'format' doit valoir json, colonnes, arrow ou parquet"),
+    ("/annonces_csv?format=ndjson", "'format' doit valoir json, colonnes, arrow ou parquet"),
+])
+def test_message_de_format_par_point_d_acces(client, url, message):
+    reponse = client.get(url)
+    assert reponse.status_code == 400 and reponse.get_json() == {"error": message}
@@ -0,0 +1,133 @@
+"""Callbacks du tableau de bord, appelés par le client de test du serveur Dash."""
+import os
+
+import pandas as pd
+import pytest
+
+import dashboard
+from demarrage import phases_demarrage
+from donnees import jeu_compact
+from nettoyage import nettoyer_annonces, nettoyer_prix_serie
+from stockage import ecrire_annonces
+from tests.donnees_synthetiques import generer_annonces
+
+
+@pytest.fixture
+def charger(tmp_path, monkeypatch):
+    """charger(df) installe `df` comme jeu du tableau de bord (df None : aucune source)."""
+    phases_demarrage.attendre()
+    monkeypatch.setattr(jeu_compact, "intervalle", 3600)
+
+    def installer(df):
+        chemin = os.path.join(tmp_path, "annonces.parquet")
+        if df is not None:
+            ecrire_annonces(df, chemin)
+        monkeypatch.setattr(jeu_compact, "sources", [chemin])
+        jeu_compact.verifier(forcer=True)
+        return dashboard.donnees_courantes()
+
+    return installer
+
+
+def appeler_callback(id_sortie, valeurs, declencheur):
+    """Réponse de /_dash-update-component pour le callback qui alimente `id_sortie`."""
+    client = dashboard.app.server.test_client()
+    client.get("/")
+    dependance = next(d for d in client.get("/_dash-dependencies").get_json() if id_sortie in d["output"])
+    sorties = [dict(zip(("id", "property"), o.rsplit(".", 1))) for o in dependance["output"].strip(".").split("...")]
+    corps = {
+        "output": dependance["output"],
+        "outputs": sorties,
+        "inputs": [dict(entree, value=valeurs[entree["id"]]) for entree in dependance["inputs"]],
+        "changedPropIds": [declencheur],
+    }
+    reponse = client.post("/_dash-update-component", json=corps)
+    assert reponse.status_code == 200
+    return reponse.get_json()["response"]
+
+
+def valeurs_classement(cle, taille, page, filtres=dashboard.FILTRES_INITIAUX):
+    nature, type_bien, prix_range, villes = filtres
+    return {
+        "nature-dropdown": nature, "type-dropdown": type_bien, "prix-filtre": prix_range,
+        "ville-dropdown": villes, "classement-cle": cle, "classement-taille": taille,
+        "top-annonces-table": page,
+    }
+
+
+def composant(layout, id_composant):
+    return next(c for c in layout._traverse() if getattr(c, "id", None) == id_composant)
+
+
+@pytest.mark.parametrize("cle, colonne", [("prix", "Prix_nettoye"), ("prix_m2", "prix_m2"),
+                                          ("superficie", "Superficie_nettoye")])
+@pytest.mark.parametrize("taille", dashboard.TAILLES_PAGE_CLASSEMENT)
+def test_update_classement_pages_comme_sort_values(charger, cle, colonne, taille):
+    annonces = nettoyer_annonces(generer_annonces(2000))
+    charger(annonces)
+    filtres = ("Vente", "Tous", [100_000, 2_000_000], "Toutes")
+    attendu = annonces[(annonces["nature"] == "Vente") & annonces["Prix_nettoye"].between(100_000, 2_000_000)]
+    attendu = attendu.dropna(subset=[colonne]).sort_values(colonne, ascending=False)[colonne].round(0)
+    nb_pages = -(-len(attendu) // taille)
+
+    for page in (0, 2, nb_pages - 1):
+        table = appeler_callback("top-annonces-table.data", valeurs_classement(cle, taille, page, filtres),
+                                 "top-annonces-table.page_current")["top-annonces-table"]
+        assert (table["page_count"], table["page_current"], table["page_size"]) == (nb_pages, page, taille)
+        lignes = table["data"]
+        if cle == "prix":
+            # Le prix affiché est le texte de l'annonce
+            valeurs = nettoyer_prix_serie(pd.Series([ligne["Prix"] for ligne in lignes])).tolist()
+        else:
+            valeurs = [ligne[colonne] for ligne in lignes]
+        assert valeurs == attendu.iloc[page * taille:(page + 1) * taille].tolist()
+        assert all(ligne["nature"] == "Vente" for ligne in lignes)
+
+
+def test_changement_de_cle_revient_a_la_premiere_page(charger):
+    charger(nettoyer_annonces(generer_annonces(500)))
+    table = appeler_callback("top-annonces-table.data", valeurs_classement("superficie", 10, 3),
+                             "classement-cle.value")["top-annonces-table"]
+    assert table["page_current"] == 0 and len(table["data"]) == 10
+
+
+def test_jeu_vide_garde_la_table_du_classement(charger):
+    charger(None)
+    table = composant(dashboard.html.Div(dashboard.construire_contenu()), "top-annonces-table")
+    assert table.data == [] and table.page_count == 1
+    reponse = appeler_callback("top-annonces-table.data", valeurs_classement("prix", 5, 0),
+                               "top-annonces-table.page_current")["top-annonces-table"]
+    assert reponse["data"] == [] and reponse["page_count"] == 1
+
+
+def test_cartes_kpis(charger):
+    annonces = nettoyer_annonces(generer_annonces(2000))
+    etat = charger(annonces)
+    filtres = ("Tous", "Appartement", [200_000, 900_000], ["Tunis", "La Marsa"])
+    selection = annonces[(annonces["type_bien"] == "Appartement") & annonces["Prix_nettoye"].between(200_000, 900_000)
+                         & annonces["Ville"].isin(["Tunis", "La Marsa"])]
+    sorties, _ = dashboard.calculer_sorties(etat, filtres)
+    assert sorties["kpi-nb-annonces"] == f"{len(selection):,}"
+    assert sorties["kpi-prix-median"] == f"{int(selection['Prix_nettoye'].median()):,}"
+    assert sorties["kpi-prix-m2"] == f"{int(selection['prix_m2'].median()):,}"
+    assert sorties["kpi-villes"] == "2"
+
+
+def test_index_et_cache_suivent_le_rechargement(charger):
+    etat = charger(nettoyer_annonces(generer_annonces(300)))
+    dashboard.calculer_sorties(etat, dashboard.FILTRES_INITIAUX)
+    version_cache = dashboard.cache_figures.version
+    assert dashboard.cache_figures.statistiques()["entrees"] > 0
+
+    # Source réécrite : l'abonné du tableau de bord reconstruit l'index et vide le cache
+    nouveau = nettoyer_annonces(generer_annonces(800, graine=1))
+    chemin = jeu_compact.sources[0]
+    ecrire_annonces(nouveau, chemin)
+    os.utime(chemin, ns=(0, os.stat(chemin).st_mtime_ns + 1))
+    assert jeu_compact.verifier()
+    version, df, index_annonces, _ = dashboard.donnees_courantes()
+    assert version != etat[0] and len(df) == index_annonces.taille == len(nouveau)
+    assert dashboard.cache_figures.version == version_cache + 1
+    assert dashboard.cache_figures.statistiques()["entrees"] == 0
+    sorties, _ = dashboard.calculer_sorties(dashboard.donnees_courantes(), dashboard.FILTRES_INITIAUX)
+    assert sorties["kpi-nb-annonces"] == f"{len(nouveau):,}"
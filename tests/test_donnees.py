@@ -0,0 +1,101 @@
+"""Rechargement à chaud de JeuDonnees quand la source change."""
+import os
+
+from donnees import JeuDonnees
+from ingestion import connecter, ingerer_lot
+from nettoyage import nettoyer_annonces
+from stockage import ecrire_annonces
+from tests.donnees_synthetiques import generer_annonces
+
+
+def ecrire(chemin, n, graine=0):
+    df = nettoyer_annonces(generer_annonces(n, graine))
+    ecrire_annonces(df, chemin)
+    return df
+
+
+class Abonne:
+    def __init__(self):
+        self.appels = []
+
+    def __call__(self, version, df, textes):
+        self.appels.append((version, len(df)))
+
+
+def test_rechargement_quand_le_fichier_change(tmp_path):
+    chemin = os.path.join(tmp_path, "annonces.parquet")
+    ecrire(chemin, 300)
+    jeu = JeuDonnees(sources=[chemin], intervalle=0)
+    assert len(jeu.obtenir()) == len(nettoyer_annonces(generer_annonces(300)))
+    abonne = Abonne()
+    jeu.abonner(abonne)
+    # Déjà chargé : l'abonné reçoit tout de suite le jeu courant
+    assert abonne.appels == [(jeu.etat()[0], len(jeu.obtenir()))]
+
+    # Source inchangée : ni rechargement ni notification
+    assert not jeu.verifier()
+    assert len(abonne.appels) == 1 and jeu.rechargements == 1
+
+    attendu = ecrire(chemin, 500, graine=1)
+    os.utime(chemin, ns=(0, os.stat(chemin).st_mtime_ns + 1))
+    df = jeu.obtenir()
+    assert df["Lien"].tolist() == attendu["Lien"].tolist()
+    assert df["Prix_nettoye"].tolist() == attendu["Prix_nettoye"].tolist()
+    version = jeu.etat()[0]
+    assert version == (chemin, os.stat(chemin).st_mtime_ns, os.stat(chemin).st_size)
+    assert abonne.appels[-1] == (version, len(attendu)) and jeu.rechargements == 2
+
+
+def test_verification_au_plus_une_fois_par_intervalle(tmp_path):
+    chemin = os.path.join(tmp_path, "annonces.parquet")
+    ecrire(chemin, 200)
+    jeu = JeuDonnees(sources=[chemin], intervalle=3600)
+    avant = len(jeu.obtenir())
+    ecrire(chemin, 400, graine=1)
+    os.utime(chemin, ns=(0, os.stat(chemin).st_mtime_ns + 1))
+    assert len(jeu.obtenir()) == avant
+    assert jeu.verifier(forcer=True) and len(jeu.obtenir()) != avant
+
+
+def test_source_illisible_garde_l_ancien_jeu(tmp_path):
+    chemin = os.path.join(tmp_path, "annonces.parquet")
+    ecrire(chemin, 200)
+    jeu = JeuDonnees(sources=[chemin], intervalle=0)
+    avant = jeu.obtenir()
+    with open(chemin, "wb") as fichier:
+        fichier.write(b"pas du parquet")
+    assert jeu.obtenir() is avant and jeu.rechargements == 1
+
+
+def test_base_sqlite_suit_stats_version(tmp_path):
+    chemin = os.path.join(tmp_path, "annonces.db")
+    brut = generer_annonces(600).rename(columns={"type_de_bien": "nature"})
+    conn = connecter(chemin)
+    try:
+        ingerer_lot(conn, brut.iloc[:300])
+        jeu = JeuDonnees(sources=[chemin], intervalle=0)
+        abonne = Abonne()
+        jeu.abonner(abonne)
+        assert len(jeu.obtenir()) == len(nettoyer_annonces(brut.iloc[:300]))
+        version = jeu.etat()[0]
+        assert version[:2] == (chemin, "stats")
+
+        # Chaque lot écrit incrémente stats_version, même quand il reste dans le WAL
+        ingerer_lot(conn, brut.iloc[300:])
+        assert len(jeu.obtenir()) == len(nettoyer_annonces(brut))
+        assert jeu.etat()[0] == (chemin, "stats", version[2] + 1)
+        assert [len_df for _, len_df in abonne.appels] == [len(nettoyer_annonces(brut.iloc[:300])),
+                                                           len(nettoyer_annonces(brut))]
+    finally:
+        conn.close()
+
+
+def test_source_absente_puis_creee(tmp_path):
+    chemin = os.path.join(tmp_path, "annonces.parquet")
+    jeu = JeuDonnees(sources=[os.path.join(tmp_path, "absent.parquet"), chemin], intervalle=0, compact=True)
+    assert jeu.obtenir().empty and jeu.etat()[0] is None
+    attendu = ecrire(chemin, 200)
+    version, df, textes = jeu.etat()
+    assert version[0] == chemin and len(df) == len(attendu)
+    # Variante compacte : textes lus à la demande dans la source
+    assert textes.lire([0], ["Titre"])["Titre"].iloc[0] == attendu["Titre"].iloc[0]
@@ -0,0 +1,103 @@
+"""IndexAnnonces comparé au filtrage et au tri pandas des mêmes annonces."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from index_filtres import CLES_CLASSEMENT, IndexAnnonces
+from nettoyage import nettoyer_annonces
+from tests.donnees_synthetiques import VILLES, generer_annonces
+
+NATURES = ["Tous", "Vente", "Location"]
+TYPES_BIEN = ["Tous", "Appartement", "Villa", "Maison", "Terrain", "Autre"]
+PLAGES_PRIX = [None, (0, 10_000_000), (200_000, 900_000), (5_000, 5_200)]
+VILLES_FILTRE = ["Toutes", [], ["Toutes", "Tunis"], ["Tunis"], ["La Marsa", "Ariana"],
+                 VILLES[:4], VILLES, ["Ville absente"]]
+
+
+@pytest.fixture(scope="module")
+def annonces():
+    return nettoyer_annonces(generer_annonces(3000)).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def index(annonces):
+    return IndexAnnonces(annonces)
+
+
+def filtrer(df, nature="Tous", type_bien="Tous", prix_range=None, villes="Toutes"):
+    """Même sélection que le callback des filtres, en pandas."""
+    garde = pd.Series(True, index=df.index)
+    if nature != "Tous":
+        garde &= df["nature"] == nature
+    if type_bien != "Tous":
+        garde &= df["type_bien"] == type_bien
+    if prix_range is not None:
+        garde &= df["Prix_nettoye"].between(*prix_range)
+    if isinstance(villes, list) and villes and "Toutes" not in villes:
+        garde &= df["Ville"].isin(villes)
+    return df[garde]
+
+
+FILTRES_CLASSEMENT = [
+    ("Tous", "Tous", None, "Toutes"),
+    ("Vente", "Tous", None, "Toutes"),
+    ("Tous", "Appartement", (200_000, 900_000), "Toutes"),
+    ("Location", "Villa", None, ["Tunis", "La Marsa"]),
+    ("Tous", "Tous", (200_000, 900_000), [VILLES[0]]),
+    ("Vente", "Terrain", (5_000, 5_200), "Toutes"),
+]
+
+
+@pytest.mark.parametrize("filtres", FILTRES_CLASSEMENT)
+@pytest.mark.parametrize("cle", list(CLES_CLASSEMENT))
+@pytest.mark.parametrize("taille", [5, 10, 25, 50])
+def test_classement_pagine_comme_sort_values(annonces, index, filtres, cle, taille):
+    colonne = CLES_CLASSEMENT[cle]
+    attendu = filtrer(annonces, *filtres).dropna(subset=[colonne]).sort_values(colonne, ascending=False)
+    selection = set(index.selection(*filtres))
+    nb_pages = max(1, -(-len(attendu) // taille))
+    for page in sorted({0, 1, nb_pages - 1, nb_pages}):
+        positions, total = index.classement(*filtres, cle=cle, debut=page * taille, fin=(page + 1) * taille)
+        assert total == len(attendu)
+        # Valeurs comparées rang par rang (les ex aequo peuvent sortir dans un autre ordre)
+        valeurs = annonces[colonne].to_numpy()[positions]
+        np.testing.assert_array_equal(valeurs, attendu[colonne].to_numpy()[page * taille:(page + 1) * taille])
+        assert set(positions) <= selection
+
+
+def test_classement_jeu_vide():
+    index = IndexAnnonces(pd.DataFrame())
+    for cle in CLES_CLASSEMENT:
+        positions, total = index.classement(cle=cle, debut=0, fin=5)
+        assert total == 0 and len(positions) == 0
+
+
+def kpis_pandas(selection):
+    """Mêmes indicateurs que IndexAnnonces.kpis, calculés sur les lignes filtrées."""
+    return {
+        "nb_annonces": len(selection),
+        "prix_moyen": selection["Prix_nettoye"].mean(),
+        "prix_median": selection["Prix_nettoye"].median(),
+        "nb_villes": selection["Ville"].nunique(),
+        "nb_vente": int((selection["nature"] == "Vente").sum()),
+        "nb_location": int((selection["nature"] == "Location").sum()),
+        "prix_m2_median": selection["prix_m2"].median(),
+    }
+
+
+# 3 natures × 6 types × 4 plages de prix × 8 listes de villes = 576 combinaisons
+@pytest.mark.parametrize("villes", VILLES_FILTRE, ids=str)
+@pytest.mark.parametrize("prix_range", PLAGES_PRIX, ids=str)
+@pytest.mark.parametrize("type_bien", TYPES_BIEN)
+@pytest.mark.parametrize("nature", NATURES)
+def test_kpis_comme_pandas(annonces, index, nature, type_bien, prix_range, villes):
+    filtres = (nature, type_bien, prix_range, villes)
+    attendu = kpis_pandas(filtrer(annonces, *filtres))
+    kpis = index.kpis(*filtres)
+    assert kpis.keys() == attendu.keys()
+    for cle in ["nb_annonces", "nb_villes", "nb_vente", "nb_location"]:
+        assert kpis[cle] == attendu[cle], cle
+    assert kpis["prix_moyen"] == pytest.approx(attendu["prix_moyen"], rel=1e-12, nan_ok=True)
+    # Médianes lues au rang dans les tableaux triés : égales, pas seulement proches
+    for cle in ["prix_median", "prix_m2_median"]:
+        assert kpis[cle] == attendu[cle] or (np.isnan(kpis[cle]) and np.isnan(attendu[cle])), cle
@@ -0,0 +1,66 @@
+"""Parité du nettoyage vectorisé avec l'ancienne version apply(), dtypes compris."""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from tests.donnees_synthetiques import generer_annonces
+from nettoyage import BLANCS, nettoyer_annonces, nettoyer_annonces_ligne
+
+COLONNES = ["Prix_nettoye", "Ville", "type_bien", "nature", "Superficie_nettoye", "prix_m2", "categorie_prix"]
+
+CAS_LIMITES = pd.DataFrame({
+    "Titre": ["Appartement à louer", "Villa vue mer", "Terrain constructible", "Maison de maître",
+              "Studio meublé", "Bureau en location", "Duplex", None],
+    "Prix": ["1 200 TND/mois", "Prix sur demande", "350.000 TND", 250000, "2,500,000 TND",
+             "900 par mois", 1.5e6, "1 TND"],
+    "Localisation": ["Centre Ville, Tunis", "Gammarth, La Marsa", "Sidi Bou Saïd, Carthage", "Mégrine, Ben Arous",
+                     12, "Médenine", np.nan, "Ariana"],
+    "Superficie": ["120 m²", None, "500\n\t\t\t\t\t\tm²", np.nan, "N/A", 80, "0 m²", "1"],
+})
+
+
+def verifier_parite(brut):
+    attendu = nettoyer_annonces_ligne(brut)
+    obtenu = nettoyer_annonces(brut)
+    pd.testing.assert_index_equal(obtenu.index, attendu.index)
+    for colonne in COLONNES:
+        pd.testing.assert_series_equal(obtenu[colonne], attendu[colonne], check_dtype=True, check_names=False)
+
+
+def test_parite_cas_limites():
+    # Prix sur demande, superficie manquante ou nulle, ville absente, accentuée ou non textuelle
+    verifier_parite(CAS_LIMITES)
+
+
+def test_parite_sans_valeur_manquante():
+    # Colonnes entières (int64) quand aucun prix ni aucune superficie ne manque
+    verifier_parite(CAS_LIMITES.iloc[[0, 2, 4]])
+
+
+def test_colonnes_entierement_manquantes_restent_numeriques():
+    # Seul écart voulu : apply() donne des colonnes object de None, le nettoyage vectorisé du float64
+    assert nettoyer_annonces(CAS_LIMITES.iloc[[1]]).empty
+    obtenu = nettoyer_annonces(CAS_LIMITES.iloc[[3]].assign(Superficie=[None]))
+    assert obtenu["Superficie_nettoye"].dtype == "float64"
+    assert obtenu["prix_m2"].dtype == "float64"
+    assert obtenu["prix_m2"].isna().all()
+
+
+def test_parite_synthetique():
+    verifier_parite(generer_annonces(5_000))
+
+
+def test_parite_expressions_regulieres_arrow():
+    # Chiffres d'autres écritures (\d de re), blancs Unicode de str.strip(), retours à la ligne
+    brut = pd.DataFrame({
+        "Titre": ["Appartement", "Villa", "Terrain", "Maison"],
+        "Prix": ["٣٤٥ ٠٠٠ TND", "1.250.000 TND", "Prix\n12 TND", "abc 7"],
+        "Localisation": ["Lac 2,　Tunis\x1c", "x\ny, La Marsa", "Ariana,", " Sousse "],
+        "Superficie": ["١٢٠ m²", "²300 m²", "80 m²", "m² 45"],
+    })
+    verifier_parite(brut)
+
+
+def test_blancs_de_str_strip():
+    assert BLANCS == "".join(chr(c) for c in range(sys.maxunicode + 1) if chr(c).isspace())
@@ -0,0 +1,185 @@
+"""Reprise sur checkpoint et crawl incrémental du scraper contre le serveur de fixtures local (backend http)."""
+import os
+import re
+import runpy
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+import scrapping
+from puits_annonces import creer_puits
+from registre_annonces import RegistreAnnonces
+from scrapping import NATURES, ScrapingAnnule, scrape_annonces
+from tests.serveur_fixtures import MOTIF_URL, generer_page
+
+NB_PAGES = 6
+VENTE = {"vente": NATURES["vente"]}
+
+
+def pages_demandees(chemins, url_part=NATURES["vente"]):
+    """Numéros des pages de `url_part` demandées au serveur, dans l'ordre d'arrivée."""
+    return [int(m["page"]) for m in map(MOTIF_URL.match, chemins) if m and m["url_part"] == url_part]
+
+
+def scraper(base_url, puits, **options):
+    return scrape_annonces(natures=VENTE, nb_workers=2, requetes_par_seconde=0, base_url=base_url,
+                           fichier_sortie=None, backend="http", puits=puits, **options)
+
+
+def annuler_apres(page_arret):
+    """(progression, annulation) : l'annulation est demandée une fois `page_arret` écrite."""
+    annulation, ecrites = threading.Event(), []
+
+    def progression(nature, page, total_pages, nb_annonces):
+        ecrites.append(page)
+        if page == page_arret:
+            annulation.set()
+
+    progression.ecrites = ecrites
+    return progression, annulation
+
+
+@pytest.fixture(params=["sqlite", "csv"])
+def chemin_puits(request, tmp_path):
+    """(type de puits, chemin) ; chaque ouverture relit le checkpoint laissé sur disque."""
+    nom = "annonces.db" if request.param == "sqlite" else "scraping_parts"
+    return request.param, os.path.join(tmp_path, nom)
+
+
+def test_annulation_puis_reprise_des_pages_restantes(serveur, chemin_puits):
+    base_url = serveur(pages=NB_PAGES)
+    progression, annulation = annuler_apres(3)
+    puits = creer_puits(*chemin_puits)
+    try:
+        with pytest.raises(ScrapingAnnule):
+            scraper(base_url, puits, progression=progression, annulation=annulation)
+        # Arrêt entre deux pages : la page 3 est la dernière écrite et le checkpoint la retient
+        assert progression.ecrites == [1, 2, 3]
+        assert puits.checkpoint("vente") == 3
+        assert len(puits.lire()) == 3 * 30
+    finally:
+        puits.fermer()
+
+    # Nouveau processus : le checkpoint est relu sur disque
+    deja_demandees = len(serveur.chemins)
+    ecrites = []
+    puits = creer_puits(*chemin_puits)
+    try:
+        scraper(base_url, puits, progression=lambda nature, page, total, n: ecrites.append(page))
+        # La page 1 est relue pour le nombre total de pages, mais pas réécrite
+        assert sorted(pages_demandees(serveur.chemins[deja_demandees:])) == [1, 4, 5, 6]
+        assert ecrites == [4, 5, 6]
+        assert puits.checkpoint("vente") == 0
+        annonces = puits.lire()
+        assert len(annonces) == annonces["Lien"].nunique() == NB_PAGES * 30
+    finally:
+        puits.fermer()
+
+
+def test_reprendre_false_ignore_le_checkpoint(serveur, chemin_puits):
+    base_url = serveur(pages=NB_PAGES)
+    progression, annulation = annuler_apres(2)
+    puits = creer_puits(*chemin_puits)
+    try:
+        with pytest.raises(ScrapingAnnule):
+            scraper(base_url, puits, progression=progression, annulation=annulation)
+        assert puits.checkpoint("vente") == 2
+
+        deja_demandees = len(serveur.chemins)
+        ecrites = []
+        scraper(base_url, puits, reprendre=False, progression=lambda nature, page, total, n: ecrites.append(page))
+        assert sorted(pages_demandees(serveur.chemins[deja_demandees:])) == list(range(1, NB_PAGES + 1))
+        assert ecrites == list(range(1, NB_PAGES + 1))
+        assert puits.checkpoint("vente") == 0
+    finally:
+        puits.fermer()
+
+
+def test_ligne_de_commande_depuis_debut(serveur, tmp_path, monkeypatch):
+    base_url = serveur(pages=NB_PAGES)
+    chemin = os.path.join(tmp_path, "annonces.db")
+    progression, annulation = annuler_apres(4)
+    puits = creer_puits("sqlite", chemin)
+    try:
+        with pytest.raises(ScrapingAnnule):
+            scraper(base_url, puits, progression=progression, annulation=annulation)
+        assert puits.checkpoint("vente") == 4
+    finally:
+        puits.fermer()
+
+    deja_demandees = len(serveur.chemins)
+    monkeypatch.setattr(sys, "argv", [
+        "scrapping.py", "--backend", "http", "--base-url", base_url, "--rps", "0", "--workers", "2",
+        "--puits", "sqlite", "--chemin-puits", chemin, "--sortie", os.path.join(tmp_path, "annonces.parquet"),
+        "--depuis-debut",
+    ])
+    runpy.run_module("scrapping", run_name="__main__")
+
+    # Toutes les pages de chaque nature, vente comprise malgré son checkpoint
+    chemins = serveur.chemins[deja_demandees:]
+    for url_part in NATURES.values():
+        assert sorted(pages_demandees(chemins, url_part)) == list(range(1, NB_PAGES + 1)), url_part
+    puits = creer_puits("sqlite", chemin)
+    try:
+        assert [puits.checkpoint(nature) for nature in NATURES] == [0, 0]
+        assert len(puits.lire()) == len(NATURES) * NB_PAGES * 30
+    finally:
+        puits.fermer()
+    assert os.path.exists(os.path.join(tmp_path, "annonces.parquet"))
+
+
+def test_crawl_incremental_et_fusion_excel(serveur, tmp_path, monkeypatch):
+    base_url = serveur(pages=NB_PAGES)
+    fichier_excel = os.path.join(tmp_path, "annonces.xlsx")
+    deltas = []
+    fusionner_excel = scrapping.fusionner_excel
+    monkeypatch.setattr(scrapping, "fusionner_excel",
+                        lambda fichier, delta: deltas.append(delta) or fusionner_excel(fichier, delta))
+    registre = RegistreAnnonces(os.path.join(tmp_path, "annonces_vues.db"))
+
+    def crawler():
+        deja_demandees, ecrites = len(serveur.chemins), []
+        scraper(base_url, None, incremental=True, registre=registre, fichier_excel=fichier_excel,
+                progression=lambda nature, page, total, n: ecrites.append((page, n)))
+        return sorted(pages_demandees(serveur.chemins[deja_demandees:])), ecrites
+
+    try:
+        # Registre vide : toutes les annonces sont nouvelles, toutes les pages parcourues
+        demandees, ecrites = crawler()
+        assert demandees == list(range(1, NB_PAGES + 1))
+        assert ecrites == [(page, 30) for page in range(1, NB_PAGES + 1)]
+        initial = pd.read_excel(fichier_excel)
+        assert len(initial) == NB_PAGES * 30 and len(deltas) == 1
+
+        # Rien de changé : la page 1 est entièrement connue, le crawl s'y arrête sans rien fusionner
+        demandees, ecrites = crawler()
+        assert demandees == [1] and ecrites == [(1, 0)]
+        assert len(deltas) == 1
+        pd.testing.assert_frame_equal(pd.read_excel(fichier_excel), initial)
+
+        # Deux annonces mises en ligne sur la page 1 et le prix d'une autre modifié
+        page_1 = generer_page(NATURES["vente"], 1, NB_PAGES, annonces_par_page=32)
+        prix = list(re.finditer(r'<span class="priceTag">([^<]*)</span>', page_1))[1]
+        page_1 = page_1[:prix.start(1)] + "123 456 TND" + page_1[prix.end(1):]
+        serveur.pages[(NATURES["vente"], 1)] = page_1.encode("utf-8")
+
+        demandees, ecrites = crawler()
+        # La page 2, entièrement connue, arrête la pagination (les pages suivantes ne sont pas écrites)
+        assert ecrites == [(1, 3), (2, 0)]
+        assert demandees[:2] == [1, 2]
+        delta = deltas[-1]
+        modifiee = initial.loc[1, "Lien"]
+        assert len(deltas) == 2 and len(delta) == 3
+        assert modifiee in set(delta["Lien"])
+        assert not (set(delta["Lien"]) - {modifiee}) & set(initial["Lien"])
+
+        fusionne = pd.read_excel(fichier_excel)
+        assert len(fusionne) == len(initial) + 2
+        prix_par_lien = fusionne.set_index("Lien")["Prix"]
+        assert prix_par_lien[modifiee] == "123 456 TND"
+        inchangees = initial[initial["Lien"] != modifiee].set_index("Lien")["Prix"]
+        assert prix_par_lien[inchangees.index].tolist() == inchangees.tolist()
+    finally:
+        registre.fermer()
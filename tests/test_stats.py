@@ -0,0 +1,134 @@
+"""Agrégats stats_* : mises à jour par différence comparées au recalcul complet, et /stats."""
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import app
+from base_donnees import COLONNES_STATS, TABLES_STATS, reconstruire_stats
+from ingestion import connecter, ingerer_lot
+from tests.donnees_synthetiques import generer_annonces
+
+
+def lots_scraper():
+    """Lots successifs : insertions, puis UPSERT qui changent prix, ville et superficie de liens déjà vus."""
+    brut = generer_annonces(2000).rename(columns={"type_de_bien": "nature"})
+    lots = [brut.iloc[debut:debut + 300] for debut in range(0, 1500, 300)]
+    revus = brut.iloc[1000:2000].copy()
+    revus.loc[revus.index[::3], "Prix"] = "1 234 567 TND"
+    # Seules annonces de Bizerte : le groupe apparaît puis disparaît quand elles en repartent
+    revus.loc[revus.index[1::50], "Localisation"] = "Corniche, Bizerte"
+    revus.loc[revus.index[2::7], "Superficie"] = "0 m²"
+    lots += [revus.iloc[:500], revus.iloc[500:]]
+    repartis = revus.loc[revus.index[1::50]].assign(Localisation="Centre, Tunis")
+    lots.append(repartis)
+    return lots
+
+
+def instantane(conn):
+    """Contenu trié de chaque table stats_*."""
+    colonnes = list(COLONNES_STATS)
+    return {
+        nom: conn.execute(
+            f"SELECT {', '.join(cles + colonnes)} FROM stats_{nom} ORDER BY {', '.join(cles)}"
+        ).fetchall()
+        for nom, cles in TABLES_STATS.items()
+    }
+
+
+def recalcul_complet(conn):
+    copie = sqlite3.connect(":memory:")
+    conn.backup(copie)
+    with copie:
+        reconstruire_stats(copie)
+    return instantane(copie)
+
+
+def stats_pandas(conn, nom):
+    """{clé: (nombre, somme_prix, prix_median)} calculés par pandas sur la table annonces."""
+    cles = TABLES_STATS[nom]
+    annonces = pd.read_sql(f"SELECT {', '.join(cles)}, prix_num FROM annonces WHERE prix_num IS NOT NULL", conn)
+    annonces = annonces.astype(object).where(annonces.notna(), None)
+    groupes = annonces.groupby(cles, dropna=False)["prix_num"]
+    return {
+        tuple(None if pd.isna(v) else v for v in (cle if isinstance(cle, tuple) else (cle,))):
+            (len(prix), int(prix.sum()), float(prix.astype(float).median()))
+        for cle, prix in groupes
+    }
+
+
+def test_deltas_egaux_au_recalcul_complet(tmp_path):
+    conn = connecter(os.path.join(tmp_path, "annonces.db"))
+    try:
+        vues = set()
+        for lot in lots_scraper():
+            ingerer_lot(conn, lot)
+            obtenu, attendu = instantane(conn), recalcul_complet(conn)
+            for nom in TABLES_STATS:
+                assert len(obtenu[nom]) == len(attendu[nom]), nom
+                for ligne, reference in zip(obtenu[nom], attendu[nom]):
+                    # Somme des prix au m² : flottants sommés dans un autre ordre
+                    assert ligne[:-2] == reference[:-2] and ligne[-2] == pytest.approx(reference[-2]), nom
+                    assert ligne[-1] == reference[-1], (nom, ligne, reference)
+                # Référence indépendante de _mettre_a_jour_medianes, partagé par les deux chemins
+                n = len(TABLES_STATS[nom])
+                assert {ligne[:n]: (ligne[n], ligne[n + 1], ligne[-1]) for ligne in obtenu[nom]} == stats_pandas(conn, nom)
+            vues |= {ligne[0] for ligne in obtenu["ville"]}
+        assert "Bizerte" in vues
+        assert "Bizerte" not in {ligne[0] for ligne in instantane(conn)["ville"]}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    chemin = os.path.join(tmp_path, "annonces.db")
+    conn = connecter(chemin)
+    try:
+        ingerer_lot(conn, lots_scraper()[0])
+    finally:
+        conn.close()
+    monkeypatch.setattr(app, "db_name", chemin)
+    return app.app.test_client()
+
+
+def test_etag_et_304(client):
+    reponse = client.get("/stats")
+    etag = reponse.headers["ETag"]
+    assert reponse.status_code == 200 and reponse.get_json()["stats"]
+    assert reponse.cache_control.no_cache
+    reponse = client.get("/stats", headers={"If-None-Match": etag})
+    assert reponse.status_code == 304 and reponse.headers["ETag"] == etag
+    # Réponse compressée : ETag faible, accepté tel quel au tour suivant
+    compressee = client.get("/stats", headers={"Accept-Encoding": "gzip"})
+    assert compressee.headers["Content-Encoding"] == "gzip" and compressee.headers["ETag"].startswith("W/")
+    assert client.get("/stats", headers={"If-None-Match": compressee.headers["ETag"]}).status_code == 304
+
+    # Un nouveau lot change la version : plus de 304
+    conn = connecter(app.db_name)
+    try:
+        ingerer_lot(conn, lots_scraper()[1])
+    finally:
+        conn.close()
+    reponse = client.get("/stats", headers={"If-None-Match": etag})
+    assert reponse.status_code == 200 and reponse.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("dimension", list(TABLES_STATS))
+def test_dimensions(client, dimension):
+    url = "/stats" if dimension == "groupes" else f"/stats/{dimension}"
+    stats = client.get(url).get_json()["stats"]
+    assert stats and all(set(TABLES_STATS[dimension]) <= set(ligne) for ligne in stats)
+    assert [ligne["nombre"] for ligne in stats] == sorted((ligne["nombre"] for ligne in stats), reverse=True)
+
+
+def test_filtres_de_stats(client):
+    stats = client.get("/stats?nature=Vente&ville=Tunis").get_json()["stats"]
+    assert stats and all(ligne["nature"] == "vente" and ligne["ville"] == "Tunis" for ligne in stats)
+
+
+def test_dimension_inconnue(client):
+    reponse = client.get("/stats/quartier")
+    assert reponse.status_code == 404
+    assert reponse.get_json() == {"error": "Dimension inconnue : quartier"}
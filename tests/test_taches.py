@@ -0,0 +1,164 @@
+"""Tâches de POST /scrape contre le serveur de fixtures local (backend http, sans navigateur)."""
+import os
+import time
+
+import pytest
+
+from analyse_pages import AnalyseurPages
+from scrapping import LimiteurDebit, creer_recuperateur, iterer_annonces
+from taches import (
+    ANNULATION, ANNULEE, ECHEC, EN_COURS, TERMINEE, GestionnaireTaches, NaturesOccupees, processus_vivant,
+)
+
+NB_PAGES = 6
+
+
+@pytest.fixture
+def creer_gestionnaire(tmp_path):
+    """creer_gestionnaire(base_url, ...) ; les gestionnaires d'un même test partagent la base d'état,
+    comme les workers gunicorn de l'API."""
+    def creer(base_url, type_puits="memoire", chemin_puits=None):
+        return GestionnaireTaches(
+            nb_taches=2, type_puits=type_puits, chemin_puits=chemin_puits,
+            chemin_etat=os.path.join(tmp_path, "taches_scraping.db"), base_url=base_url,
+            backend="http", nb_workers=2, requetes_par_seconde=0, fichier_sortie=None,
+        )
+    return creer
+
+
+def attendre_statut(tache, statuts, delai=30):
+    limite = time.monotonic() + delai
+    while tache.statut not in statuts:
+        assert time.monotonic() < limite, f"statut {tache.statut} après {delai} s"
+        time.sleep(0.02)
+
+
+def test_progression_jusqu_a_la_fin(serveur, creer_gestionnaire):
+    gestionnaire = creer_gestionnaire(serveur())
+    try:
+        tache, nouvelle = gestionnaire.soumettre(["vente"])
+        assert nouvelle
+        tache.future.result(timeout=30)
+        etat = tache.etat()
+        assert etat["statut"] == TERMINEE
+        assert etat["pages_faites"] == etat["pages_totales"] == NB_PAGES
+        assert etat["annonces"] == NB_PAGES * 30
+        # Nature libérée : une nouvelle demande crée une nouvelle tâche
+        assert gestionnaire.soumettre(["vente"])[0].id != tache.id
+    finally:
+        gestionnaire.arreter()
+
+
+def test_meme_demande_rejointe_chevauchement_refuse(serveur, creer_gestionnaire):
+    gestionnaire = creer_gestionnaire(serveur(latence=0.1))
+    try:
+        tache, _ = gestionnaire.soumettre(["vente"])
+        rejointe, nouvelle = gestionnaire.soumettre(["vente"])
+        assert rejointe is tache and not nouvelle
+        with pytest.raises(NaturesOccupees):
+            gestionnaire.soumettre(["vente", "location"])
+        # Une nature libre reste disponible en parallèle
+        assert gestionnaire.soumettre(["location"])[1]
+    finally:
+        gestionnaire.arreter()
+
+
+def test_annulation_entre_deux_pages(serveur, creer_gestionnaire):
+    pages = 40
+    gestionnaire = creer_gestionnaire(serveur(latence=0.2, pages=pages))
+    try:
+        tache, _ = gestionnaire.soumettre(["vente"])
+        attendre_statut(tache, {EN_COURS})
+        while tache.pages_faites < 2:
+            time.sleep(0.02)
+        debut = time.monotonic()
+        gestionnaire.annuler(tache.id)
+        attendre_statut(tache, {ANNULEE})
+        # Seules les pages déjà lancées (2 workers) se terminent, pas celles en file
+        assert time.monotonic() - debut < 1.0
+        assert tache.pages_faites < pages
+        assert gestionnaire.soumettre(["vente"])[1]
+    finally:
+        gestionnaire.arreter()
+
+
+def test_fermeture_sans_recuperer_les_pages_en_file(serveur):
+    latence = 0.2
+    base_url = serveur(latence=latence, pages=40)
+    recuperateur = creer_recuperateur("http", 2)
+    lots = iterer_annonces({"vente": "immobilier-a-vendre"}, recuperateur, LimiteurDebit(0),
+                           AnalyseurPages("html.parser"), 2, base_url)
+    try:
+        next(lots)
+        next(lots)
+        debut = time.monotonic()
+        lots.close()
+        # Les pages déjà parties se terminent ; une page en file partirait au plus tôt une
+        # latence plus tard, quand un worker se libère
+        assert not [instant for instant in serveur.requetes if instant > debut + latence / 2]
+        assert len(serveur.requetes) < 40
+    finally:
+        recuperateur.fermer()
+
+
+def test_echec_a_l_ouverture_du_puits_libere_les_natures(serveur, creer_gestionnaire, tmp_path):
+    chemin = os.path.join(tmp_path, "absent", "annonces.db")
+    gestionnaire = creer_gestionnaire(serveur(), type_puits="sqlite", chemin_puits=chemin)
+    try:
+        tache, _ = gestionnaire.soumettre(["vente"])
+        attendre_statut(tache, {ECHEC})
+        assert tache.etat()["erreur"]
+        assert gestionnaire.soumettre(["vente"])[0].id != tache.id
+    finally:
+        gestionnaire.arreter()
+
+
+def test_etat_partage_entre_workers(serveur, creer_gestionnaire):
+    base_url = serveur(latence=0.2, pages=40)
+    # Deux gestionnaires sur la même base : deux workers gunicorn de l'API
+    proprietaire, autre = creer_gestionnaire(base_url), creer_gestionnaire(base_url)
+    try:
+        tache, _ = proprietaire.soumettre(["vente"])
+        attendre_statut(tache, {EN_COURS})
+        while tache.pages_faites < 2:
+            time.sleep(0.02)
+        lue = autre.obtenir(tache.id)
+        assert lue is not tache and lue.statut == EN_COURS and lue.pages_faites >= 2
+        assert [t.id for t in autre.lister()] == [tache.id]
+
+        # Le verrou des natures vaut pour tous les workers
+        rejointe, nouvelle = autre.soumettre(["vente"])
+        assert rejointe.id == tache.id and not nouvelle
+        with pytest.raises(NaturesOccupees):
+            autre.soumettre(["vente", "location"])
+
+        # Annulation demandée à un autre worker : relevée par le propriétaire à la page suivante
+        assert autre.annuler(tache.id).statut == ANNULATION
+        attendre_statut(tache, {ANNULEE})
+        assert autre.obtenir(tache.id).etat()["statut"] == ANNULEE
+        assert autre.obtenir(tache.id).pages_faites == tache.pages_faites < 40
+        assert autre.soumettre(["vente"])[1]
+        assert autre.obtenir("inconnue") is None and autre.annuler("inconnue") is None
+    finally:
+        proprietaire.arreter()
+        autre.arreter()
+
+
+def test_taches_d_un_worker_arrete_liberees(serveur, creer_gestionnaire):
+    base_url = serveur()
+    worker_arrete, autre = creer_gestionnaire(base_url), creer_gestionnaire(base_url)
+    try:
+        with worker_arrete._transaction() as conn:
+            conn.execute("INSERT INTO taches VALUES ('orpheline', '[\"vente\"]', 0, ?, NULL, 3, '{}', 90, 0, 0, NULL, 0, ?)",
+                         (EN_COURS, "999999999:1"))
+            conn.execute("INSERT INTO natures_actives VALUES ('vente', 'orpheline')")
+        assert not processus_vivant("999999999:1")
+        tache, nouvelle = autre.soumettre(["vente"])
+        assert nouvelle
+        orpheline = autre.obtenir("orpheline")
+        assert orpheline.statut == ECHEC and orpheline.erreur and orpheline.fin
+        tache.future.result(timeout=30)
+        assert autre.obtenir(tache.id).statut == TERMINEE
+    finally:
+        worker_arrete.arreter()
+        autre.arreter()
@@ -0,0 +1,10 @@
+"""Point d'entrée WSGI de l'API : gunicorn -c gunicorn.conf.py -b 0.0.0.0:8000 wsgi_api:app
+
+Le jeu partagé est chargé à l'import, donc avant le fork des workers avec preload_app.
+"""
+from app import app
+from base_donnees import init_db
+from donnees import jeu_annonces
+
+init_db()
+jeu_annonces.obtenir()
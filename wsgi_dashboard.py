@@ -0,0 +1,9 @@
+"""Point d'entrée WSGI du tableau de bord : gunicorn -c gunicorn.conf.py -b 0.0.0.0:8050 wsgi_dashboard:app
+
+L'import lance le préchauffage (voir demarrage.py) ; avec preload_app, le maître
+l'attend avant de forker (gunicorn.conf.py) et les workers héritent du jeu
+compact, de l'index et du cache des figures.
+"""
+from dashboard import app as tableau_de_bord
+
+app = tableau_de_bord.server